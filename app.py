@@ -1,8 +1,8 @@
 import streamlit as st
-from modules import authentication, navigation, database_manager
-from modules.exceptions import FirebaseCredentialsError
-from views import subject_selection, home_dashboard, home, admin_dashboard
-from modules.subjects import gk_quiz, math_exercise
+from modules import authentication, content_watch, data_manager, navigation, database_manager, prefetch, profiler
+from modules.exceptions import BackendUnavailableError, FirebaseCredentialsError
+from views import subject_selection, home_dashboard, home, admin_dashboard, class_dashboard, leaderboard
+from modules.subjects import adaptive_practice, gk_quiz, math_exercise, review
 
 def main():
     """Main function to run the Streamlit application."""
@@ -13,7 +13,9 @@ def main():
         database_manager.initialize_firestore()
         # Add a toast for successful initialization, which is now safe to do here
         if 'db_initialized_once' not in st.session_state:
-            if hasattr(st, 'secrets') and "firebase" in st.secrets:
+            if database_manager.is_local_backend():
+                st.toast("Using the local in-memory backend.", icon="🧪")
+            elif hasattr(st, 'secrets') and "firebase" in st.secrets:
                 st.toast("Firebase initialized from Streamlit secrets.", icon="🚀")
             else:
                 st.toast("Firebase initialized from local file.", icon="💻")
@@ -22,13 +24,33 @@ def main():
     except FirebaseCredentialsError as e:
         st.error(f"Database Initialization Failed: {e}")
         st.stop()
+
+    # Preload popular quizzes in the background, once per server process
+    try:
+        prefetch.warm_up()
+    except BackendUnavailableError:
+        pass  # Not cached, so the next run tries again; quizzes load on demand meanwhile
+    # Listen for uploads from any process so cached content never goes stale
+    try:
+        content_watch.start_content_watcher()
+    except BackendUnavailableError:
+        pass  # Not cached, so the next run tries again; until then the version check covers freshness
+    # Replay attempts spooled while Firestore was unreachable, now and whenever it recovers
+    data_manager.start_spool_replay()
     
     authentication.initialize_session_state()
     navigation.render_sidebar()
 
     # Main content routing
     view = st.session_state.get("current_view", "home")
+    try:
+        render_view(view)
+    except BackendUnavailableError:
+        st.error("The database is not responding right now. Please try again in a minute; "
+                 "any answers you submit are kept and saved once it is back.")
 
+def render_view(view: str):
+    """Renders the page for the current view."""
     if view in ["home", "login", "register"]:
         if view == "home":
             home.render()
@@ -47,8 +69,20 @@ def main():
                 gk_quiz.render()
             elif view == "math_exercise":
                 math_exercise.render()
+            elif view == "adaptive_practice":
+                adaptive_practice.render()
+            elif view == "review":
+                review.render()
+            elif view == "leaderboard":
+                leaderboard.render()
+            elif view == "class_dashboard":
+                if authentication.is_teacher():
+                    class_dashboard.render()
+                else:
+                    st.error("You do not have permission to access this page.")
+                    home.render()
             elif view == "admin_dashboard":
-                if st.session_state.student_name == "admin":
+                if authentication.is_admin():
                     admin_dashboard.render()
                 else:
                     st.error("You do not have permission to access this page.")
@@ -62,4 +96,5 @@ def main():
             authentication.render_login_view()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Profiles this rerun when an admin has selected it (see modules/profiler.py)
+    profiler.profile_rerun(main)
\ No newline at end of file
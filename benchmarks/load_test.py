@@ -0,0 +1,284 @@
+"""
+Headless load-test driver that scripts full student journeys through app.main.
+
+Each simulated session is a Streamlit AppTest driving the real app against the
+in-memory backend: login -> subject selection -> GK quiz or Math exercise ->
+answer every question -> submit -> scores dashboard. The driver reports per-step
+latency and rerun counts at each concurrency level, and estimates how many
+concurrent students one worker can serve within a latency budget.
+
+A sequential profile run also records the reruns and backend reads every step
+costs. Pass --baseline with an earlier report to fail (exit code 1) when any
+click starts triggering more reruns or reads than before.
+
+Usage (from the repository root):
+    python -m benchmarks.load_test --concurrency 1,4,8,16 --output load.json
+    python -m benchmarks.load_test --baseline load.json
+"""
+import os
+
+os.environ.setdefault("LEARNING_APP_BACKEND", "local")
+
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from streamlit import config as st_config, logger as st_logger
+
+st_config.get_config_options()
+st_logger.set_log_level("error")
+
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest
+
+from benchmarks import synthetic
+from benchmarks.run_benchmarks import _git_commit, _summarize
+from modules import database_manager
+
+RUN_COUNTER_KEY = "_load_test_script_runs"
+
+
+def _share_apptest_runtime():
+    """
+    AppTest installs a mock Runtime singleton for the duration of each run and resets it
+    to None afterwards, so sessions running in parallel threads can see no runtime at all.
+    Fall back to the most recent mock so concurrent sessions behave like one server process.
+    """
+    original_instance = Runtime.instance.__func__
+    last_seen = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            last_seen["runtime"] = cls._instance
+            return cls._instance
+        if "runtime" in last_seen:
+            return last_seen["runtime"]
+        return original_instance(cls)
+
+    Runtime.instance = classmethod(instance)
+
+
+def _app_script():
+    """The script each AppTest session executes; counts script runs so reruns can be reported."""
+    import streamlit as st
+    st.session_state["_load_test_script_runs"] = st.session_state.get("_load_test_script_runs", 0) + 1
+    import app
+    app.main()
+
+
+class Journey:
+    """Drives one student session through the app, recording per-step costs."""
+
+    def __init__(self, username: str, subject: str, timeout: float):
+        self.username = username
+        self.subject = subject
+        self.at = AppTest.from_function(_app_script, default_timeout=timeout)
+        self.steps = []
+
+    def _step(self, name: str, action=None):
+        db = database_manager.initialize_firestore()
+        runs_before = self.at.session_state[RUN_COUNTER_KEY] if RUN_COUNTER_KEY in self.at.session_state else 0
+        reads_before = db.stats["reads"]
+        start = time.perf_counter()
+        (action() if action else self.at).run()
+        elapsed = time.perf_counter() - start
+        if self.at.exception:
+            raise RuntimeError(f"{name} raised: {self.at.exception[0].message}")
+        self.steps.append({
+            "step": name,
+            "seconds": elapsed,
+            "reruns": self.at.session_state[RUN_COUNTER_KEY] - runs_before - 1,
+            "reads": db.stats["reads"] - reads_before,
+        })
+
+    def _button(self, label: str):
+        return next(b for b in self.at.button if b.label == label)
+
+    def run(self) -> list:
+        self._step("open_app")
+        self._step("open_login", lambda: self._button("🔒 Login").click())
+        self.at.text_input[0].input(self.username)
+        self.at.text_input[1].input(synthetic.SYNTHETIC_PIN)
+        self._step("login", lambda: self._button("Login").click())
+        self._step("subjects", lambda: self._button("📚 Subjects").click())
+        if self.subject == "GK":
+            self._run_gk()
+        else:
+            self._run_math()
+        self._step("dashboard", lambda: self._button("📊 Scores Dashboard").click())
+        self._step("analyze", lambda: self._button("Analyze").click())
+        return self.steps
+
+    def _run_gk(self):
+        self._step("open_quiz", lambda: self.at.button(key="start_gk_button").click())
+        self._step("start_quiz", lambda: self._button("Start GK Quiz").click())
+        for radio in [r for r in self.at.radio if r.key and r.key.startswith("gk_q_")]:
+            self._step("answer", lambda radio=radio: radio.set_value(random.choice(radio.options)))
+        self._step("submit", lambda: self._button("Submit Quiz ✅").click())
+
+    def _run_math(self):
+        self._step("open_quiz", lambda: self.at.button(key="start_math_button").click())
+        self._step("start_quiz", lambda: self._button("Start Exercise").click())
+        for radio in [r for r in self.at.radio if r.key and r.key.startswith("math_q_")]:
+            self._step("answer", lambda radio=radio: radio.set_value(random.choice(radio.options)))
+        for text_input in [t for t in self.at.text_input if t.key and t.key.startswith("math_q_")]:
+            self._step("answer", lambda text_input=text_input: text_input.input(str(random.randint(1, 100))))
+        for checkbox in [c for c in self.at.checkbox if c.key and c.key.startswith("math_q_")][:4]:
+            self._step("answer", lambda checkbox=checkbox: checkbox.check())
+        self._step("submit", lambda: self._button("Submit Exercise ✅").click())
+
+
+def seed_backend(args) -> list:
+    rng = random.Random(args.seed)
+    db = database_manager.initialize_firestore()
+    db.reset()
+    catalog = synthetic.seed_catalog(rng, args.gk_topics, args.math_chapters, args.stories_per_chapter,
+                                     args.questions_per_quiz)
+    usernames = synthetic.seed_users(args.users)
+    synthetic.seed_attempts(rng, usernames, catalog, args.attempts_per_user)
+    return usernames
+
+
+def profile_journeys(usernames: list, timeout: float) -> dict:
+    """Runs one GK and one Math journey sequentially and records reruns/reads per step."""
+    profile = {}
+    for subject in ("GK", "Math"):
+        steps = Journey(usernames[0], subject, timeout).run()
+        profile[subject] = {}
+        for step in steps:
+            entry = profile[subject].setdefault(step["step"], {"count": 0, "reruns": 0, "reads": 0})
+            entry["count"] += 1
+            entry["reruns"] = max(entry["reruns"], step["reruns"])
+            entry["reads"] = max(entry["reads"], step["reads"])
+    return profile
+
+
+def run_level(usernames: list, concurrency: int, journeys_per_session: int, timeout: float) -> dict:
+    """Runs `concurrency` sessions in parallel threads and summarizes step latencies."""
+    samples = {}
+    lock = threading.Lock()
+    failures = []
+
+    def session(index: int):
+        username = usernames[index % len(usernames)]
+        for j in range(journeys_per_session):
+            try:
+                steps = Journey(username, "GK" if (index + j) % 2 == 0 else "Math", timeout).run()
+            except Exception as e:
+                failures.append(str(e))
+                continue
+            with lock:
+                for step in steps:
+                    entry = samples.setdefault(step["step"], {"seconds": [], "reruns": 0})
+                    entry["seconds"].append(step["seconds"])
+                    entry["reruns"] += step["reruns"]
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(session, range(concurrency)))
+    wall_seconds = time.perf_counter() - wall_start
+
+    steps = {}
+    for name, entry in samples.items():
+        steps[name] = _summarize(entry["seconds"], wall_seconds)
+        steps[name]["reruns_per_step"] = entry["reruns"] / len(entry["seconds"])
+    all_seconds = [s for entry in samples.values() for s in entry["seconds"]]
+    completed = concurrency * journeys_per_session - len(failures)
+    return {
+        "concurrency": concurrency,
+        "journeys_completed": completed,
+        "journeys_per_s": completed / wall_seconds if wall_seconds else 0.0,
+        "failures": failures[:10],
+        "overall": _summarize(all_seconds, wall_seconds) if all_seconds else {},
+        "steps": steps,
+    }
+
+
+def _run_level_in_process(payload):
+    args, concurrency = payload
+    _share_apptest_runtime()
+    usernames = seed_backend(args)
+    return run_level(usernames, concurrency, args.journeys_per_session, args.timeout)
+
+
+def find_regressions(profile: dict, baseline_profile: dict) -> list:
+    regressions = []
+    for subject, steps in profile.items():
+        for step, entry in steps.items():
+            old = baseline_profile.get(subject, {}).get(step)
+            if not old:
+                continue
+            for metric in ("reruns", "reads"):
+                if entry[metric] > old[metric]:
+                    regressions.append(f"{subject}/{step}: {metric} {old[metric]} -> {entry[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent student sessions with Streamlit AppTest.")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="Comma-separated session counts to sweep.")
+    parser.add_argument("--journeys-per-session", type=int, default=2)
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Run each level in this many worker processes, each with its own backend.")
+    parser.add_argument("--slo-ms", type=float, default=1000.0, help="p99 step latency budget for capacity.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-step AppTest timeout in seconds.")
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--attempts-per-user", type=int, default=20)
+    parser.add_argument("--gk-topics", type=int, default=4)
+    parser.add_argument("--math-chapters", type=int, default=2)
+    parser.add_argument("--stories-per-chapter", type=int, default=2)
+    parser.add_argument("--questions-per-quiz", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this path.")
+    parser.add_argument("--baseline", help="A previous report whose rerun/read profile must not be exceeded.")
+    args = parser.parse_args()
+
+    _share_apptest_runtime()
+    usernames = seed_backend(args)
+    profile = profile_journeys(usernames, args.timeout)
+
+    levels = []
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        if args.processes > 1:
+            with multiprocessing.get_context("spawn").Pool(args.processes) as pool:
+                per_process = pool.map(_run_level_in_process, [(args, concurrency)] * args.processes)
+            level = {"concurrency": concurrency * args.processes, "per_process": per_process,
+                     "journeys_per_s": sum(p["journeys_per_s"] for p in per_process),
+                     "overall": {"p99_ms": max(p["overall"].get("p99_ms", 0) for p in per_process)}}
+        else:
+            level = run_level(usernames, concurrency, args.journeys_per_session, args.timeout)
+        levels.append(level)
+        print(f"concurrency={level['concurrency']:<4} journeys/s={level['journeys_per_s']:.2f} "
+              f"p99 step={level['overall'].get('p99_ms', 0):.0f} ms")
+
+    within_slo = [lvl["concurrency"] for lvl in levels if lvl["overall"].get("p99_ms", float("inf")) <= args.slo_ms]
+    report = {
+        "meta": {"commit": _git_commit(), "created_at": datetime.now().isoformat(timespec="seconds"),
+                 "params": vars(args) | {"output": None, "baseline": None}},
+        "profile": profile,
+        "levels": levels,
+        "max_concurrency_within_slo": max(within_slo) if within_slo else 0,
+    }
+    print(f"Max concurrent sessions within {args.slo_ms:.0f} ms p99: {report['max_concurrency_within_slo']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = find_regressions(profile, json.load(f).get("profile", {}))
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Offline benchmark suite for the Learning App.
+
+Seeds the in-memory backend with synthetic quizzes, users and attempt
+histories, then times the real database_manager, data_manager, scoring and
+dashboard code paths. Results are written as JSON so runs from different
+commits can be compared.
+
+Usage (from the repository root):
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --compare baseline.json --output bench.json
+"""
+import os
+
+os.environ.setdefault("LEARNING_APP_BACKEND", "local")
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+from streamlit import config as st_config, logger as st_logger
+
+# Bare-mode runs warn about the missing ScriptRunContext on every cached call. Parse the
+# config first so it doesn't reset the level afterwards.
+st_config.get_config_options()
+st_logger.set_log_level("error")
+
+from benchmarks import synthetic
+from modules import async_db, authentication, content_cache, data_manager, database_manager, practice
+from views import home_dashboard
+
+
+def _percentile(sorted_samples: list, pct: float) -> float:
+    index = min(len(sorted_samples) - 1, max(0, round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def _summarize(samples: list, wall_seconds: float) -> dict:
+    ordered = sorted(samples)
+    return {
+        "count": len(samples),
+        "throughput_per_s": len(samples) / wall_seconds if wall_seconds else 0.0,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": _percentile(ordered, 50) * 1000,
+        "p99_ms": _percentile(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def time_operation(operation, iterations: int) -> dict:
+    """Runs `operation(i)` `iterations` times and returns latency statistics."""
+    samples = []
+    wall_start = time.perf_counter()
+    for i in range(iterations):
+        start = time.perf_counter()
+        operation(i)
+        samples.append(time.perf_counter() - start)
+    return _summarize(samples, time.perf_counter() - wall_start)
+
+
+# --- Benchmarked operations ---
+
+def _login(username: str, pin: str) -> bool:
+    """Mirrors authentication.render_login_view without the UI."""
+    if not database_manager.user_exists(username):
+        return False
+    credentials = database_manager.get_user_credentials(username)
+    return authentication._verify_pin(pin, credentials["hashed_pin"], bytes.fromhex(credentials["salt"]))
+
+
+def _load_quiz(quiz_id: str, cold: bool):
+    loader = data_manager.load_gk_quiz if quiz_id.startswith("gk_") else data_manager.load_math_story
+    if cold:
+        content_cache.get_content_cache().invalidate(content_cache.quiz_key(quiz_id))
+    return loader(quiz_id)
+
+
+def _render_dashboard(username: str, cold: bool):
+    """Runs the dashboard's data path: each subject's first page plus the analysis of the latest attempt."""
+    if cold:
+        content_cache.get_user_cache().clear()
+    pages = data_manager.get_recent_attempts_by_subject(username, {})
+    latest = max((attempts[0] for attempts in pages.values() if attempts), key=lambda a: a["timestamp"], default=None)
+    if latest:
+        home_dashboard.get_attempt_analysis(username, latest)
+
+
+def _admin_listing():
+    users, quizzes = async_db.gather(async_db.run(database_manager.get_all_documents, "users"),
+                                     async_db.run(database_manager.get_all_documents, "quizzes"))
+    return len(users), len(quizzes)
+
+
+def run_suite(args) -> dict:
+    rng = random.Random(args.seed)
+    db = database_manager.initialize_firestore()
+    if hasattr(db, "reset"):
+        db.reset()
+
+    seed_start = time.perf_counter()
+    catalog = synthetic.seed_catalog(rng, args.gk_topics, args.math_chapters, args.stories_per_chapter,
+                                     args.questions_per_quiz)
+    usernames = synthetic.seed_users(args.users)
+    synthetic.seed_attempts(rng, usernames, catalog, args.attempts_per_user)
+    seed_seconds = time.perf_counter() - seed_start
+
+    quiz_ids = list(catalog)
+    n = args.iterations
+    practice_index = practice.get_practice_index()
+    error_rates = practice.student_error_rates(usernames[0])
+    subjects = practice_index.children()
+    results = {
+        "login": time_operation(lambda i: _login(usernames[i % len(usernames)], synthetic.SYNTHETIC_PIN), n),
+        "quiz_load_cold": time_operation(lambda i: _load_quiz(quiz_ids[i % len(quiz_ids)], cold=True), n),
+        "quiz_load_cached": time_operation(lambda i: _load_quiz(quiz_ids[i % len(quiz_ids)], cold=False), n),
+        "submit": time_operation(lambda i: data_manager.save_attempt(synthetic.build_attempt(
+            rng, usernames[i % len(usernames)], catalog[quiz_ids[i % len(quiz_ids)]], datetime.now(timezone.utc),
+            quiz_ids[i % len(quiz_ids)])), n),
+        "dashboard_render_cold": time_operation(lambda i: _render_dashboard(usernames[i % len(usernames)], cold=True), n),
+        "dashboard_render": time_operation(lambda i: _render_dashboard(usernames[i % len(usernames)], cold=False), n),
+        "admin_listing": time_operation(lambda i: _admin_listing(), max(1, n // 10)),
+        "practice_select": time_operation(lambda i: practice_index.choose(
+            subjects[i % len(subjects)], error_rates, rng), n),
+    }
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "backend": "local" if database_manager.is_local_backend() else "firestore",
+            "params": vars(args) | {"compare": None, "output": None},
+            "seed_seconds": seed_seconds,
+            "backend_stats": dict(getattr(db, "stats", {})),
+        },
+        "results": results,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(report: dict, baseline: dict = None):
+    header = f"{'operation':<22}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}"
+    if baseline:
+        header += f"{'Δp50':>10}{'Δp99':>10}"
+    print(header)
+    for name, stats in report["results"].items():
+        line = f"{name:<22}{stats['throughput_per_s']:>10.1f}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+        old = (baseline or {}).get("results", {}).get(name)
+        if old:
+            line += f"{_pct_change(old['p50_ms'], stats['p50_ms']):>10}{_pct_change(old['p99_ms'], stats['p99_ms']):>10}"
+        print(line)
+
+
+def _pct_change(old: float, new: float) -> str:
+    return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline Learning App benchmark suite.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--attempts-per-user", type=int, default=100)
+    parser.add_argument("--gk-topics", type=int, default=10)
+    parser.add_argument("--math-chapters", type=int, default=5)
+    parser.add_argument("--stories-per-chapter", type=int, default=4)
+    parser.add_argument("--questions-per-quiz", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report to this path.")
+    parser.add_argument("--compare", help="A previous JSON report to compare against.")
+    args = parser.parse_args()
+
+    report = run_suite(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
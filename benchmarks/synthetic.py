@@ -0,0 +1,159 @@
+"""
+Synthetic catalog, user and attempt-history generators for the benchmark suite.
+
+Quizzes are produced in the same JSON shape the admin Smart Quiz Uploader
+accepts and are written through the real database_manager upload functions.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from modules import authentication, data_manager, database_manager, scoring
+
+GK_LEVELS = ["Foundation", "Intermediate", "Advanced", "Expert", "Grandmaster"]
+QUESTION_TOPICS = ["Animals", "Plants", "Space", "History", "Geography", "Sports"]
+MATH_TOPICS = ["Addition", "Subtraction", "Multiplication", "Measurement", "Money"]
+SYNTHETIC_PIN = "1234"
+
+
+def make_gk_quiz(rng: random.Random, topic_index: int, level: str, num_questions: int) -> dict:
+    questions = []
+    for q in range(num_questions):
+        options = [{"key": key, "text": f"Option {key} for question {q + 1}"} for key in "ABCD"]
+        questions.append({
+            "prompt": f"Synthetic GK question {q + 1} ({level})?",
+            "options": options,
+            "answer": rng.choice("ABCD"),
+            "topic": rng.choice(QUESTION_TOPICS),
+        })
+    return {
+        "subject": "GK",
+        "topic_id": f"topic{topic_index}",
+        "title": f"Synthetic Topic {topic_index}",
+        "level": level,
+        "background": "A synthetic quiz generated for benchmarking.",
+        "icon_legend": {"🧠": "Think carefully"},
+        "reward": "Well done!",
+        "questions": questions,
+    }
+
+
+def make_math_story(rng: random.Random, chapter: int, story: int, num_questions: int) -> dict:
+    questions = []
+    for q in range(num_questions):
+        q_type = rng.choice(["single_choice", "multi_choice", "text"])
+        question = {"id": f"q{q + 1}", "type": q_type, "prompt": f"Synthetic math question {q + 1}",
+                    "topic": rng.choice(MATH_TOPICS)}
+        if q_type == "text":
+            question["answer"] = str(rng.randint(1, 100))
+        else:
+            question["options"] = [{"key": key, "text": str(rng.randint(1, 100))} for key in "ABCD"]
+            question["answer"] = rng.choice("ABCD") if q_type == "single_choice" else sorted(rng.sample("ABCD", 2))
+        questions.append(question)
+    return {
+        "subject": "Math",
+        "chapter_id": chapter,
+        "story_id": story,
+        "title": f"Synthetic Chapter {chapter}",
+        "story_name": f"Synthetic Story {story}",
+        "story_file": f"story{story}.json",
+        "background": "A synthetic story generated for benchmarking.",
+        "icon_legend": {"🍎": "1 apple"},
+        "reward": "Great job!",
+        "questions": questions,
+    }
+
+
+def upload_quiz(quiz_content: dict) -> str:
+    """Uploads a quiz the same way the admin Smart Quiz Uploader does and returns its quiz id."""
+    if quiz_content["subject"] == "GK":
+        level = quiz_content["level"]
+        level_file = f"{level.lower().replace(' ', '_')}.json"
+        quiz_id = f"gk_{quiz_content['topic_id']}_{level_file.replace('.json', '')}"
+        database_manager.upload_gk_quiz(
+            quiz_id=quiz_id, quiz_data=quiz_content, topic_id=quiz_content["topic_id"],
+            topic_name=quiz_content["title"], level_file=level_file, level_name=level
+        )
+    else:
+        chapter_id_str = f"chapter{quiz_content['chapter_id']}"
+        quiz_id = f"math_{chapter_id_str}_story{quiz_content['story_id']}"
+        database_manager.upload_math_quiz(
+            quiz_id=quiz_id, quiz_data=quiz_content, chapter_id=chapter_id_str,
+            chapter_name=quiz_content["title"], story_file=quiz_content["story_file"],
+            story_name=quiz_content["story_name"]
+        )
+    return quiz_id
+
+
+def seed_catalog(rng: random.Random, gk_topics: int, math_chapters: int, stories_per_chapter: int,
+                 questions_per_quiz: int) -> dict:
+    """Uploads a synthetic catalog and returns {quiz_id: quiz_content}."""
+    catalog = {}
+    for topic in range(1, gk_topics + 1):
+        for level in GK_LEVELS:
+            quiz = make_gk_quiz(rng, topic, level, questions_per_quiz)
+            catalog[upload_quiz(quiz)] = quiz
+    for chapter in range(1, math_chapters + 1):
+        for story in range(1, stories_per_chapter + 1):
+            quiz = make_math_story(rng, chapter, story, questions_per_quiz)
+            catalog[upload_quiz(quiz)] = quiz
+    return catalog
+
+
+def seed_users(num_users: int) -> list:
+    """Creates synthetic users sharing one PIN hash so seeding stays fast."""
+    salt = authentication._generate_salt()
+    hashed_pin = authentication._hash_pin(SYNTHETIC_PIN, salt)
+    usernames = [f"student{i:05d}" for i in range(num_users)]
+    for username in usernames:
+        database_manager.create_user(username, salt.hex(), hashed_pin)
+    return usernames
+
+
+def random_answer(rng: random.Random, question: dict):
+    q_type = scoring.question_type(question)
+    if q_type == "multi_choice":
+        return sorted(rng.sample([opt["key"] for opt in question["options"]], 2))
+    if q_type == "text":
+        return question["answer"] if rng.random() < 0.6 else str(rng.randint(1, 100))
+    return rng.choice([opt["key"] for opt in question["options"]])
+
+
+def build_attempt(rng: random.Random, username: str, quiz_content: dict, timestamp: datetime,
+                  quiz_id: str = None) -> dict:
+    """Answers a quiz randomly and builds the attempt record the quiz views would save."""
+    questions_with_answers = []
+    for question in quiz_content["questions"]:
+        q_copy = question.copy()
+        q_copy["user_answer"] = random_answer(rng, question)
+        questions_with_answers.append(q_copy)
+    score = scoring.score_questions(quiz_content["questions"], [q["user_answer"] for q in questions_with_answers])
+
+    attempt = {
+        "student_name": username,
+        "subject": quiz_content["subject"],
+        "score": score,
+        "total_questions": len(questions_with_answers),
+        "timestamp": timestamp,
+        "quiz_id": quiz_id,
+        "questions": questions_with_answers,
+    }
+    if quiz_content["subject"] == "GK":
+        attempt["level"] = f"{quiz_content['title']} - {quiz_content['level']}"
+        attempt["topic"], attempt["level_name"] = quiz_content["title"], quiz_content["level"]
+    else:
+        attempt["level"] = quiz_content["title"]
+        attempt["story"] = quiz_content["story_name"]
+        attempt["topic"], attempt["level_name"] = quiz_content["title"], quiz_content["story_name"]
+    return attempt
+
+
+def seed_attempts(rng: random.Random, usernames: list, catalog: dict, attempts_per_user: int) -> int:
+    """Writes a history of attempts per user spread over the last year."""
+    quizzes = list(catalog.items())
+    now = datetime.now(timezone.utc)
+    for username in usernames:
+        for _ in range(attempts_per_user):
+            timestamp = now - timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+            quiz_id, quiz_content = rng.choice(quizzes)
+            data_manager.save_attempt(build_attempt(rng, username, quiz_content, timestamp, quiz_id))
+    return len(usernames) * attempts_per_user
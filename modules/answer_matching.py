@@ -0,0 +1,182 @@
+"""
+Answer matchers for free-text questions.
+
+A text question may add an "answer_spec" saying which answers count as correct:
+
+    {"type": "numeric", "tolerance": 0.01}            0.5, 0.50, 1/2 and .499 all match 0.5
+    {"type": "numeric", "relative": 0.05}             within 5% of the answer
+    {"type": "fraction", "simplest": true}            1/2 matches, 2/4 does not
+    {"type": "unit", "units": ["apples", "apple"]}    5, 5 apples, 5 Apples; "required": true needs the unit
+    {"type": "regex", "pattern": "x\\s*=\\s*4"}       the whole answer must match (case-insensitive)
+    {"type": "any_of", "forms": ["half", {"type": "numeric"}]}   any listed text or spec
+
+Numeric specs compare against the question's "answer" unless they give a "value", so
+they also fit generated template questions. Without a spec, an answer matches if its
+text equals the answer's, ignoring case and surrounding space, or if both are numbers
+of exactly equal value ("0.50" and "0.5").
+
+A spec is compiled once into a closure. Compiled quizzes keep one per question (see
+quiz_content.CompiledQuiz.matchers) and everything else, such as scoring stored
+attempts for the dashboard or an export, goes through matcher_for's bounded cache, so
+a batch of answers never re-parses a spec.
+"""
+import functools
+import json
+import math
+import re
+from fractions import Fraction
+from modules.exceptions import AnswerSpecError
+
+SPEC_TYPES = ("numeric", "fraction", "unit", "regex", "any_of")
+# Answers longer than this never match; it keeps regex specs cheap on pasted text.
+MAX_ANSWER_LENGTH = 200
+# Distinct (spec, answer) pairs whose matchers stay compiled for scoring stored attempts.
+MAX_CACHED_MATCHERS = 4096
+
+_NUMBER = re.compile(r"[-+]?(\d+(\.\d*)?|\.\d+)")
+_THOUSANDS = re.compile(r"[-+]?\d{1,3}(,\d{3})+(\.\d*)?")
+_MIXED = re.compile(r"([-+]?)(\d+)\s+(\d+)\s*/\s*(\d+)")
+_FRACTION = re.compile(r"([-+]?\d+)\s*/\s*([-+]?\d+)")
+# A number followed by optional text, e.g. "5 apples" or "2.5cm"
+_NUMBER_WITH_UNIT = re.compile(r"(?P<number>[-+]?[\d.,]+(\s+\d+\s*/\s*\d+|\s*/\s*\d+)?)\s*(?P<unit>.*)")
+
+def _normalize(text) -> str:
+    return " ".join(str(text).split()).lower()
+
+def parse_number(text):
+    """Parses a decimal, fraction ("3/4"), mixed number ("1 1/2") or "1,000" into a Fraction; None if it is none of them."""
+    text = str(text).strip()
+    if _THOUSANDS.fullmatch(text):
+        text = text.replace(",", "")
+    if _NUMBER.fullmatch(text):
+        return Fraction(text)
+    if m := _MIXED.fullmatch(text):
+        sign, whole, num, den = m.groups()
+        if int(den) == 0:
+            return None
+        value = int(whole) + Fraction(int(num), int(den))
+        return -value if sign == "-" else value
+    if m := _FRACTION.fullmatch(text):
+        num, den = int(m.group(1)), int(m.group(2))
+        return Fraction(num, den) if den else None
+    return None
+
+def _is_simplest(text: str) -> bool:
+    m = _MIXED.fullmatch(text) or _FRACTION.fullmatch(text)
+    if not m:
+        return True  # Whole numbers and decimals have no fraction to reduce
+    num, den = int(m.groups()[-2]), int(m.groups()[-1])
+    return math.gcd(num, den) == 1
+
+def _expected_number(spec: dict, answer, label: str) -> Fraction:
+    source = spec.get("value", answer)
+    value = parse_number(source) if isinstance(source, str) else (
+        Fraction(str(source)) if isinstance(source, (int, float)) and not isinstance(source, bool) else None)
+    if value is None:
+        raise AnswerSpecError(f"{label}: {source!r} is not a number")
+    return value
+
+def _margin(spec: dict, label: str) -> tuple:
+    margins = []
+    for name in ("tolerance", "relative"):
+        value = spec.get(name, 0)
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+            raise AnswerSpecError(f"{label}: {name} must be a number of at least 0")
+        margins.append(Fraction(str(value)))
+    return tuple(margins)
+
+def _number_matcher(expected: Fraction, tolerance: Fraction, relative: Fraction):
+    allowed = max(tolerance, relative * abs(expected))
+    return lambda value: value is not None and abs(value - expected) <= allowed
+
+def _compile_text(answer):
+    expected_text = _normalize(answer)
+    expected_number = parse_number(answer)
+    def match(user_answer) -> bool:
+        text = _normalize(user_answer)
+        if text == expected_text:
+            return True
+        return expected_number is not None and parse_number(text) == expected_number
+    return match
+
+def _compile_numeric(spec: dict, answer, label: str):
+    within = _number_matcher(_expected_number(spec, answer, label), *_margin(spec, label))
+    return lambda user_answer: within(parse_number(user_answer))
+
+def _compile_fraction(spec: dict, answer, label: str):
+    expected = _expected_number(spec, answer, label)
+    simplest = bool(spec.get("simplest"))
+    def match(user_answer) -> bool:
+        text = str(user_answer).strip()
+        return parse_number(text) == expected and (not simplest or _is_simplest(text))
+    return match
+
+def _compile_unit(spec: dict, answer, label: str):
+    units = spec.get("units")
+    if not isinstance(units, list) or not units or not all(isinstance(unit, str) and unit.strip() for unit in units):
+        raise AnswerSpecError(f"{label}: units must be a non-empty list of strings")
+    accepted = {_normalize(unit) for unit in units}
+    required = bool(spec.get("required"))
+    expected_text = _normalize(spec.get("value", answer))
+    for unit in sorted(accepted, key=len, reverse=True):  # "5 apples" as an answer: strip its unit
+        if expected_text.endswith(unit) and expected_text != unit:
+            expected_text = expected_text[:-len(unit)].strip()
+            break
+    within = _number_matcher(_expected_number({"value": expected_text}, None, label), *_margin(spec, label))
+    def match(user_answer) -> bool:
+        m = _NUMBER_WITH_UNIT.fullmatch(_normalize(user_answer))
+        if not m:
+            return False
+        unit = m.group("unit")
+        if (unit and unit not in accepted) or (required and not unit):
+            return False
+        return within(parse_number(m.group("number")))
+    return match
+
+def _compile_regex(spec: dict, label: str):
+    pattern = spec.get("pattern")
+    if not isinstance(pattern, str) or not pattern:
+        raise AnswerSpecError(f"{label}: pattern must be a non-empty string")
+    try:
+        compiled = re.compile(pattern, 0 if spec.get("case_sensitive") else re.IGNORECASE)
+    except re.error as e:
+        raise AnswerSpecError(f"{label}: invalid pattern ({e})") from None
+    return lambda user_answer: compiled.fullmatch(" ".join(str(user_answer).split())) is not None
+
+def _compile_any_of(spec: dict, answer, label: str):
+    forms = spec.get("forms")
+    if not isinstance(forms, list) or not forms:
+        raise AnswerSpecError(f"{label}: forms must be a non-empty list")
+    matchers = [compile_spec(form, answer, f"{label}.forms[{i}]") if isinstance(form, dict) else
+                _compile_text(form) for i, form in enumerate(forms)]
+    return lambda user_answer: any(match(user_answer) for match in matchers)
+
+def compile_spec(spec, answer, label: str = "answer_spec"):
+    """Compiles an answer spec (or None, for the default) into match(user_answer) -> bool; raises AnswerSpecError."""
+    if spec is None:
+        match = _compile_text(answer)
+    else:
+        if not isinstance(spec, dict) or spec.get("type") not in SPEC_TYPES:
+            raise AnswerSpecError(f"{label}: type must be one of {', '.join(SPEC_TYPES)}")
+        kind = spec["type"]
+        if kind == "numeric":
+            match = _compile_numeric(spec, answer, label)
+        elif kind == "fraction":
+            match = _compile_fraction(spec, answer, label)
+        elif kind == "unit":
+            match = _compile_unit(spec, answer, label)
+        elif kind == "regex":
+            match = _compile_regex(spec, label)
+        else:
+            match = _compile_any_of(spec, answer, label)
+    return lambda user_answer: (user_answer is not None and len(str(user_answer)) <= MAX_ANSWER_LENGTH
+                                and match(user_answer))
+
+@functools.lru_cache(maxsize=MAX_CACHED_MATCHERS)
+def _cached_matcher(spec_json: str, answer: str):
+    return compile_spec(json.loads(spec_json), answer)
+
+def matcher_for(question) -> callable:
+    """The compiled matcher for a text question's answer and answer_spec, shared by equal questions."""
+    spec = question.get("answer_spec")
+    return _cached_matcher(json.dumps(spec, sort_keys=True, default=dict), str(question.get("answer")))
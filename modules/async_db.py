@@ -0,0 +1,43 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from modules import database_manager
+
+# Blocking Firestore calls run on this many threads so a page's reads overlap instead of queueing.
+MAX_IO_WORKERS = 16
+
+@st.cache_resource
+def get_io_executor() -> ThreadPoolExecutor:
+    """Returns the process-wide pool that runs blocking Firestore calls for the async helpers."""
+    return ThreadPoolExecutor(max_workers=MAX_IO_WORKERS, thread_name_prefix="firestore-io")
+
+def _call_with_context(ctx, fn, args, kwargs):
+    # Attach the caller's script context so st.cache_* and st.toast behave as on the script thread
+    thread = threading.current_thread()
+    add_script_run_ctx(thread, ctx)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        add_script_run_ctx(thread, None)
+
+async def run(fn, *args, **kwargs):
+    """Runs a blocking data-access call (e.g. any database_manager function) on the I/O pool and awaits it."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    call = functools.partial(_call_with_context, ctx, fn, args, kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_io_executor(), call)
+
+async def get_many(collection_name: str, doc_ids: list) -> dict:
+    """Fetches documents by id with one multi-get round trip; returns {doc_id: data or None}."""
+    return await run(database_manager.get_documents, collection_name, doc_ids)
+
+def gather(*awaitables, return_exceptions: bool = False) -> list:
+    """
+    Awaits the given reads concurrently from synchronous view code and returns their results
+    in order, so a page pays the slowest read's latency rather than the sum of all of them.
+    """
+    async def _gather():
+        return await asyncio.gather(*awaitables, return_exceptions=return_exceptions)
+    return asyncio.run(_gather())
@@ -0,0 +1,202 @@
+"""
+Compaction of old attempt history into monthly rollups.
+
+Attempts older than COMPACT_AFTER_DAYS are folded into one document per calendar month,
+users/{username}/attempt_rollups/{YYYY-MM}, and deleted from users/{username}/attempts.
+A rollup keeps the month's aggregate stats (the same score/total/attempts series as the
+progress documents, plus per-topic question counts) and every attempt in compressed form:
+each distinct question is stored once per month and each attempt keeps only its own
+fields, question numbers and answer vector, zlib-compressed. A month too large for one
+Firestore document is split into parts ({YYYY-MM}.1, {YYYY-MM}.2, ...).
+
+Compaction works on whole months before the cutoff, so the class dashboard's periods
+(up to a year) keep reading live attempts. Dashboard history pages and exports read
+rollups after the live attempts run out (see data_manager.get_student_attempts and
+export.export_pages). Progress documents are untouched.
+
+    python -m modules.attempt_rollups --older-than-days 365
+    python -m modules.attempt_rollups --user alice --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+import zlib
+from datetime import datetime, timedelta
+from modules import data_manager, database_manager, scoring
+
+# Attempts older than this many days (rounded back to the start of a month) are compacted.
+COMPACT_AFTER_DAYS = int(os.environ.get("LEARNING_APP_COMPACT_AFTER_DAYS", "365"))
+# Compressed attempt bytes per rollup document; Firestore documents are limited to 1 MiB.
+MAX_ROLLUP_BYTES = 900_000
+# Attempts read per Firestore query while compacting.
+COMPACT_PAGE_SIZE = 500
+ROLLUP_FORMAT = 1
+
+# --- Encoding ---
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__} in a rollup")
+
+def _decode_value(obj: dict):
+    return datetime.fromisoformat(obj["__datetime__"]) if set(obj) == {"__datetime__"} else obj
+
+def encode_attempts(attempts: list) -> bytes:
+    """Compresses attempts, storing each distinct question once and per attempt only its answers."""
+    questions, numbers, encoded = [], {}, []
+    for attempt in attempts:
+        fields = {key: value for key, value in attempt.items() if key not in ("questions", "filename", "compacted")}
+        refs, answers = [], []
+        for question in attempt.get("questions") or []:
+            shared = {key: value for key, value in question.items() if key != "user_answer"}
+            key = json.dumps(shared, sort_keys=True, default=_encode_value)
+            if key not in numbers:
+                numbers[key] = len(questions)
+                questions.append(shared)
+            refs.append(numbers[key])
+            answers.append(question.get("user_answer"))
+        encoded.append({"id": attempt["filename"], "fields": fields, "q": refs, "a": answers})
+    payload = {"questions": questions, "attempts": encoded}
+    return zlib.compress(json.dumps(payload, default=_encode_value, separators=(",", ":")).encode("utf-8"), 9)
+
+def decode_attempts(data: bytes) -> list:
+    """Restores the attempts of encode_attempts, oldest first, each with `filename` and `compacted` set."""
+    payload = json.loads(zlib.decompress(data), object_hook=_decode_value)
+    questions = payload["questions"]
+    return [dict(item["fields"], filename=item["id"], compacted=True,
+                 questions=[dict(questions[number], user_answer=answer) for number, answer in zip(item["q"], item["a"])])
+            for item in payload["attempts"]]
+
+# --- Rollups ---
+def month_of(timestamp) -> str:
+    """The local calendar month ("YYYY-MM") an attempt counts towards, as on the dashboard."""
+    return data_manager.attempt_datetime(timestamp).astimezone().strftime("%Y-%m")
+
+def compaction_cutoff(older_than_days: int = COMPACT_AFTER_DAYS, now: datetime = None) -> datetime:
+    """The start of the month containing now - older_than_days; attempts before it are compacted."""
+    moment = (now or datetime.now().astimezone()) - timedelta(days=older_than_days)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def summarize(attempts: list) -> dict:
+    """Aggregate stats for a rollup: totals, progress series and per-topic question counts."""
+    series, topics = {}, {}
+    for attempt in attempts:
+        for key in data_manager.progress_series_keys(attempt):
+            stats = series.setdefault(key, {"score": 0, "total": 0, "attempts": 0})
+            stats["score"] += attempt.get("score", 0)
+            stats["total"] += attempt.get("total_questions", 0)
+            stats["attempts"] += 1
+        for topic, counts in scoring.topic_scores(attempt.get("questions") or []).items():
+            entry = topics.setdefault(topic, {"correct": 0, "total": 0})
+            entry["correct"] += counts["correct"]
+            entry["total"] += counts["total"]
+    timestamps = [data_manager.attempt_datetime(attempt["timestamp"]) for attempt in attempts]
+    return {
+        "attempts": len(attempts),
+        "score": sum(attempt.get("score", 0) for attempt in attempts),
+        "total": sum(attempt.get("total_questions", 0) for attempt in attempts),
+        "time_taken": sum(attempt.get("time_taken") or 0 for attempt in attempts),
+        "first": min(timestamps),
+        "last": max(timestamps),
+        "series": series,
+        "topics": topics,
+    }
+
+def _split(attempts: list) -> list:
+    """Encodes attempts into as few parts as keep each under MAX_ROLLUP_BYTES: [(attempts, data)]."""
+    data = encode_attempts(attempts)
+    if len(data) <= MAX_ROLLUP_BYTES or len(attempts) == 1:
+        return [(attempts, data)]
+    middle = len(attempts) // 2
+    return _split(attempts[:middle]) + _split(attempts[middle:])
+
+def build_rollups(month: str, attempts: list) -> dict:
+    """Returns {doc_id: rollup document} for one month's attempts, oldest first."""
+    rollups = {}
+    for part, (chunk, data) in enumerate(_split(attempts)):
+        rollups[month if part == 0 else f"{month}.{part}"] = {
+            "month": month, "part": part, "format": ROLLUP_FORMAT, "data": data, **summarize(chunk),
+        }
+    return rollups
+
+def rollup_attempts(rollups: list) -> list:
+    """Decodes rollup documents into their attempts, newest first."""
+    attempts = [attempt for rollup in rollups for attempt in decode_attempts(bytes(rollup["data"]))]
+    return sorted(attempts, key=lambda attempt: data_manager.attempt_datetime(attempt["timestamp"]), reverse=True)
+
+def load_compacted_attempts(username: str) -> list:
+    """Every attempt held in the user's rollups, newest first."""
+    return rollup_attempts(database_manager.get_attempt_rollups(username))
+
+# --- Compaction ---
+def compact_user(username: str, older_than_days: int = COMPACT_AFTER_DAYS, dry_run: bool = False,
+                 page_size: int = COMPACT_PAGE_SIZE) -> dict:
+    """
+    Folds the user's attempts from before the cutoff into monthly rollups, one month at a
+    time, merging with rollups already written for that month. Returns counts of the
+    attempts compacted, months touched and rollup documents written.
+    """
+    data_manager.migrate_attempt_timestamps(username)  # Range queries skip legacy string timestamps
+    cutoff = compaction_cutoff(older_than_days)
+    summary = {"attempts": 0, "months": 0, "documents": 0}
+    existing = None
+    month, pending = None, []
+
+    def _flush():
+        stored = [rollup for rollup in existing if rollup["month"] == month]
+        merged = {attempt["filename"]: attempt for attempt in rollup_attempts(stored)}
+        merged.update((attempt["filename"], attempt) for attempt in pending)
+        attempts = sorted(merged.values(), key=lambda attempt: data_manager.attempt_datetime(attempt["timestamp"]))
+        rollups = build_rollups(month, attempts)
+        summary["attempts"] += len(pending)
+        summary["months"] += 1
+        summary["documents"] += len(rollups)
+        if not dry_run:
+            database_manager.write_attempt_rollups(
+                username, rollups, stale_rollup_ids=[rollup["id"] for rollup in stored if rollup["id"] not in rollups],
+                attempt_ids=[attempt["filename"] for attempt in pending])
+
+    for page in database_manager.iter_attempt_pages(username, page_size, end=cutoff):
+        if existing is None:
+            existing = database_manager.get_attempt_rollups(username, first_month=month_of(page[0]["timestamp"]))
+        for attempt in page:
+            attempt_month = month_of(attempt["timestamp"])
+            if attempt_month != month and pending:
+                _flush()
+                pending = []
+            month = attempt_month
+            pending.append(attempt)
+    if pending:
+        _flush()
+    if summary["attempts"] and not dry_run:
+        data_manager.invalidate_attempt_history(username)
+    return summary
+
+def compact_all(usernames: list = None, older_than_days: int = COMPACT_AFTER_DAYS, dry_run: bool = False) -> dict:
+    """Compacts every listed user (default: all users) and returns the summed counts."""
+    totals = {"users": 0, "attempts": 0, "months": 0, "documents": 0}
+    for username in usernames if usernames is not None else database_manager.get_usernames():
+        summary = compact_user(username, older_than_days, dry_run)
+        totals["users"] += 1 if summary["attempts"] else 0
+        for key, value in summary.items():
+            totals[key] += value
+    return totals
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fold old quiz attempts into monthly rollup documents.")
+    parser.add_argument("--older-than-days", type=int, default=COMPACT_AFTER_DAYS,
+                        help="Compact whole months older than this many days")
+    parser.add_argument("--user", action="append", default=None, help="Only compact this student (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be compacted without writing")
+    args = parser.parse_args(argv)
+
+    database_manager.initialize_firestore()
+    totals = compact_all(args.user, args.older_than_days, args.dry_run)
+    verb = "Would compact" if args.dry_run else "Compacted"
+    print(f"{verb} {totals['attempts']} attempts of {totals['users']} students into "
+          f"{totals['documents']} rollup documents ({totals['months']} months).")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
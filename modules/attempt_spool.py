@@ -0,0 +1,89 @@
+import glob
+import itertools
+import json
+import os
+import threading
+from datetime import datetime
+
+# Attempts that could not be written while Firestore was unavailable wait here, one JSON
+# line each, until data_manager.flush_attempt_spool replays them. Each record carries its
+# attempt id, and an attempt is written in one batch with its progress and leaderboard
+# updates, so a replay skips attempts that already exist and never double-counts.
+SPOOL_PATH = os.environ.get("LEARNING_APP_SPOOL", "attempt_spool.jsonl")
+
+_lock = threading.Lock()
+_claim_ids = itertools.count()
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot spool {type(value).__name__}")
+
+def _decode(obj: dict):
+    return datetime.fromisoformat(obj["__datetime__"]) if set(obj) == {"__datetime__"} else obj
+
+def append(record: dict, path: str = SPOOL_PATH):
+    """Durably appends one pending save."""
+    line = json.dumps(record, default=_encode, ensure_ascii=False)
+    with _lock, open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def pending_count(path: str = SPOOL_PATH) -> int:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
+    except FileNotFoundError:
+        return 0
+
+def drain(replay, path: str = SPOOL_PATH) -> int:
+    """
+    Replays every spooled record with replay(record), oldest first, and returns how many
+    succeeded. The spool is claimed by renaming it, so only one thread or process replays a
+    given record; records whose replay raises are appended back for the next drain.
+    """
+    replayed = 0
+    for claimed in _abandoned_claims(path) + [_claim(path)]:
+        if claimed is None:
+            continue
+        with open(claimed, encoding="utf-8") as f:
+            records = [json.loads(line, object_hook=_decode) for line in f if line.strip()]
+        for position, record in enumerate(records):
+            try:
+                replay(record)
+            except Exception:
+                for remaining in records[position:]:
+                    append(remaining, path)
+                break
+            replayed += 1
+        os.remove(claimed)
+    return replayed
+
+def _claim(path: str, source: str = None):
+    claimed = f"{path}.{os.getpid()}.{threading.get_ident()}.{next(_claim_ids)}.draining"
+    try:
+        os.replace(source or path, claimed)
+    except FileNotFoundError:
+        return None
+    return claimed
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _abandoned_claims(path: str) -> list:
+    """Re-claims spools left by drains in processes that died; their replays are safe to repeat."""
+    claims = []
+    for leftover in glob.glob(glob.escape(path) + ".*.draining"):
+        pid = leftover[len(path) + 1:].split(".", 1)[0]
+        if pid.isdigit() and not _process_alive(int(pid)):
+            claimed = _claim(path, leftover)
+            if claimed:
+                claims.append(claimed)
+    return claims
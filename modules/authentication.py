@@ -20,6 +20,35 @@ def _verify_pin(pin: str, hashed_pin: str, salt: bytes) -> bool:
     """Verifies a PIN against the stored hex-encoded hash."""
     return _hash_pin(pin, salt) == hashed_pin
 
+# --- Roles ---
+ROLES = ("student", "teacher", "admin")
+
+def load_roles(username: str, user_data: dict):
+    """
+    Caches the user's role, class and (for teachers) taught classes in the session, so
+    permission checks on later reruns read no documents. Called once at login; role or
+    class changes made by an admin apply from the user's next login.
+    """
+    # Accounts created before roles existed: the "admin" account keeps its access
+    role = user_data.get("role") or ("admin" if username == "admin" else "student")
+    st.session_state.role = role
+    st.session_state.group_id = user_data.get("group_id")
+    st.session_state.teacher_groups = (database_manager.get_teacher_groups(username)
+                                       if role == "teacher" else {})
+
+def is_admin() -> bool:
+    return st.session_state.get("role") == "admin"
+
+def is_teacher() -> bool:
+    """True for teachers and admins, who may open the class dashboard."""
+    return st.session_state.get("role") in ("teacher", "admin")
+
+def visible_groups() -> dict:
+    """Returns {group_id: group document} for the classes the current user may see."""
+    if is_admin():
+        return database_manager.get_groups()
+    return st.session_state.get("teacher_groups") or {}
+
 # --- Streamlit Views ---
 
 def initialize_session_state():
@@ -31,13 +60,17 @@ def initialize_session_state():
         "selected_subject": None,
         "selected_chapter": None,
         "selected_story": None,
-        "questions": [],
-        "user_answers": {},
+        "active_quiz_id": None,
+        "active_quiz_version": None,
+        "user_answers": [],
         "score": 0,
         "time_taken": 0,
         "start_time": None,
         "quiz_finished": False,
         "logged_in": False,
+        "role": "student",
+        "group_id": None,
+        "teacher_groups": {},
         "selected_attempt_file": None
     }
     for key, value in state_defaults.items():
@@ -82,6 +115,7 @@ def render_register_view():
                     hashed_pin = _hash_pin(pin, salt)
                     database_manager.create_user(username, salt.hex(), hashed_pin)
                     
+                    load_roles(username, {})
                     st.session_state.student_name = username
                     st.session_state.logged_in = True
                     st.success("Account created successfully! You are now logged in.")
@@ -121,6 +155,7 @@ def render_login_view():
                         salt = bytes.fromhex(credentials['salt'])
                         hashed_pin_from_db = credentials['hashed_pin']
                         if _verify_pin(pin, hashed_pin_from_db, salt):
+                            load_roles(username, credentials)
                             st.session_state.student_name = username
                             st.session_state.logged_in = True
                             st.success("Login successful!")
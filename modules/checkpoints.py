@@ -0,0 +1,134 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import streamlit as st
+from modules import content_cache, database_manager
+
+# Minimum seconds between two checkpoint writes for the same quiz; changes in between coalesce.
+CHECKPOINT_INTERVAL_SECONDS = 10.0
+# Checkpoints older than this are no longer offered for resumption.
+CHECKPOINT_TTL_DAYS = 7
+
+class CheckpointWriter:
+    """
+    Debounces and coalesces in-progress quiz checkpoints. Answer changes only replace the
+    pending record for (username, quiz_id) in memory; a background thread writes a key
+    CHECKPOINT_INTERVAL_SECONDS after its first change and then at most once per interval,
+    always its latest record, batching all keys that fall due together. A quiz answered for
+    a minute costs about six small writes, and one abandoned within seconds costs none.
+    Submitting deletes the stored checkpoint in the attempt's own write batch (see
+    database_manager.save_attempt). Like the prefetcher, the thread gets the Firestore
+    client and cache up front and never calls Streamlit.
+    """
+
+    def __init__(self, db, user_cache, interval: float = CHECKPOINT_INTERVAL_SECONDS):
+        self._db = db
+        self._user_cache = user_cache
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = {}  # (username, quiz_id) -> checkpoint, or None to delete it
+        self._due = {}  # (username, quiz_id) -> monotonic time its pending record may be written
+        self._last_write = {}  # (username, quiz_id) -> monotonic time of its last write, for one interval
+        self._writing = set()
+        self._discarded = set()  # Keys finished while their checkpoint was being written
+        self._thread = None
+
+    def schedule(self, username: str, quiz_id: str, checkpoint: dict):
+        """Queues the latest state of a quiz; no I/O happens on the calling thread."""
+        key = (username, quiz_id)
+        with self._lock:
+            self._pending[key] = checkpoint
+            self._due.setdefault(key, self._last_write.get(key, time.monotonic()) + self._interval)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="quiz-checkpoints", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def discard(self, username: str, quiz_id: str):
+        """Drops a finished quiz's queued checkpoint so it is never written after the submission."""
+        key = (username, quiz_id)
+        with self._lock:
+            self._pending.pop(key, None)
+            self._due.pop(key, None)
+            if key in self._writing:
+                self._discarded.add(key)
+
+    def pending(self, username: str) -> dict:
+        """The user's queued checkpoints, {quiz_id: checkpoint or None}, newer than what is stored."""
+        with self._lock:
+            return {quiz_id: checkpoint for (user, quiz_id), checkpoint in self._pending.items() if user == username}
+
+    def flush(self, force: bool = True) -> float:
+        """
+        Writes every due key (all of them if force) in one batch and returns the seconds until
+        the next key falls due, or None if nothing is pending. Failed writes stay pending.
+        """
+        now = time.monotonic()
+        with self._lock:
+            due = {key: self._pending.pop(key) for key in [key for key, at in self._due.items() if force or at <= now]}
+            for key in due:
+                del self._due[key]
+            self._writing.update(due)
+        if due:
+            try:
+                database_manager.write_checkpoints([(*key, checkpoint) for key, checkpoint in due.items()], db=self._db)
+            except Exception:
+                with self._lock:
+                    self._writing.difference_update(due)
+                    for key, checkpoint in due.items():
+                        if key not in self._pending:  # A newer record wins
+                            self._pending[key], self._due[key] = checkpoint, now + self._interval
+                return self._interval
+            with self._lock:
+                self._writing.difference_update(due)
+                for key, checkpoint in due.items():
+                    self._last_write[key] = now
+                    if key in self._discarded:  # The quiz was submitted mid-write; remove what landed
+                        self._discarded.discard(key)
+                        self._pending[key], self._due[key] = None, now
+            for username in {username for username, _ in due}:
+                self._user_cache.invalidate(content_cache.checkpoints_key(username))
+        with self._lock:
+            # Write times older than the interval no longer delay anything
+            for key in [key for key, written in self._last_write.items() if now - written >= self._interval]:
+                del self._last_write[key]
+            if not self._due:
+                return None
+            return max(min(self._due.values()) - now, 0.0)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while (delay := self.flush(force=False)) is not None:
+                self._wake.wait(delay)
+                self._wake.clear()
+
+@st.cache_resource
+def get_checkpoint_writer() -> CheckpointWriter:
+    """Returns the process-wide checkpoint writer."""
+    return CheckpointWriter(database_manager.initialize_firestore(), content_cache.get_user_cache())
+
+def delete_checkpoint(username: str, quiz_id: str):
+    """Removes an unfinished quiz the student chose not to resume."""
+    get_checkpoint_writer().discard(username, quiz_id)
+    database_manager.write_checkpoints([(username, quiz_id, None)])
+    content_cache.get_user_cache().invalidate(content_cache.checkpoints_key(username))
+
+def load_checkpoints(username: str) -> dict:
+    """
+    Returns {quiz_id: checkpoint} for the user's unfinished quizzes that are recent enough
+    to resume: the stored checkpoints (cached per user) overlaid with any still queued here.
+    """
+    writer = get_checkpoint_writer()
+    stored = content_cache.get_user_cache().get_or_load(
+        content_cache.checkpoints_key(username), lambda: database_manager.get_checkpoints(username))
+    checkpoints = dict(stored)
+    for quiz_id, checkpoint in writer.pending(username).items():
+        if checkpoint is None:
+            checkpoints.pop(quiz_id, None)
+        else:
+            checkpoints[quiz_id] = checkpoint
+    cutoff = datetime.now(timezone.utc) - timedelta(days=CHECKPOINT_TTL_DAYS)
+    return {quiz_id: checkpoint for quiz_id, checkpoint in checkpoints.items() if checkpoint["updated"] >= cutoff}
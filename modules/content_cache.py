@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+import streamlit as st
+
+# Upper bound on compiled quizzes (and other immutable content) kept per process.
+MAX_CONTENT_ENTRIES = 512
+# Upper bound on per-user derived data (grouped attempts, dashboard analyses) kept per process.
+MAX_USER_ENTRIES = 2048
+# Upper bound on generated Math worksheets kept per process; they are cheap to regenerate.
+MAX_WORKSHEET_ENTRIES = 256
+# Seconds a user's attempts, progress and review queue stay cached. Saves in this process
+# invalidate them at once; this bounds how stale they get after a save elsewhere (another
+# server process or a spool replay).
+USER_DATA_TTL_SECONDS = 60
+
+class ContentCache:
+    """
+    A thread-safe, bounded LRU cache for immutable quiz content shared by every
+    session in the process. Values are returned by reference, never copied, so
+    callers must treat them as read-only. An entry put with a ttl expires after that
+    many seconds.
+    """
+
+    def __init__(self, max_entries: int = MAX_CONTENT_ENTRIES):
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            if key in self._expiry and time.monotonic() >= self._expiry[key]:
+                del self._entries[key], self._expiry[key]
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value, ttl: float = None):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if ttl is None:
+                self._expiry.pop(key, None)
+            else:
+                self._expiry[key] = time.monotonic() + ttl
+            while len(self._entries) > self._max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._expiry.pop(evicted, None)
+
+    def get_or_load(self, key, loader, ttl: float = None):
+        """Returns the cached value for key, calling loader() on a miss. None results are not cached."""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.put(key, value, ttl)
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._expiry.pop(key, None)
+
+    def invalidate_prefix(self, prefix: tuple):
+        """Drops every tuple key that starts with prefix, e.g. all cached ranges for one user."""
+        with self._lock:
+            for key in [k for k in self._entries if k[:len(prefix)] == prefix]:
+                del self._entries[key]
+                self._expiry.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expiry.clear()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+def quiz_key(quiz_id: str) -> tuple:
+    """Cache key for a compiled quiz."""
+    return ("quiz", quiz_id)
+
+def attempts_key(username: str, subject: str = None, limit: int = None) -> tuple:
+    """Cache key for a page of a user's attempts in one subject; with only `username` it is the prefix of every page."""
+    return ("attempts", username) if subject is None else ("attempts", username, subject, limit)
+
+def timestamps_checked_key(username: str) -> tuple:
+    """Marks that a user's legacy attempt timestamps have been migrated in this process."""
+    return ("timestamps_checked", username)
+
+def analysis_key(username: str, attempt_id: str) -> tuple:
+    """Cache key for the dashboard analysis of one (immutable) attempt."""
+    return ("analysis", username, attempt_id)
+
+def progress_key(username: str, since=None) -> tuple:
+    """Cache key for a user's progress series since a date; without `since` it is the prefix of every range."""
+    return ("progress", username) if since is None else ("progress", username, since)
+
+def checkpoints_key(username: str) -> tuple:
+    """Cache key for a user's stored in-progress quiz checkpoints."""
+    return ("checkpoints", username)
+
+def group_attempts_key(group_id: str, since=None) -> tuple:
+    """Cache key for a class's attempts since a date; without `since` it is the prefix of every range."""
+    return ("group_attempts", group_id) if since is None else ("group_attempts", group_id, since)
+
+def rollups_key(username: str) -> tuple:
+    """Cache key for the attempts a user's monthly rollups hold (see attempt_rollups)."""
+    return ("rollups", username)
+
+def review_key(username: str) -> tuple:
+    """Cache key for a user's spaced-repetition review queue."""
+    return ("review", username)
+
+def worksheet_key(quiz_id: str, version: str, seed: int) -> tuple:
+    """Cache key for a worksheet generated from one version of a quiz."""
+    return ("worksheet", quiz_id, version, seed)
+
+def practice_index_key() -> tuple:
+    """Cache key for the adaptive practice index built from the whole catalog."""
+    return ("practice_index",)
+
+@st.cache_resource
+def get_content_cache() -> ContentCache:
+    """Returns the process-wide content cache."""
+    return ContentCache()
+
+@st.cache_resource
+def get_user_cache() -> ContentCache:
+    """Returns the process-wide cache of per-user derived data."""
+    return ContentCache(max_entries=MAX_USER_ENTRIES)
+
+@st.cache_resource
+def get_practice_cache() -> ContentCache:
+    """Returns the process-wide slot for the practice index, kept apart so quiz traffic never evicts it."""
+    return ContentCache(max_entries=1)
+
+@st.cache_resource
+def get_worksheet_cache() -> ContentCache:
+    """Returns the process-wide cache of generated worksheets, kept apart so they never evict quizzes."""
+    return ContentCache(max_entries=MAX_WORKSHEET_ENTRIES)
@@ -0,0 +1,273 @@
+"""
+A packed, memory-mapped snapshot of the quiz catalog for read-only serving.
+
+The builder writes every subject index and quiz document into one file:
+
+    header    HEADER: magic, format version, entry count, table offset and length
+    entries   one UTF-8 JSON document per index and quiz, back to back
+    table     JSON {"built_at", "indices": {subject: [offset, length, version]},
+                    "quizzes": {quiz_id: [offset, length, version]}}
+
+Each server process maps the file read-only, so its pages are shared by every process
+on the machine through the OS page cache; reading a quiz is a slice of the mapping and
+one JSON decode. Freshness comes from the meta/content document, which the admin upload
+paths keep at the current version of every quiz and index: an entry is served from the
+snapshot only while its version matches, otherwise callers fall back to Firestore.
+While Firestore is unreachable the last known versions are used, or, before any were
+read, the snapshot is served unverified and those entries are re-checked on recovery.
+
+    python -m modules.content_snapshot build [path]
+    python -m modules.content_snapshot info [path]
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+import streamlit as st
+from modules import database_manager, quiz_content
+from modules.exceptions import BackendUnavailableError
+
+SNAPSHOT_PATH = os.environ.get("LEARNING_APP_SNAPSHOT", "content.snapshot")
+# Magic, format version, reserved, entry count, table offset, table length.
+HEADER = struct.Struct("<8sHHIQQ")
+MAGIC = b"QZSNAP\x00\x00"
+FORMAT_VERSION = 1
+# Seconds between reads of the meta/content version document.
+VERSION_CHECK_SECONDS = 30
+
+class ContentSnapshot:
+    """A read-only view of one snapshot file. Raises ValueError for files it cannot read."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"{path} is not a content snapshot")
+        magic, format_version, _, count, table_offset, table_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} content snapshot")
+        table = json.loads(self._map[table_offset:table_offset + table_length])
+        self.built_at = table["built_at"]
+        self.indices = table["indices"]
+        self.quizzes = table["quizzes"]
+        if len(self.indices) + len(self.quizzes) != count:
+            raise ValueError(f"{path} has a damaged offset table")
+
+    def _read(self, entry) -> dict:
+        offset, length, _ = entry
+        return json.loads(self._map[offset:offset + length])
+
+    def quiz_version(self, quiz_id: str):
+        entry = self.quizzes.get(quiz_id)
+        return entry[2] if entry else None
+
+    def index_version(self, subject: str):
+        entry = self.indices.get(subject)
+        return entry[2] if entry else None
+
+    def quiz_data(self, quiz_id: str) -> dict:
+        return self._read(self.quizzes[quiz_id])
+
+    def index_data(self, subject: str) -> dict:
+        return self._read(self.indices[subject])
+
+class SnapshotStore:
+    """
+    The process's snapshot plus its freshness check. The file is re-mapped when it is
+    replaced (checked with one stat per call) and the version document is re-read at most
+    every VERSION_CHECK_SECONDS. Safe to use from background threads: it makes no Streamlit calls.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._file_key = None
+        self._versions = None
+        self._versions_read_at = 0.0
+        self._unverified = set()
+
+    def snapshot(self):
+        """The mapped snapshot, or None when there is no readable snapshot file."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        file_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if file_key != self._file_key:
+                try:
+                    self._snapshot = ContentSnapshot(self.path)
+                except (OSError, ValueError, KeyError):
+                    self._snapshot = None
+                self._file_key = file_key
+            return self._snapshot
+
+    def versions(self, db=None) -> dict:
+        """
+        The meta/content version document, re-read at most every VERSION_CHECK_SECONDS.
+        While Firestore is unavailable: the last versions read, or None if there are none.
+        """
+        with self._lock:
+            if self._versions is not None and time.monotonic() - self._versions_read_at < VERSION_CHECK_SECONDS:
+                return self._versions
+        try:
+            versions = database_manager.get_content_versions(db=db) or {}
+        except BackendUnavailableError:
+            with self._lock:
+                return self._versions
+        with self._lock:
+            self._versions, self._versions_read_at = versions, time.monotonic()
+        return versions
+
+    def set_versions(self, versions: dict):
+        """Installs a version document pushed by a listener, restarting the re-read interval."""
+        with self._lock:
+            self._versions, self._versions_read_at = versions, time.monotonic()
+
+    def invalidate_versions(self):
+        """Forces the next freshness check to re-read the version document (e.g. after an upload)."""
+        with self._lock:
+            self._versions = None
+
+    def _is_current(self, kind: str, key: str, version, db) -> bool:
+        versions = self.versions(db)
+        if versions is None:
+            with self._lock:
+                self._unverified.add((kind, key))
+            return True
+        return versions.get(kind, {}).get(key) == version
+
+    def take_unverified(self) -> set:
+        """Returns and forgets the (kind, key) entries served without a version check."""
+        with self._lock:
+            unverified, self._unverified = self._unverified, set()
+        return unverified
+
+    def quiz_data(self, quiz_id: str, db=None) -> dict:
+        """The quiz document from the snapshot if it is current, else None (read Firestore instead)."""
+        snapshot = self.snapshot()
+        if snapshot is None or quiz_id not in snapshot.quizzes:
+            return None
+        if not self._is_current("quizzes", quiz_id, snapshot.quiz_version(quiz_id), db):
+            return None
+        return snapshot.quiz_data(quiz_id)
+
+    def index_data(self, subject: str, db=None) -> dict:
+        """The subject index from the snapshot if it is current, else None."""
+        snapshot = self.snapshot()
+        if snapshot is None or subject not in snapshot.indices:
+            return None
+        if not self._is_current("indices", subject, snapshot.index_version(subject), db):
+            return None
+        return snapshot.index_data(subject)
+
+    def subjects(self, db=None) -> list:
+        """The subject ids in the snapshot if its set of indices is current, else None."""
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return None
+        versions = self.versions(db)
+        if versions is not None and versions.get("indices", {}) != {
+                subject: entry[2] for subject, entry in snapshot.indices.items()}:
+            return None
+        return list(snapshot.indices)
+
+@st.cache_resource
+def get_snapshot_store() -> SnapshotStore:
+    """Returns the process-wide snapshot store."""
+    return SnapshotStore()
+
+def _write_entry(f, data: dict) -> list:
+    payload = json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+    offset = f.tell()
+    f.write(payload)
+    return [offset, len(payload), quiz_content.content_version(data)]
+
+def merge_versions(stored: dict, packed: dict, read: dict) -> dict:
+    """
+    Records a snapshot's packed versions in the stored version map, skipping every id whose
+    stored version differs from the one read before packing (an upload or delete since).
+    Unchanged ids that were not packed are dropped.
+    """
+    merged = dict(stored)
+    for doc_id in set(packed) | set(read):
+        if stored.get(doc_id) != read.get(doc_id):
+            continue
+        if doc_id in packed:
+            merged[doc_id] = packed[doc_id]
+        else:
+            merged.pop(doc_id, None)
+    return merged
+
+def build_snapshot(path: str = SNAPSHOT_PATH) -> dict:
+    """
+    Packs every subject index and quiz into a new snapshot at path, replacing any existing
+    file atomically (processes keep reading the old mapping until they notice the new file),
+    and records the versions it packed in meta/content without overwriting uploads made
+    while it ran. Returns a short summary.
+    """
+    # Versions as of before packing; ids changed after this keep their stored version
+    read_versions = database_manager.get_content_versions() or {}
+    indices, quizzes = {}, {}
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(b"\x00" * HEADER.size)
+        for doc in database_manager.get_all_documents("subject_indices"):
+            indices[doc.id] = _write_entry(f, doc.to_dict())
+        for doc in database_manager.get_all_documents("quizzes"):
+            quizzes[doc.id] = _write_entry(f, doc.to_dict())
+        built_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        table = json.dumps({"built_at": built_at, "indices": indices, "quizzes": quizzes}).encode("utf-8")
+        table_offset = f.tell()
+        f.write(table)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(indices) + len(quizzes), table_offset, len(table)))
+    os.replace(temp_path, path)
+    packed = {
+        "quizzes": {quiz_id: entry[2] for quiz_id, entry in quizzes.items()},
+        "indices": {subject: entry[2] for subject, entry in indices.items()},
+    }
+    database_manager.update_content_versions(lambda current: {
+        kind: merge_versions((current or {}).get(kind, {}), packed[kind], read_versions.get(kind, {}))
+        for kind in ("quizzes", "indices")})
+    return {"built_at": built_at, "indices": len(indices), "quizzes": len(quizzes), "bytes": os.path.getsize(path)}
+
+def snapshot_status(store: SnapshotStore) -> dict:
+    """Summarizes a store's snapshot: when it was built, its size and how many quizzes are stale. None if absent."""
+    snapshot = store.snapshot()
+    if snapshot is None:
+        return None
+    current = (store.versions() or {}).get("quizzes", {})
+    stale = sum(1 for quiz_id, entry in snapshot.quizzes.items() if current.get(quiz_id) != entry[2])
+    return {"built_at": snapshot.built_at, "quizzes": len(snapshot.quizzes), "indices": len(snapshot.indices),
+            "stale": stale, "missing": len(set(current) - set(snapshot.quizzes)),
+            "bytes": os.path.getsize(store.path)}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build or inspect the packed quiz content snapshot.")
+    parser.add_argument("command", choices=("build", "info"))
+    parser.add_argument("path", nargs="?", default=SNAPSHOT_PATH)
+    args = parser.parse_args(argv)
+
+    database_manager.initialize_firestore()
+    if args.command == "build":
+        summary = build_snapshot(args.path)
+        print(f"Packed {summary['quizzes']} quizzes and {summary['indices']} indices "
+              f"({summary['bytes']} bytes) into {args.path}")
+        return 0
+    status = snapshot_status(SnapshotStore(args.path))
+    if status is None:
+        print(f"{args.path}: no readable snapshot")
+        return 1
+    print(f"{args.path}: built {status['built_at']}, {status['quizzes']} quizzes, {status['indices']} indices, "
+          f"{status['bytes']} bytes; {status['stale']} stale, {status['missing']} newer quizzes not packed")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
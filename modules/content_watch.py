@@ -0,0 +1,92 @@
+import threading
+import streamlit as st
+from modules import content_cache, content_snapshot, data_manager, database_manager, quiz_content, resilience
+
+class ContentWatcher:
+    """
+    Keeps this process's content caches in step with uploads made by any process. It
+    listens to the meta/content version document (see database_manager.get_content_versions)
+    and to the subject_indices collection, and on each change drops exactly the quizzes and
+    indices whose versions moved. Callbacks arrive on the client's listener thread, so the
+    watcher is given its cache and snapshot store up front and only clears caches.
+    """
+
+    def __init__(self, db, cache, practice_cache, snapshot_store):
+        self._db = db
+        self._cache = cache
+        self._practice_cache = practice_cache
+        self._snapshot_store = snapshot_store
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._index_versions = {}
+        self._watches = []
+
+    def start(self):
+        # Baseline first, so the listeners' initial snapshots invalidate nothing
+        self._versions = database_manager.get_content_versions(db=self._db) or {}
+        self._index_versions = {doc.id: quiz_content.content_version(doc.to_dict())
+                                for doc in self._db.collection('subject_indices').stream()}
+        self._watches = [
+            self._db.collection('meta').document('content').on_snapshot(self._on_versions),
+            self._db.collection('subject_indices').on_snapshot(self._on_indices),
+        ]
+        resilience.get_circuit_breaker().add_recovery_listener(self._on_recovery)
+        return self
+
+    def stop(self):
+        for watch in self._watches:
+            watch.unsubscribe()
+        self._watches = []
+
+    def _on_versions(self, docs, changes, read_time):
+        try:
+            versions = docs[0].to_dict() if docs and docs[0].exists else {}
+            with self._lock:
+                previous, self._versions = self._versions, versions
+            self._snapshot_store.set_versions(versions)
+            for quiz_id in _changed_keys(previous.get("quizzes"), versions.get("quizzes")):
+                data_manager.invalidate_quiz_content(quiz_id, cache=self._cache, practice_cache=self._practice_cache)
+            for subject in _changed_keys(previous.get("indices"), versions.get("indices")):
+                data_manager.invalidate_index(subject, practice_cache=self._practice_cache)
+        except Exception:
+            self._drop_everything()
+
+    def _on_indices(self, docs, changes, read_time):
+        try:
+            # Real listeners report the changed documents in changes; the local client passes only those in docs
+            changed = [change.document for change in changes] if changes else docs
+            for doc in changed:
+                version = quiz_content.content_version(doc.to_dict()) if doc.exists else None
+                with self._lock:
+                    moved = self._index_versions.get(doc.id) != version
+                    self._index_versions[doc.id] = version
+                if moved:
+                    data_manager.invalidate_index(doc.id, practice_cache=self._practice_cache)
+        except Exception:
+            self._drop_everything()
+
+    def _on_recovery(self):
+        # Content served from the snapshot during an outage was never checked against meta/content
+        self._snapshot_store.invalidate_versions()
+        for kind, key in self._snapshot_store.take_unverified():
+            if kind == "quizzes":
+                data_manager.invalidate_quiz_content(key, cache=self._cache, practice_cache=self._practice_cache)
+            else:
+                data_manager.invalidate_index(key, practice_cache=self._practice_cache)
+
+    def _drop_everything(self):
+        # A change that could not be applied precisely must not leave stale content behind
+        self._cache.clear()
+        self._snapshot_store.invalidate_versions()
+        for subject in ("GK", "Math"):
+            data_manager.invalidate_index(subject, practice_cache=self._practice_cache)
+
+def _changed_keys(old: dict, new: dict) -> set:
+    old, new = old or {}, new or {}
+    return {key for key in old.keys() | new.keys() if old.get(key) != new.get(key)}
+
+@st.cache_resource
+def start_content_watcher() -> ContentWatcher:
+    """Starts this process's listeners once; safe to call on every script run."""
+    return ContentWatcher(database_manager.initialize_firestore(), content_cache.get_content_cache(),
+                          content_cache.get_practice_cache(), content_snapshot.get_snapshot_store()).start()
@@ -1,23 +1,68 @@
+import logging
+import os
+import threading
+import uuid
 import streamlit as st
-from modules import database_manager
+from datetime import date, datetime, timedelta, timezone
+from modules import (async_db, attempt_rollups, attempt_spool, content_cache, content_snapshot, database_manager,
+                     leaderboards, quiz_content, resilience, review_queue)
+from modules.exceptions import BackendUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# Display order of GK levels; unknown level names sort last.
+LEVEL_SORT_ORDER = {"Foundation": 0, "Intermediate": 1, "Advanced": 2, "Expert": 3, "Grandmaster": 4}
+
+def level_rank(level_name: str) -> int:
+    return LEVEL_SORT_ORDER.get(level_name, 99)
+
+def math_quiz_id(chapter_id: str, story_file: str) -> str:
+    """Builds the quiz document id for a story listed in the Math index."""
+    return f"math_{chapter_id}_{story_file.replace('.json', '')}"
 
 # --- Subject & Index Loading ---
+# Content is read from the local snapshot (see content_snapshot) while it is current,
+# and from Firestore otherwise.
+
 @st.cache_data
 def get_subjects():
     """Fetches available subjects from the 'subject_indices' collection in Firestore."""
+    subjects = content_snapshot.get_snapshot_store().subjects()
+    if subjects is not None:
+        return subjects
     db = database_manager.initialize_firestore()
     docs = db.collection('subject_indices').stream()
     return [doc.id for doc in docs]
 
+def _load_index(subject: str) -> dict:
+    return (content_snapshot.get_snapshot_store().index_data(subject)
+            or database_manager.get_subject_index(subject) or {})
+
 @st.cache_data
 def load_gk_index() -> dict:
-    """Loads the GK index data from Firestore."""
-    return database_manager.get_subject_index("GK") or {}
+    """Loads the GK index data from the snapshot or Firestore."""
+    return _load_index("GK")
 
 @st.cache_data
 def load_math_index() -> dict:
-    """Loads the Math index data from Firestore."""
-    return database_manager.get_subject_index("Math") or {}
+    """Loads the Math index data from the snapshot or Firestore."""
+    return _load_index("Math")
+
+def get_catalog_entries() -> list:
+    """
+    Lists every quiz in the subject indices as {quiz_id, subject, topic, level_name}, using
+    the same topic/level names the quiz views record on attempts.
+    """
+    entries = []
+    for topic_info in load_gk_index().get("topics_data", {}).values():
+        for quiz_id, quiz_info in topic_info.get("quizzes", {}).items():
+            entries.append({"quiz_id": quiz_id, "subject": "GK",
+                            "topic": topic_info.get("name"), "level_name": quiz_info.get("name")})
+    for chapter in load_math_index().get("chapters", []):
+        for story in chapter.get("stories", []):
+            entries.append({"quiz_id": math_quiz_id(chapter["id"], story["file"]), "subject": "Math",
+                            "topic": chapter.get("title"), "level_name": story.get("name")})
+    return entries
 
 # --- Quiz Content Loading ---
 @st.cache_data
@@ -28,45 +73,375 @@ def get_gk_levels_for_topic(topic_id: str) -> list:
     quizzes = topic_info.get('quizzes', {})
     return sorted(list(quizzes.keys()))
 
-@st.cache_data
-def load_gk_questions(quiz_id: str) -> list:
-    """Loads questions for a GK quiz and associated metadata into session_state."""
-    quiz_data = database_manager.get_quiz(quiz_id)
-    if not quiz_data:
-        return []
-    
-    # Store metadata in session state for the quiz view to use
-    st.session_state.gk_background = quiz_data.get("background", "")
-    st.session_state.gk_icon_legend = quiz_data.get("icon_legend", {})
-    st.session_state.gk_reward_text = quiz_data.get("reward", "")
-    st.session_state.gk_title = quiz_data.get("title", "GK Quiz") # Top-level title from quiz data
-    
-    return quiz_data.get("questions", [])
+def fetch_compiled_quiz(quiz_id: str, db=None, snapshot=None):
+    """Loads and compiles a quiz from the snapshot or Firestore, bypassing the cache. Returns None if it doesn't exist."""
+    snapshot = snapshot or content_snapshot.get_snapshot_store()
+    quiz_data = snapshot.quiz_data(quiz_id, db=db) or database_manager.get_quiz(quiz_id, db=db)
+    return quiz_content.compile_quiz(quiz_id, quiz_data) if quiz_data else None
 
-@st.cache_data
-def load_math_story(quiz_id: str) -> list: # Changed return type hint as it now returns questions list
-    """Loads the content of a math story quiz from Firestore and stores metadata in session_state."""
-    quiz_data = database_manager.get_quiz(quiz_id)
-    if not quiz_data:
-        return []
-    
-    # Store metadata in session state for the quiz view to use
-    st.session_state.math_story_title = quiz_data.get("story_name", "Math Exercise") # Use story_name from new structure
-    st.session_state.math_background = quiz_data.get("background", "")
-    st.session_state.math_icon_legend = quiz_data.get("icon_legend", {})
-    st.session_state.math_reward_text = quiz_data.get("reward", "")
-    
-    return quiz_data.get("questions", []) # Now returns the questions list directly
+def get_compiled_quiz(quiz_id: str):
+    """
+    Returns the shared CompiledQuiz from the process-wide content cache, fetching it on a miss.
+    The bundle has no session side effects, so a cache hit is always complete.
+    """
+    return content_cache.get_content_cache().get_or_load(
+        content_cache.quiz_key(quiz_id), lambda: fetch_compiled_quiz(quiz_id))
+
+def fetch_compiled_quizzes(quiz_ids: list, db=None, snapshot=None) -> dict:
+    """
+    Compiles several quizzes, bypassing the cache: current ones from the snapshot, the rest
+    with one Firestore multi-get. Missing quizzes are left out.
+    """
+    snapshot = snapshot or content_snapshot.get_snapshot_store()
+    quizzes = {quiz_id: snapshot.quiz_data(quiz_id, db=db) for quiz_id in quiz_ids}
+    missing = [quiz_id for quiz_id, quiz_data in quizzes.items() if quiz_data is None]
+    if missing:
+        quizzes.update(database_manager.get_quizzes(missing, db=db))
+    return {quiz_id: quiz_content.compile_quiz(quiz_id, quiz_data)
+            for quiz_id, quiz_data in quizzes.items() if quiz_data}
+
+def get_compiled_quizzes(quiz_ids: list) -> dict:
+    """
+    Returns {quiz_id: CompiledQuiz} for the given ids, in order, serving hits from the content
+    cache and fetching only the misses, together, over the network. Missing quizzes are left out.
+    """
+    cache = content_cache.get_content_cache()
+    quizzes = {quiz_id: cache.get(content_cache.quiz_key(quiz_id)) for quiz_id in quiz_ids}
+    missing = [quiz_id for quiz_id, quiz in quizzes.items() if quiz is None]
+    if missing:
+        fetched = fetch_compiled_quizzes(missing)
+        for quiz_id, quiz in fetched.items():
+            cache.put(content_cache.quiz_key(quiz_id), quiz)
+        quizzes.update(fetched)
+    return {quiz_id: quiz for quiz_id, quiz in quizzes.items() if quiz is not None}
+
+def get_worksheet(quiz, seed: int):
+    """Returns the worksheet generated from a compiled quiz with seed, cached per quiz version."""
+    return content_cache.get_worksheet_cache().get_or_load(
+        content_cache.worksheet_key(quiz.quiz_id, quiz.version, seed),
+        lambda: quiz_content.build_worksheet(quiz, seed))
+
+def load_gk_quiz(quiz_id: str):
+    """Returns the immutable GK quiz bundle (questions and metadata), or None if it doesn't exist."""
+    return get_compiled_quiz(quiz_id)
+
+def load_math_story(quiz_id: str):
+    """Returns the immutable math story bundle (questions and metadata), or None if it doesn't exist."""
+    return get_compiled_quiz(quiz_id)
+
+def invalidate_quiz_content(quiz_id: str, cache=None, practice_cache=None):
+    """Drops one changed quiz, and the practice index built from it, from this process's content caches."""
+    cache = cache or content_cache.get_content_cache()
+    cache.invalidate(content_cache.quiz_key(quiz_id))
+    (practice_cache or content_cache.get_practice_cache()).invalidate(content_cache.practice_index_key())
+
+def invalidate_index(subject: str, practice_cache=None):
+    """Drops a changed subject index, and everything listed from it, from this process's caches."""
+    (practice_cache or content_cache.get_practice_cache()).invalidate(content_cache.practice_index_key())
+    if subject == "GK":
+        load_gk_index.clear()
+        get_gk_levels_for_topic.clear()
+    elif subject == "Math":
+        load_math_index.clear()
+    get_subjects.clear()
+
+def invalidate_quiz(quiz_id: str):
+    """Drops a changed quiz, and the cached index that lists it, from this process's caches."""
+    invalidate_quiz_content(quiz_id)
+    content_snapshot.get_snapshot_store().invalidate_versions()
+    invalidate_index("GK" if quiz_id.startswith("gk_") else "Math")
+
+# --- Attempt Timestamps ---
+# Legacy attempts stored local time as "%Y-%m-%d %H:%M:%S" strings; new ones store native timestamps.
+LEGACY_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def attempt_datetime(timestamp) -> datetime:
+    """Returns an attempt timestamp (native or legacy string) as a timezone-aware datetime."""
+    if isinstance(timestamp, str):
+        return datetime.strptime(timestamp, LEGACY_TIMESTAMP_FORMAT).astimezone()
+    if timestamp.tzinfo is None:
+        return timestamp.astimezone()
+    return timestamp
+
+def format_attempt_date(timestamp, with_time: bool = False) -> str:
+    """Formats an attempt timestamp in the server's local time for display."""
+    return attempt_datetime(timestamp).astimezone().strftime("%Y-%m-%d %H:%M:%S" if with_time else "%Y-%m-%d")
+
+def format_duration(seconds) -> str:
+    """Formats a number of seconds as mm:ss, or "—" when unknown."""
+    if seconds is None:
+        return "—"
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes:02d}:{seconds:02d}"
 
 # --- Quiz Attempt Management ---
-def save_attempt(attempt_data: dict):
-    """Saves a detailed quiz attempt to Firestore."""
+def progress_series_keys(attempt_data: dict) -> list:
+    """The progress series an attempt counts towards: its subject, subject › topic and subject › topic › level."""
+    keys = [attempt_data.get("subject", "N/A")]
+    if attempt_data.get("topic"):
+        keys.append(f"{keys[0]} › {attempt_data['topic']}")
+        if attempt_data.get("level_name"):
+            keys.append(f"{keys[1]} › {attempt_data['level_name']}")
+    return keys
+
+def save_attempt(attempt_data: dict, checkpoint_id: str = None):
+    """
+    Saves a detailed quiz attempt to Firestore, adds it to the student's daily progress
+    series and leaderboards, and reschedules its questions in their review queue. A
+    checkpoint_id names the finished quiz's in-progress checkpoint, deleted with the attempt.
+    While Firestore is unavailable the attempt goes to the local spool and is replayed later.
+    """
     username = attempt_data.get("student_name")
     if not username:
         st.error("Cannot save attempt: student_name is missing.")
         return
-    database_manager.save_attempt(username, attempt_data)
+    attempt_data.setdefault("timestamp", datetime.now(timezone.utc))
+    if st.session_state.get("group_id"):
+        attempt_data.setdefault("group_id", st.session_state.group_id)  # Indexes it under the class
+    record = {"attempt_id": uuid.uuid4().hex[:20], "username": username, "attempt_data": attempt_data,
+              "checkpoint_id": checkpoint_id}
+    try:
+        _commit_attempt(record)
+    except BackendUnavailableError:
+        attempt_spool.append(record)
+        st.toast("The database is unreachable right now. Your attempt is kept on the server "
+                 "and will be saved automatically.", icon="📦")
+        return
+    try:
+        _finish_attempt(record)
+    except BackendUnavailableError as e:
+        # The attempt is saved; replaying the record finds it and only retries the follow-ups
+        logger.warning("Follow-up updates for attempt %s of %s failed (%s); will retry", record["attempt_id"],
+                       username, e)
+        attempt_spool.append(record)
+    if os.path.exists(attempt_spool.SPOOL_PATH):
+        flush_attempt_spool_in_background()
+
+def _commit_attempt(record: dict, replay: bool = False):
+    """Writes the attempt with its progress and leaderboard entries in one batch, unless a replay finds it saved."""
+    username, attempt_data = record["username"], record["attempt_data"]
+    # A replayed attempt may have been written by a save that timed out after committing
+    if not (replay and database_manager.attempt_exists(username, record["attempt_id"])):
+        database_manager.save_attempt(username, attempt_data, format_attempt_date(attempt_data["timestamp"]),
+                                      progress_series_keys(attempt_data), leaderboards.attempt_board_ids(attempt_data),
+                                      leaderboards.attempt_entry(attempt_data), attempt_id=record["attempt_id"],
+                                      checkpoint_id=record.get("checkpoint_id"))
+    user_cache = content_cache.get_user_cache()
+    user_cache.invalidate_prefix(content_cache.attempts_key(username))
+    user_cache.invalidate(content_cache.rollups_key(username))  # Another process may have compacted since
+    user_cache.invalidate_prefix(content_cache.progress_key(username))
+    if record.get("checkpoint_id"):
+        user_cache.invalidate(content_cache.checkpoints_key(username))
+    if attempt_data.get("group_id"):
+        user_cache.invalidate_prefix(content_cache.group_attempts_key(attempt_data["group_id"]))
+
+def _finish_attempt(record: dict):
+    """The updates that follow a committed attempt; each is safe to repeat when a replay retries them."""
+    review_queue.record_attempt(record["username"], record["attempt_data"], record["attempt_id"])
+    leaderboards.maybe_compact(leaderboards.attempt_board_ids(record["attempt_data"]))
+
+def _replay_attempt(record: dict):
+    _commit_attempt(record, replay=True)
+    _finish_attempt(record)
+
+def flush_attempt_spool() -> int:
+    """Replays spooled attempts, oldest first; returns how many were saved."""
+    return attempt_spool.drain(_replay_attempt)
+
+def flush_attempt_spool_in_background():
+    threading.Thread(target=flush_attempt_spool, name="attempt-spool", daemon=True).start()
+
+@st.cache_resource
+def start_spool_replay() -> bool:
+    """Once per process: replays anything spooled earlier and again whenever the Firestore circuit closes."""
+    resilience.get_circuit_breaker().add_recovery_listener(flush_attempt_spool_in_background)
+    flush_attempt_spool_in_background()
+    return True
+
+# Attempts shown per dashboard tab before "Show older attempts" is clicked.
+ATTEMPTS_PAGE_SIZE = 10
+
+def migrate_attempt_timestamps(student_name: str) -> int:
+    """
+    Converts the student's legacy string timestamps to native ones so timestamp ordering and
+    range filters see every attempt. Checked once per user per process; returns the number migrated.
+    """
+    def _migrate():
+        legacy = database_manager.get_legacy_attempt_timestamps(student_name)
+        if legacy:
+            database_manager.set_attempt_timestamps(
+                student_name, {attempt_id: attempt_datetime(ts) for attempt_id, ts in legacy.items()})
+        return len(legacy)
+    return content_cache.get_user_cache().get_or_load(content_cache.timestamps_checked_key(student_name), _migrate)
+
+def get_compacted_attempts(student_name: str) -> list:
+    """
+    Returns the attempts folded into the student's monthly rollups, newest first. Decoded
+    and cached per user until they save an attempt or USER_DATA_TTL_SECONDS pass; callers
+    must not modify them.
+    """
+    return content_cache.get_user_cache().get_or_load(
+        content_cache.rollups_key(student_name), lambda: attempt_rollups.load_compacted_attempts(student_name),
+        content_cache.USER_DATA_TTL_SECONDS)
+
+def invalidate_attempt_history(student_name: str):
+    """Drops the student's cached attempt pages and rollups, e.g. after their history was compacted."""
+    user_cache = content_cache.get_user_cache()
+    user_cache.invalidate_prefix(content_cache.attempts_key(student_name))
+    user_cache.invalidate(content_cache.rollups_key(student_name))
+
+def _attempt_matches(attempt: dict, subject: str, level: str, start: datetime, end: datetime) -> bool:
+    if (subject and attempt.get("subject") != subject) or (level and attempt.get("level") != level):
+        return False
+    moment = attempt_datetime(attempt["timestamp"])
+    return (not start or moment >= start) and (not end or moment < end)
+
+def get_student_attempts(student_name: str, subject: str = None, level: str = None,
+                         start: datetime = None, end: datetime = None, limit: int = None) -> list:
+    """
+    Loads the student's attempts from Firestore, newest first, filtered by subject, level and
+    time range. When the live attempts run out before `limit`, compacted ones follow.
+    """
+    migrate_attempt_timestamps(student_name)
+    attempts = database_manager.get_student_attempts(student_name, subject, level, start, end, limit)
+    if limit is None or len(attempts) < limit:
+        older = [attempt for attempt in get_compacted_attempts(student_name)
+                 if _attempt_matches(attempt, subject, level, start, end)]
+        if older:
+            attempts = sorted(attempts + older, key=lambda attempt: attempt_datetime(attempt["timestamp"]),
+                              reverse=True)[:limit]
+    return attempts
+
+def get_recent_attempts_by_subject(student_name: str, page_limits: dict) -> dict:
+    """
+    Returns {subject: latest attempts page} for every subject, querying the uncached
+    pages concurrently. page_limits maps a subject to its page size (default ATTEMPTS_PAGE_SIZE).
+    """
+    migrate_attempt_timestamps(student_name)  # Once, before the fan-out
+    user_cache = content_cache.get_user_cache()
+    limits = {subject: page_limits.get(subject, ATTEMPTS_PAGE_SIZE) for subject in get_subjects()}
+    pages = {subject: user_cache.get(content_cache.attempts_key(student_name, subject, limit))
+             for subject, limit in limits.items()}
+    missing = [subject for subject, page in pages.items() if page is None]
+    results = async_db.gather(*(async_db.run(get_recent_attempts, student_name, subject, limits[subject])
+                                for subject in missing))
+    pages.update(zip(missing, results))
+    return pages
+
+def get_recent_attempts(student_name: str, subject: str, limit: int = ATTEMPTS_PAGE_SIZE) -> list:
+    """
+    Returns the student's latest attempts in one subject. The page is shared and cached
+    per user until they save a new attempt or USER_DATA_TTL_SECONDS pass, so callers must
+    not modify it.
+    """
+    return content_cache.get_user_cache().get_or_load(
+        content_cache.attempts_key(student_name, subject, limit),
+        lambda: get_student_attempts(student_name, subject=subject, limit=limit), content_cache.USER_DATA_TTL_SECONDS)
+
+# --- Class Analytics ---
+def get_class_attempts(group_id: str, since: date) -> list:
+    """Returns the class's attempts since a date, newest first; cached until a member saves an attempt."""
+    start = datetime.combine(since, datetime.min.time(), tzinfo=timezone.utc)
+    return content_cache.get_user_cache().get_or_load(
+        content_cache.group_attempts_key(group_id, since),
+        lambda: database_manager.get_group_attempts(group_id, start=start), content_cache.USER_DATA_TTL_SECONDS)
+
+def _percentage(score: int, total: int):
+    return round(100 * score / total, 1) if total else None
+
+def summarize_class_students(attempts: list, usernames: list) -> list:
+    """One row per class member: attempts, average score and when they were last active."""
+    stats = {username: {"attempts": 0, "score": 0, "total": 0, "last": None} for username in usernames}
+    for attempt in attempts:  # Newest first, so the first attempt seen is the latest
+        entry = stats.setdefault(attempt["student_name"], {"attempts": 0, "score": 0, "total": 0, "last": None})
+        entry["attempts"] += 1
+        entry["score"] += attempt.get("score", 0)
+        entry["total"] += attempt.get("total_questions", 0)
+        entry["last"] = entry["last"] or format_attempt_date(attempt["timestamp"])
+    return [{"Student": username, "Attempts": entry["attempts"],
+             "Average %": _percentage(entry["score"], entry["total"]), "Last Active": entry["last"] or "—"}
+            for username, entry in sorted(stats.items())]
+
+def summarize_class_topics(attempts: list) -> list:
+    """One row per subject and topic the class attempted, weakest average first."""
+    stats = {}
+    for attempt in attempts:
+        entry = stats.setdefault((attempt.get("subject", ""), attempt.get("topic", "")),
+                                 {"attempts": 0, "score": 0, "total": 0, "students": set()})
+        entry["attempts"] += 1
+        entry["score"] += attempt.get("score", 0)
+        entry["total"] += attempt.get("total_questions", 0)
+        entry["students"].add(attempt["student_name"])
+    rows = [{"Subject": subject, "Topic": topic, "Students": len(entry["students"]), "Attempts": entry["attempts"],
+             "Average %": _percentage(entry["score"], entry["total"])}
+            for (subject, topic), entry in stats.items()]
+    return sorted(rows, key=lambda row: (row["Average %"] is None, row["Average %"]))
+
+# --- Progress Over Time ---
+# Longer histories are bucketed by week, then by month, to stay under this many points per series.
+MAX_PROGRESS_POINTS = 200
+
+def rebuild_progress(student_name: str) -> dict:
+    """
+    Rebuilds the student's daily progress documents from their attempt history and marks
+    them as backfilled, so it runs once per student. Returns the rebuilt {year: days} data.
+    """
+    days_by_year = {}
+    for attempt in get_student_attempts(student_name):
+        day = format_attempt_date(attempt["timestamp"])
+        day_entry = days_by_year.setdefault(day[:4], {}).setdefault(day, {})
+        for key in progress_series_keys(attempt):
+            stats = day_entry.setdefault(key, {"score": 0, "total": 0, "attempts": 0})
+            stats["score"] += attempt.get("score", 0)
+            stats["total"] += attempt.get("total_questions", 0)
+            stats["attempts"] += 1
+    database_manager.replace_progress(student_name, days_by_year)
+    return days_by_year
+
+def _bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def downsample_series(points: list, max_points: int = MAX_PROGRESS_POINTS) -> list:
+    """
+    Merges sorted (day, score, total, attempts) points into weekly or monthly buckets
+    when there are more than max_points. Scores are summed, so percentages stay exact.
+    """
+    for bucket in ("day", "week", "month"):
+        merged = {}
+        for day, score, total, attempts in points:
+            start = _bucket_start(day, bucket)
+            old = merged.get(start, (start, 0, 0, 0))
+            merged[start] = (start, old[1] + score, old[2] + total, old[3] + attempts)
+        if len(merged) <= max_points:
+            break
+    return sorted(merged.values())
+
+def get_progress_series(student_name: str, since: date = None) -> dict:
+    """
+    Returns {series_key: [(day, score, total, attempts), ...]} from the pre-aggregated daily
+    progress documents (one read per calendar year), downsampled for long histories.
+    """
+    today = date.today()
+    since = since or today - timedelta(days=365)
+
+    def _load():
+        years = list(range(since.year, today.year + 1))
+        days_by_year, backfilled = database_manager.get_progress_years(student_name, years)
+        if not backfilled:
+            days_by_year = rebuild_progress(student_name)  # First view of a pre-existing history
+        series = {}
+        for days in days_by_year.values():
+            for day_str, entries in days.items():
+                day = date.fromisoformat(day_str)
+                if day < since:
+                    continue
+                for key, stats in entries.items():
+                    series.setdefault(key, []).append((day, stats["score"], stats["total"], stats["attempts"]))
+        return {key: downsample_series(sorted(points)) for key, points in series.items()}
 
-def get_student_attempts(student_name: str) -> list:
-    """Loads all attempt summaries for a given student from Firestore."""
-    return database_manager.get_student_attempts(student_name)
\ No newline at end of file
+    return content_cache.get_user_cache().get_or_load(content_cache.progress_key(student_name, since), _load,
+                                                      content_cache.USER_DATA_TTL_SECONDS)
@@ -4,6 +4,8 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 from firebase_admin.firestore import transactional
 from modules.exceptions import FirebaseCredentialsError
+from modules.quiz_content import content_version
+from modules.resilience import WRITE_DEADLINE_SECONDS, guarded
 
 def _get_credentials():
     """
@@ -31,13 +33,24 @@ def _get_credentials():
         "or provide a 'firebase_credentials_dev.json' file for local development."
     )
 
+def is_local_backend() -> bool:
+    """Returns True when the app is configured to use the in-memory backend."""
+    return os.environ.get("LEARNING_APP_BACKEND") == "local"
+
 @st.cache_resource
 def initialize_firestore():
     """
     Initializes the Firebase Admin SDK using credentials from _get_credentials
     and returns a Firestore client. This function is cached as a resource.
     It has no UI side effects.
+
+    Setting LEARNING_APP_BACKEND=local swaps in the in-memory client used by the
+    benchmark and load-test tooling.
     """
+    if is_local_backend():
+        from modules.local_firestore import LocalFirestoreClient
+        return LocalFirestoreClient(latency_ms=float(os.environ.get("LEARNING_APP_LOCAL_LATENCY_MS", 0)))
+
     if not firebase_admin._apps:
         try:
             cred = _get_credentials()
@@ -48,36 +61,72 @@ def initialize_firestore():
             
     return firestore.client()
 
+# Firestore rejects write batches with more than 500 operations.
+MAX_BATCH_WRITES = 500
+# users/{username}/progress/{this} exists once the user's progress covers their whole attempt history.
+PROGRESS_BACKFILLED_DOC = "backfilled"
+
 # --- Generic Document/Collection Functions ---
+@guarded(deadline=15)
 def get_all_documents(collection_name: str) -> list:
     db = initialize_firestore()
     return [doc for doc in db.collection(collection_name).stream()]
 
+@guarded()
+def get_documents(collection_name: str, doc_ids: list, db=None) -> dict:
+    """Fetches many documents in one multi-get round trip; returns {doc_id: data or None}."""
+    db = db or initialize_firestore()
+    refs = [db.collection(collection_name).document(doc_id) for doc_id in dict.fromkeys(doc_ids)]
+    if not refs:
+        return {}
+    return {doc.id: doc.to_dict() if doc.exists else None for doc in db.get_all(refs)}
+
+@guarded(deadline=WRITE_DEADLINE_SECONDS)
 def set_document(collection_name: str, doc_id: str, data: dict):
     db = initialize_firestore()
     db.collection(collection_name).document(doc_id).set(data)
 
+@guarded(deadline=WRITE_DEADLINE_SECONDS)
 def delete_document(collection_name: str, doc_id: str):
     db = initialize_firestore()
     db.collection(collection_name).document(doc_id).delete()
 
 # --- User Specific Functions ---
+@guarded()
+def get_users(usernames: list) -> dict:
+    """Returns {username: user document or None} using one multi-get."""
+    return get_documents('users', usernames)
+
+@guarded()
 def user_exists(username: str) -> bool:
     db = initialize_firestore()
     return db.collection('users').document(username).get().exists
 
+@guarded(deadline=WRITE_DEADLINE_SECONDS)
 def create_user(username: str, salt: str, hashed_pin: str):
-    set_document('users', username, {'salt': salt, 'hashed_pin': hashed_pin})
+    """Creates the user; a new user has no history, so their progress counts as backfilled."""
+    db = initialize_firestore()
+    user_ref = db.collection('users').document(username)
+    batch = db.batch()
+    batch.set(user_ref, {'salt': salt, 'hashed_pin': hashed_pin})
+    batch.set(user_ref.collection('progress').document(PROGRESS_BACKFILLED_DOC), {'at': firestore.SERVER_TIMESTAMP})
+    batch.commit()
 
+@guarded()
 def get_user_credentials(username: str) -> dict:
     db = initialize_firestore()
     doc = db.collection('users').document(username).get()
     return doc.to_dict() if doc.exists else None
 
+@guarded(deadline=60)
 def delete_user_and_subcollections(username: str):
     db = initialize_firestore()
     user_ref = db.collection('users').document(username)
     _delete_collection(user_ref.collection('attempts'), 100)
+    _delete_collection(user_ref.collection('attempt_rollups'), 100)
+    _delete_collection(user_ref.collection('progress'), 100)
+    _delete_collection(user_ref.collection('review'), 100)
+    _delete_collection(user_ref.collection('checkpoints'), 100)
     user_ref.delete()
 
 def _delete_collection(coll_ref, batch_size):
@@ -90,16 +139,56 @@ def _delete_collection(coll_ref, batch_size):
         return _delete_collection(coll_ref, batch_size)
 
 # --- Quiz Content Functions ---
+@guarded()
 def get_subject_index(subject_id: str) -> dict:
     db = initialize_firestore()
     doc = db.collection('subject_indices').document(subject_id).get()
     return doc.to_dict() if doc.exists else None
 
-def get_quiz(quiz_id: str) -> dict:
-    db = initialize_firestore()
+@guarded()
+def get_quiz(quiz_id: str, db=None) -> dict:
+    # Background workers pass in the client so they never touch Streamlit's caches
+    db = db or initialize_firestore()
     doc = db.collection('quizzes').document(quiz_id).get()
     return doc.to_dict() if doc.exists else None
 
+@guarded()
+def get_quizzes(quiz_ids: list, db=None) -> dict:
+    """Returns {quiz_id: quiz document or None} using one multi-get instead of a read per quiz."""
+    return get_documents('quizzes', quiz_ids, db=db)
+
+# meta/content maps every quiz id and subject index to the content_version of its current
+# document; the content snapshot serves an entry only while its packed version matches.
+def _content_versions_ref(db):
+    return db.collection('meta').document('content')
+
+@guarded()
+def get_content_versions(db=None) -> dict:
+    db = db or initialize_firestore()
+    doc = _content_versions_ref(db).get()
+    return doc.to_dict() if doc.exists else None
+
+@guarded(idempotent=False)
+def update_content_versions(update) -> dict:
+    """
+    Applies update(current version doc or None) -> new version maps transactionally, so
+    uploads committed meanwhile are never overwritten, and returns the new doc.
+    """
+    db = initialize_firestore()
+    return _update_document_transaction(
+        db.transaction(), _content_versions_ref(db),
+        lambda current: {**update(current), 'updated': firestore.SERVER_TIMESTAMP})
+
+@guarded(deadline=WRITE_DEADLINE_SECONDS)
+def delete_quiz(quiz_id: str):
+    """Deletes a quiz document and drops it from the content versions."""
+    db = initialize_firestore()
+    batch = db.batch()
+    batch.delete(db.collection('quizzes').document(quiz_id))
+    batch.set(_content_versions_ref(db), {'quizzes': {quiz_id: firestore.DELETE_FIELD},
+                                          'updated': firestore.SERVER_TIMESTAMP}, merge=True)
+    batch.commit()
+
 @transactional
 def _update_gk_index_transaction(transaction, index_ref, topic_id, topic_name, quiz_id, level_name, level_file):
     index_snapshot = index_ref.get(transaction=transaction)
@@ -125,7 +214,9 @@ def _update_gk_index_transaction(transaction, index_ref, topic_id, topic_name, q
     # Update the main index data
     index_data['topics_data'][topic_id] = topic_entry
     transaction.set(index_ref, index_data)
+    return index_data
 
+@guarded(idempotent=False)
 def upload_gk_quiz(quiz_id, quiz_data, topic_id, topic_name, level_file, level_name):
     db = initialize_firestore()
     quiz_ref = db.collection('quizzes').document(quiz_id)
@@ -134,8 +225,13 @@ def upload_gk_quiz(quiz_id, quiz_data, topic_id, topic_name, level_file, level_n
     quiz_data['topic_id'] = topic_id
     
     transaction = db.transaction()
-    _update_gk_index_transaction(transaction, index_ref, topic_id, topic_name, quiz_id, level_name, level_file)
+    index_data = _update_gk_index_transaction(transaction, index_ref, topic_id, topic_name, quiz_id, level_name, level_file)
     transaction.set(quiz_ref, quiz_data)
+    transaction.set(_content_versions_ref(db), {
+        'quizzes': {quiz_id: content_version(quiz_data)},
+        'indices': {'GK': content_version(index_data)},
+        'updated': firestore.SERVER_TIMESTAMP,
+    }, merge=True)
     
     transaction.commit()
 
@@ -166,7 +262,9 @@ def _update_math_index_transaction(transaction, index_ref, chapter_id, chapter_n
             'stories': [{'file': story_file, 'name': story_name}]
         })
     transaction.set(index_ref, index_data)
+    return index_data
 
+@guarded(idempotent=False)
 def upload_math_quiz(quiz_id, quiz_data, chapter_id, chapter_name, story_file, story_name):
     db = initialize_firestore()
     quiz_ref = db.collection('quizzes').document(quiz_id)
@@ -174,22 +272,360 @@ def upload_math_quiz(quiz_id, quiz_data, chapter_id, chapter_name, story_file, s
     # quiz_data['topic_id'] = topic_id
     quiz_data['chapter_id'] = chapter_id
     transaction = db.transaction()
-    _update_math_index_transaction(transaction, index_ref, chapter_id, chapter_name, story_file, story_name)
+    index_data = _update_math_index_transaction(transaction, index_ref, chapter_id, chapter_name, story_file, story_name)
     transaction.set(quiz_ref, quiz_data)
+    transaction.set(_content_versions_ref(db), {
+        'quizzes': {quiz_id: content_version(quiz_data)},
+        'indices': {'Math': content_version(index_data)},
+        'updated': firestore.SERVER_TIMESTAMP,
+    }, merge=True)
     transaction.commit()
 
 # --- Quiz Attempt Functions ---
-def save_attempt(username: str, attempt_data: dict):
+@guarded(idempotent=False)
+def save_attempt(username: str, attempt_data: dict, progress_day: str = None, progress_keys=(),
+                 leaderboard_ids=(), leaderboard_entry: dict = None, attempt_id: str = None,
+                 checkpoint_id: str = None):
+    """
+    Writes the attempt and, in the same batch, adds it to the user's daily progress
+    series (users/{username}/progress/{year}) under each of progress_keys and appends
+    leaderboard_entry to the pending list of each leaderboard in leaderboard_ids.
+    The finished quiz's checkpoint, if checkpoint_id is given, is deleted in the same batch.
+    Because the batch is atomic, an existing attempt_id means all of it was applied.
+    """
     db = initialize_firestore()
     user_ref = db.collection('users').document(username)
-    user_ref.collection('attempts').add(attempt_data)
+    batch = db.batch()
+    batch.set(user_ref.collection('attempts').document(attempt_id), attempt_data)
+    if attempt_data.get('quiz_id'):
+        # Attempt counts per quiz drive the startup cache warm-up
+        batch.set(db.collection('content_stats').document('popularity'),
+                  {'counts': {attempt_data['quiz_id']: firestore.Increment(1)}}, merge=True)
+    if progress_day and progress_keys:
+        day_stats = {
+            'score': firestore.Increment(attempt_data.get('score', 0)),
+            'total': firestore.Increment(attempt_data.get('total_questions', 0)),
+            'attempts': firestore.Increment(1),
+        }
+        batch.set(user_ref.collection('progress').document(progress_day[:4]),
+                  {'days': {progress_day: {key: day_stats for key in progress_keys}}}, merge=True)
+    if leaderboard_entry:
+        for board_id in leaderboard_ids:
+            batch.set(db.collection('leaderboards').document(board_id),
+                      {'pending': firestore.ArrayUnion([leaderboard_entry])}, merge=True)
+    if checkpoint_id:
+        batch.delete(user_ref.collection('checkpoints').document(checkpoint_id))
+    batch.commit()
     st.toast("Saved attempt successfully!")
 
-def get_student_attempts(username: str) -> list:
+@guarded()
+def attempt_exists(username: str, attempt_id: str) -> bool:
+    db = initialize_firestore()
+    return db.collection('users').document(username).collection('attempts').document(attempt_id).get().exists
+
+@guarded()
+def get_progress_years(username: str, years: list) -> tuple:
+    """
+    Returns ({year: {day: {series_key: stats}}}, backfilled) for the requested years in one
+    batched read; backfilled says whether the progress documents cover the whole attempt history.
+    """
+    db = initialize_firestore()
+    progress_ref = db.collection('users').document(username).collection('progress')
+    docs = list(db.get_all([progress_ref.document(str(year)) for year in years]
+                           + [progress_ref.document(PROGRESS_BACKFILLED_DOC)]))
+    days_by_year = {doc.id: doc.to_dict().get('days', {}) for doc in docs
+                    if doc.exists and doc.id != PROGRESS_BACKFILLED_DOC}
+    backfilled = any(doc.exists and doc.id == PROGRESS_BACKFILLED_DOC for doc in docs)
+    return days_by_year, backfilled
+
+@guarded(deadline=WRITE_DEADLINE_SECONDS)
+def replace_progress(username: str, days_by_year: dict):
+    """
+    Overwrites the user's progress documents, e.g. after rebuilding them from attempt history,
+    and marks their progress as backfilled.
+    """
+    db = initialize_firestore()
+    progress_ref = db.collection('users').document(username).collection('progress')
+    batch = db.batch()
+    for year, days in days_by_year.items():
+        batch.set(progress_ref.document(str(year)), {'days': days})
+    batch.set(progress_ref.document(PROGRESS_BACKFILLED_DOC), {'at': firestore.SERVER_TIMESTAMP})
+    batch.commit()
+
+@guarded(deadline=WRITE_DEADLINE_SECONDS)
+def set_attempt_timestamps(username: str, timestamps: dict):
+    """Rewrites attempt timestamps ({attempt_id: datetime}), used to migrate legacy string values."""
     db = initialize_firestore()
     attempts_ref = db.collection('users').document(username).collection('attempts')
-    query = attempts_ref.order_by("timestamp", direction=firestore.Query.DESCENDING)
-    
+    items = list(timestamps.items())
+    for start in range(0, len(items), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for attempt_id, timestamp in items[start:start + MAX_BATCH_WRITES]:
+            batch.update(attempts_ref.document(attempt_id), {'timestamp': timestamp})
+        batch.commit()
+
+@guarded()
+def get_legacy_attempt_timestamps(username: str) -> dict:
+    """Returns {attempt_id: timestamp} for attempts whose timestamp is still a string."""
+    db = initialize_firestore()
+    attempts_ref = db.collection('users').document(username).collection('attempts')
+    # Range filters only match values of the same type, so this skips native timestamps
+    query = attempts_ref.where(filter=firestore.FieldFilter('timestamp', '>=', ''))
+    return {doc.id: doc.get('timestamp') for doc in query.stream()}
+
+@guarded()
+def get_review_queue(username: str) -> dict:
+    db = initialize_firestore()
+    doc = db.collection('users').document(username).collection('review').document('queue').get()
+    return doc.to_dict() if doc.exists else None
+
+@transactional
+def _update_document_transaction(transaction, doc_ref, update):
+    snapshot = doc_ref.get(transaction=transaction)
+    new_data = update(snapshot.to_dict() if snapshot.exists else None)
+    transaction.set(doc_ref, new_data)
+    return new_data
+
+@guarded(idempotent=False)
+def update_review_queue(username: str, update) -> dict:
+    """Applies update(current queue doc or None) -> new doc transactionally and returns the new doc."""
+    db = initialize_firestore()
+    queue_ref = db.collection('users').document(username).collection('review').document('queue')
+    return _update_document_transaction(db.transaction(), queue_ref, update)
+
+@guarded()
+def get_leaderboard(board_id: str) -> dict:
+    db = initialize_firestore()
+    doc = db.collection('leaderboards').document(board_id).get()
+    return doc.to_dict() if doc.exists else None
+
+@guarded(idempotent=False)
+def update_leaderboard(board_id: str, update) -> dict:
+    """Applies update(current board or None) -> new board transactionally and returns the new board."""
+    db = initialize_firestore()
+    return _update_document_transaction(db.transaction(), db.collection('leaderboards').document(board_id), update)
+
+@guarded()
+def get_quiz_popularity() -> dict:
+    """Returns {quiz_id: attempt_count} for every quiz that has been attempted."""
+    db = initialize_firestore()
+    doc = db.collection('content_stats').document('popularity').get()
+    return doc.to_dict().get('counts', {}) if doc.exists else {}
+
+@guarded()
+def get_usernames(group_id: str = None) -> list:
+    """Lists usernames, optionally only those in a class group, without reading user documents."""
+    db = initialize_firestore()
+    users = db.collection('users')
+    if group_id:
+        return [doc.id for doc in users.where(filter=firestore.FieldFilter('group_id', '==', group_id)).stream()]
+    return [ref.id for ref in users.list_documents()]
+
+# --- In-Progress Quiz Checkpoints ---
+@guarded()
+def get_checkpoints(username: str, db=None) -> dict:
+    """Returns {quiz_id: checkpoint} for the user's unfinished quizzes (users/{username}/checkpoints)."""
+    db = db or initialize_firestore()
+    return {doc.id: doc.to_dict()
+            for doc in db.collection('users').document(username).collection('checkpoints').stream()}
+
+@guarded(deadline=WRITE_DEADLINE_SECONDS)
+def write_checkpoints(writes: list, db=None):
+    """Applies [(username, quiz_id, checkpoint or None to delete)] in one batch per MAX_BATCH_WRITES."""
+    db = db or initialize_firestore()
+    users = db.collection('users')
+    for start in range(0, len(writes), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for username, quiz_id, checkpoint in writes[start:start + MAX_BATCH_WRITES]:
+            ref = users.document(username).collection('checkpoints').document(quiz_id)
+            if checkpoint is None:
+                batch.delete(ref)
+            else:
+                batch.set(ref, checkpoint)
+        batch.commit()
+
+# --- Roles and Class Groups ---
+# A user document carries its role ("student", "teacher" or "admin") and, for students, the
+# group_id of its class. Each class is groups/{group_id} = {"name", "teachers": [usernames]}.
+# Attempts are stamped with the student's group_id when saved, so a class's members, its
+# teachers' classes and its attempts are all single indexed queries.
+@guarded(deadline=WRITE_DEADLINE_SECONDS)
+def set_user_fields(username: str, fields: dict):
+    """Merges fields into a user document; a None value removes the field."""
+    db = initialize_firestore()
+    db.collection('users').document(username).set(
+        {key: firestore.DELETE_FIELD if value is None else value for key, value in fields.items()}, merge=True)
+
+@guarded()
+def get_groups() -> dict:
+    """Returns {group_id: group document} for every class."""
+    db = initialize_firestore()
+    return {doc.id: doc.to_dict() for doc in db.collection('groups').stream()}
+
+@guarded()
+def get_teacher_groups(username: str) -> dict:
+    """Returns {group_id: group document} for the classes a teacher is assigned to."""
+    db = initialize_firestore()
+    query = db.collection('groups').where(filter=firestore.FieldFilter('teachers', 'array_contains', username))
+    return {doc.id: doc.to_dict() for doc in query.stream()}
+
+@guarded(deadline=WRITE_DEADLINE_SECONDS)
+def save_group(group_id: str, name: str, teachers: list):
+    db = initialize_firestore()
+    db.collection('groups').document(group_id).set({'name': name, 'teachers': sorted(teachers)})
+
+@guarded(deadline=WRITE_DEADLINE_SECONDS)
+def set_group_members(group_id: str, add=(), remove=()):
+    """Moves the `add` users into the class and takes the `remove` users out of it, in batches."""
+    db = initialize_firestore()
+    users = db.collection('users')
+    updates = [(username, group_id) for username in add] + [(username, firestore.DELETE_FIELD) for username in remove]
+    for start in range(0, len(updates), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for username, value in updates[start:start + MAX_BATCH_WRITES]:
+            batch.set(users.document(username), {'group_id': value}, merge=True)
+        batch.commit()
+
+@guarded(deadline=60)
+def delete_group(group_id: str):
+    """Deletes the class and removes its students from it (their past attempts keep the group_id)."""
+    set_group_members(group_id, remove=get_usernames(group_id))
+    initialize_firestore().collection('groups').document(group_id).delete()
+
+@guarded()
+def get_group_attempts(group_id: str, start=None, limit: int = None) -> list:
+    """
+    Returns the class's attempts newest first, across all of its students, with one
+    collection-group query on the (group_id, timestamp) index in firestore.indexes.json.
+    Each attempt also gets its owner's username as `student_name` if it lacks one.
+    """
+    db = initialize_firestore()
+    query = db.collection_group('attempts').where(filter=firestore.FieldFilter('group_id', '==', group_id))
+    if start:
+        query = query.where(filter=firestore.FieldFilter('timestamp', '>=', start))
+    query = query.order_by("timestamp", direction=firestore.Query.DESCENDING)
+    if limit:
+        query = query.limit(limit)
+    attempts = []
+    for doc in query.stream():
+        attempt_data = doc.to_dict()
+        attempt_data['filename'] = doc.id
+        attempt_data.setdefault('student_name', doc.reference.parent.parent.id)
+        attempts.append(attempt_data)
+    return attempts
+
+# --- App Configuration ---
+@guarded()
+def get_profiler_config() -> dict:
+    db = initialize_firestore()
+    doc = db.collection('app_config').document('profiler').get()
+    return doc.to_dict() if doc.exists else {}
+
+@guarded(deadline=WRITE_DEADLINE_SECONDS)
+def set_profiler_config(config: dict):
+    set_document('app_config', 'profiler', config)
+
+# --- Attempt Rollups ---
+@guarded()
+def get_attempt_rollups(username: str, first_month: str = None) -> list:
+    """Returns the user's monthly rollup documents (each with its `id`), oldest first, from first_month on."""
+    db = initialize_firestore()
+    query = db.collection('users').document(username).collection('attempt_rollups')
+    if first_month:
+        query = query.where(filter=firestore.FieldFilter('month', '>=', first_month))
+    rollups = [dict(doc.to_dict(), id=doc.id) for doc in query.stream()]
+    return sorted(rollups, key=lambda rollup: (rollup['month'], rollup.get('part', 0)))
+
+@guarded(deadline=60, idempotent=False)
+def write_attempt_rollups(username: str, rollups: dict, stale_rollup_ids=(), attempt_ids=()):
+    """
+    Writes rollup documents ({doc_id: data}), then deletes stale rollup parts and the attempts
+    they now hold, MAX_BATCH_WRITES per batch. Rollups are committed before any attempt is
+    deleted, so an interrupted run loses nothing and re-running it merges by attempt id.
+    """
+    db = initialize_firestore()
+    user_ref = db.collection('users').document(username)
+    writes = [('set', user_ref.collection('attempt_rollups').document(doc_id), data) for doc_id, data in rollups.items()]
+    writes += [('delete', user_ref.collection('attempt_rollups').document(doc_id), None) for doc_id in stale_rollup_ids]
+    writes += [('delete', user_ref.collection('attempts').document(attempt_id), None) for attempt_id in attempt_ids]
+    rollup_count = len(rollups)
+    start = 0
+    while start < len(writes):
+        # The first batches hold only rollups, so attempts are never deleted before their rollup exists
+        stop = min(start + MAX_BATCH_WRITES, rollup_count if start < rollup_count else len(writes))
+        batch = db.batch()
+        for op, ref, data in writes[start:stop]:
+            batch.set(ref, data) if op == 'set' else batch.delete(ref)
+        batch.commit()
+        start = stop
+
+def iter_attempt_pages(username: str, page_size: int, end=None):
+    """
+    Yields the user's attempts oldest first (before `end` if given), page_size at a time. Each
+    page is its own query resuming after the previous page's last document, so no page holds
+    more than page_size. Attempts folded into monthly rollups are not included (see attempt_rollups).
+    """
+    db = initialize_firestore()
+    query = db.collection('users').document(username).collection('attempts')
+    if end:
+        query = query.where(filter=firestore.FieldFilter('timestamp', '<', end))
+    query = query.order_by("timestamp").limit(page_size)
+    last_doc = None
+    while True:
+        docs = list((query.start_after(last_doc) if last_doc else query).stream())
+        if not docs:
+            return
+        yield [dict(doc.to_dict(), filename=doc.id) for doc in docs]
+        if len(docs) < page_size:
+            return
+        last_doc = docs[-1]
+
+def iter_group_attempt_pages(group_id: str, page_size: int):
+    """
+    Yields the attempts made in a class group oldest first, page_size at a time, with one
+    collection-group query per page on the (group_id, timestamp) index. Each attempt also
+    gets its owner's username as `student_name` if it lacks one. Attempts folded into
+    monthly rollups are not included (see attempt_rollups).
+    """
+    db = initialize_firestore()
+    query = (db.collection_group('attempts').where(filter=firestore.FieldFilter('group_id', '==', group_id))
+             .order_by("timestamp").limit(page_size))
+    last_doc = None
+    while True:
+        docs = list((query.start_after(last_doc) if last_doc else query).stream())
+        if not docs:
+            return
+        page = []
+        for doc in docs:
+            attempt_data = dict(doc.to_dict(), filename=doc.id)
+            attempt_data.setdefault('student_name', doc.reference.parent.parent.id)
+            page.append(attempt_data)
+        yield page
+        if len(docs) < page_size:
+            return
+        last_doc = docs[-1]
+
+@guarded()
+def get_student_attempts(username: str, subject: str = None, level: str = None,
+                         start=None, end=None, limit: int = None) -> list:
+    """
+    Returns the user's attempts newest first, filtered by Firestore itself. Combining subject
+    or level with the timestamp order uses the composite indexes in firestore.indexes.json.
+    """
+    db = initialize_firestore()
+    query = db.collection('users').document(username).collection('attempts')
+    if subject:
+        query = query.where(filter=firestore.FieldFilter('subject', '==', subject))
+    if level:
+        query = query.where(filter=firestore.FieldFilter('level', '==', level))
+    if start:
+        query = query.where(filter=firestore.FieldFilter('timestamp', '>=', start))
+    if end:
+        query = query.where(filter=firestore.FieldFilter('timestamp', '<', end))
+    query = query.order_by("timestamp", direction=firestore.Query.DESCENDING)
+    if limit:
+        query = query.limit(limit)
+
     attempts = []
     for doc in query.stream():
         attempt_data = doc.to_dict()
@@ -1,3 +1,23 @@
 class FirebaseCredentialsError(Exception):
     """Custom exception for Firebase credential loading errors."""
     pass
+
+class BackendUnavailableError(Exception):
+    """Raised when Firestore cannot serve a call in time (deadline exceeded, repeated failures or open circuit)."""
+    pass
+
+class CircuitOpenError(BackendUnavailableError):
+    """Raised without calling Firestore while the circuit breaker is open."""
+    pass
+
+class DeadlineExceededError(BackendUnavailableError):
+    """Raised when a Firestore call does not finish within its deadline."""
+    pass
+
+class TemplateError(Exception):
+    """Raised for a Math question template that cannot be compiled or never yields a valid question."""
+    pass
+
+class AnswerSpecError(Exception):
+    """Raised for a text question's answer_spec that cannot be compiled into a matcher."""
+    pass
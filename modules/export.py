@@ -0,0 +1,230 @@
+"""
+Bulk export of quiz attempts for teachers and offline analysis.
+
+Attempts are read page by page (see database_manager.iter_attempt_pages), after the ones
+compacted into monthly rollups (one page per rollup document), and flattened
+to one row per question, then written incrementally as CSV or, when pyarrow is
+installed, Parquet. A class export holds only the attempts made in that class (those
+saved with its group_id), not its members' whole history. Only one page of attempts and one Parquet row group are held in
+memory at a time, however many rows the export has.
+
+    python -m modules.export attempts.parquet
+    python -m modules.export class_7a.csv --group 7a
+    python -m modules.export alice.csv --user alice
+"""
+import argparse
+import csv
+import io
+import itertools
+import os
+import sys
+from datetime import timezone
+from modules import async_db, attempt_rollups, data_manager, database_manager, scoring
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional; CSV always works
+    pa = pq = None
+
+# Attempts fetched per Firestore query.
+EXPORT_PAGE_SIZE = 500
+# Rows buffered per Parquet row group (and flushed per CSV write).
+ROW_GROUP_SIZE = 20_000
+
+# (column, type) for every exported row. Attempt fields repeat on each of its question rows;
+# an attempt without question data still exports one row with empty question columns.
+COLUMNS = (
+    ("student_name", "string"),
+    ("attempt_id", "string"),
+    ("timestamp", "timestamp"),
+    ("subject", "string"),
+    ("topic", "string"),
+    ("level", "string"),
+    ("level_name", "string"),
+    ("attempt_quiz_id", "string"),
+    ("quiz_version", "string"),
+    ("attempt_score", "int"),
+    ("total_questions", "int"),
+    ("time_taken", "int"),
+    ("question_number", "int"),
+    ("quiz_id", "string"),
+    ("question_id", "string"),
+    ("question_topic", "string"),
+    ("question_type", "string"),
+    ("prompt", "string"),
+    ("user_answer", "string"),
+    ("correct_answer", "string"),
+    ("is_correct", "bool"),
+    ("question_seconds", "float"),
+)
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+
+FORMATS = ("parquet", "csv") if pq else ("csv",)
+MIME_TYPES = {"parquet": "application/vnd.apache.parquet", "csv": "text/csv"}
+
+def _answer_text(answer):
+    if answer is None:
+        return None
+    if isinstance(answer, (list, tuple)):
+        return "|".join(str(key) for key in answer)
+    return str(answer)
+
+def _optional(value, cast):
+    return None if value is None else cast(value)
+
+def attempt_rows(attempt: dict) -> list:
+    """Flattens one attempt into its per-question export rows (as dicts keyed by COLUMN_NAMES)."""
+    base = {
+        "student_name": attempt.get("student_name"),
+        "attempt_id": attempt.get("filename"),
+        "timestamp": data_manager.attempt_datetime(attempt["timestamp"]).astimezone(timezone.utc)
+                     if attempt.get("timestamp") else None,
+        "subject": attempt.get("subject"),
+        "topic": attempt.get("topic"),
+        "level": attempt.get("level"),
+        "level_name": attempt.get("level_name"),
+        "attempt_quiz_id": attempt.get("quiz_id"),
+        "quiz_version": _optional(attempt.get("quiz_version"), str),
+        "attempt_score": _optional(attempt.get("score"), int),
+        "total_questions": _optional(attempt.get("total_questions"), int),
+        "time_taken": _optional(attempt.get("time_taken"), int),
+    }
+    questions = attempt.get("questions") or []
+    if not questions:
+        return [dict.fromkeys(COLUMN_NAMES) | base]
+    question_times = attempt.get("question_times") or []
+    rows = []
+    for i, question in enumerate(questions):
+        user_answer = question.get("user_answer")
+        rows.append(base | {
+            "question_number": i + 1,
+            "quiz_id": question.get("quiz_id") or attempt.get("quiz_id"),
+            "question_id": _optional(question.get("id"), str),
+            "question_topic": question.get("topic"),
+            "question_type": scoring.question_type(question),
+            "prompt": question.get("prompt"),
+            "user_answer": _answer_text(user_answer),
+            "correct_answer": _answer_text(question.get("answer")),
+            "is_correct": scoring.is_answer_correct(question, user_answer),
+            "question_seconds": float(question_times[i]) if i < len(question_times) else None,
+        })
+    return rows
+
+def export_usernames(username: str = None, group_id: str = None) -> list:
+    """The students an export covers: one user, one class group's members, or everyone."""
+    if username:
+        return [username]
+    return sorted(database_manager.get_usernames(group_id))
+
+def _attempt_pages(username: str, page_size: int):
+    """Yields the student's attempts oldest first: each monthly rollup's, then the live ones a page at a time."""
+    for rollup in database_manager.get_attempt_rollups(username):
+        yield attempt_rollups.decode_attempts(bytes(rollup["data"]))
+    yield from database_manager.iter_attempt_pages(username, page_size)
+
+def _group_attempt_pages(group_id: str, page_size: int):
+    """
+    Yields the attempts made in a class group: those in its members' monthly rollups, one page
+    per rollup, then the live ones oldest first, a page at a time across all members.
+    """
+    for username in export_usernames(group_id=group_id):
+        for rollup in database_manager.get_attempt_rollups(username):
+            attempts = [attempt for attempt in attempt_rollups.decode_attempts(bytes(rollup["data"]))
+                        if attempt.get("group_id") == group_id]
+            if attempts:
+                yield attempts
+    yield from database_manager.iter_group_attempt_pages(group_id, page_size)
+
+def export_pages(username: str = None, group_id: str = None, page_size: int = EXPORT_PAGE_SIZE):
+    """Yields the pages of attempts an export covers: one user's, one class group's, or everyone's."""
+    if group_id and not username:
+        return _group_attempt_pages(group_id, page_size)
+    return itertools.chain.from_iterable(
+        _attempt_pages(name, page_size) for name in export_usernames(username))
+
+def _read_ahead(pages):
+    """Yields from pages while the next page is fetched on the I/O pool, overlapping reads with writing."""
+    executor = async_db.get_io_executor()
+    future = executor.submit(next, pages, None)
+    while (page := future.result()) is not None:
+        future = executor.submit(next, pages, None)
+        yield page
+
+def iter_row_chunks(pages, chunk_rows: int = ROW_GROUP_SIZE):
+    """Yields lists of about chunk_rows export rows from pages of attempts (see export_pages)."""
+    chunk = []
+    for page in _read_ahead(pages):
+        for attempt in page:
+            chunk.extend(attempt_rows(attempt))
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _arrow_schema():
+    types = {"string": pa.string(), "int": pa.int64(), "bool": pa.bool_(),
+             "float": pa.float64(), "timestamp": pa.timestamp("us", tz="UTC")}
+    return pa.schema([(name, types[kind]) for name, kind in COLUMNS])
+
+def write_parquet(chunks, output) -> int:
+    """Writes row chunks to a Parquet path or binary file, one row group per chunk; returns the row count."""
+    if pq is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow); use CSV instead.")
+    schema = _arrow_schema()
+    count = 0
+    with pq.ParquetWriter(output, schema, compression="zstd") as writer:
+        for chunk in chunks:
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+            count += len(chunk)
+    return count
+
+def write_csv(chunks, output) -> int:
+    """Writes row chunks as UTF-8 CSV to a path or binary file; returns the row count."""
+    stream = open(output, "wb") if isinstance(output, (str, os.PathLike)) else output
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    count = 0
+    try:
+        writer = csv.DictWriter(text, fieldnames=COLUMN_NAMES)
+        writer.writeheader()
+        for chunk in chunks:
+            for row in chunk:
+                if row["timestamp"] is not None:
+                    row["timestamp"] = row["timestamp"].isoformat()
+            writer.writerows(chunk)
+            count += len(chunk)
+        text.flush()
+    finally:
+        text.detach()  # Leave the caller's stream open
+        if stream is not output:
+            stream.close()
+    return count
+
+def export_attempts(output, fmt: str = "csv", username: str = None, group_id: str = None,
+                    page_size: int = EXPORT_PAGE_SIZE) -> int:
+    """Streams the selected attempts to output (a path or binary file) as fmt; returns the row count."""
+    writers = {"parquet": write_parquet, "csv": write_csv}
+    if fmt not in writers:
+        raise ValueError(f"Unknown export format: {fmt}")
+    chunks = iter_row_chunks(export_pages(username, group_id, page_size))
+    return writers[fmt](chunks, output)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Export quiz attempts, one row per question.")
+    parser.add_argument("output", help="Output file; .parquet or .csv picks the format unless --format is given")
+    parser.add_argument("--format", choices=("parquet", "csv"), default=None)
+    scope = parser.add_mutually_exclusive_group()
+    scope.add_argument("--user", default=None, help="Export a single student")
+    scope.add_argument("--group", default=None, help="Export one class group")
+    parser.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE, help="Attempts per Firestore query")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    database_manager.initialize_firestore()
+    count = export_attempts(args.output, fmt, username=args.user, group_id=args.group, page_size=args.page_size)
+    print(f"Wrote {count} rows to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
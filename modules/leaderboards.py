@@ -0,0 +1,89 @@
+import random
+import streamlit as st
+from modules import database_manager
+
+# Entries kept per leaderboard (one per student).
+LEADERBOARD_SIZE = 20
+# A board whose pending list grows past this is compacted by the next reader.
+COMPACT_PENDING_THRESHOLD = 100
+# Each save also compacts the boards it touched with this probability, so boards that
+# are rarely read stay small too. Expected pending length is about 1 / probability.
+COMPACT_PROBABILITY = 1 / 50
+# Seconds a rendered board may be served from cache.
+LEADERBOARD_TTL_SECONDS = 15
+# Attempt "mode" of review-queue and adaptive-practice rounds, which mix questions from many quizzes.
+ROUND_MODES = ("review", "practice")
+
+# Boards live in leaderboards/{board_id}. Saves append to a "pending" array with a blind
+# ArrayUnion in the attempt's own write batch (no read, no transaction); compaction folds
+# pending into the bounded, ranked "entries" list. Reading a board is one document fetch.
+
+def board_id(kind: str, key: str, group_id: str = None) -> str:
+    """Document id for a "quiz" or "subject" board, optionally scoped to a class group."""
+    base = f"{kind}__{key}"
+    return f"{base}__group__{group_id}" if group_id else base
+
+def is_quiz_attempt(attempt_data: dict) -> bool:
+    """True for an attempt at one quiz; review and practice rounds are saved with a round mode."""
+    return bool(attempt_data.get("quiz_id")) and attempt_data.get("mode") not in ROUND_MODES
+
+def attempt_board_ids(attempt_data: dict) -> list:
+    """The boards a quiz attempt counts towards: its quiz and subject, globally and for the student's group."""
+    if not is_quiz_attempt(attempt_data):
+        return []
+    keys = [("subject", attempt_data.get("subject")), ("quiz", attempt_data["quiz_id"])]
+    ids = [board_id(kind, key) for kind, key in keys if key]
+    if attempt_data.get("group_id"):
+        ids += [board_id(kind, key, attempt_data["group_id"]) for kind, key in keys if key]
+    return ids
+
+def attempt_entry(attempt_data: dict) -> dict:
+    """A compact board entry: user, score, total, seconds taken (or None) and when."""
+    return {
+        "u": attempt_data["student_name"],
+        "s": attempt_data.get("score", 0),
+        "n": attempt_data.get("total_questions", 0),
+        "t": attempt_data.get("time_taken"),
+        "ts": attempt_data.get("timestamp"),
+    }
+
+def _rank_key(entry: dict) -> tuple:
+    # Best percentage, then more questions, then fastest (untimed last), then earliest
+    percentage = entry["s"] / entry["n"] if entry.get("n") else 0
+    seconds = entry["t"] if entry.get("t") is not None else float("inf")
+    return (-percentage, -entry.get("n", 0), seconds, str(entry.get("ts")))
+
+def merge_entries(*entry_lists) -> list:
+    """Keeps each student's best entry and returns the top LEADERBOARD_SIZE, ranked."""
+    best = {}
+    for entries in entry_lists:
+        for entry in entries or []:
+            current = best.get(entry["u"])
+            if current is None or _rank_key(entry) < _rank_key(current):
+                best[entry["u"]] = entry
+    return sorted(best.values(), key=_rank_key)[:LEADERBOARD_SIZE]
+
+def _compact(board: dict) -> dict:
+    board = board or {}
+    return {"entries": merge_entries(board.get("entries"), board.get("pending")), "pending": []}
+
+def compact_board(doc_id: str) -> list:
+    """Folds a board's pending entries into its ranked list; returns the compacted entries."""
+    return database_manager.update_leaderboard(doc_id, _compact)["entries"]
+
+def maybe_compact(board_ids: list):
+    """Called after a save: compacts each touched board with COMPACT_PROBABILITY."""
+    for board in board_ids:
+        if random.random() < COMPACT_PROBABILITY:
+            compact_board(board)
+
+@st.cache_data(ttl=LEADERBOARD_TTL_SECONDS, show_spinner=False)
+def get_leaderboard(kind: str, key: str, group_id: str = None) -> list:
+    """Returns the ranked entries of a board with a single document read."""
+    doc_id = board_id(kind, key, group_id)
+    board = database_manager.get_leaderboard(doc_id)
+    if not board:
+        return []
+    if len(board.get("pending", [])) > COMPACT_PENDING_THRESHOLD:
+        return compact_board(doc_id)
+    return merge_entries(board.get("entries"), board.get("pending"))
@@ -0,0 +1,474 @@
+"""
+An in-memory stand-in for the Firestore client used by database_manager.
+
+It implements the subset of the google-cloud-firestore API this app relies on
+(collections, documents, queries, transactions, batches, multi-get and field
+transforms) so the real data access code can run without network access.
+It is selected by setting LEARNING_APP_BACKEND=local and is used by the
+benchmark and load-test tooling.
+"""
+import copy
+import itertools
+import random
+import string
+import threading
+import time
+from datetime import datetime, timezone
+
+from google.cloud.firestore_v1 import transforms
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+
+
+def _auto_id() -> str:
+    return "".join(random.choices(_AUTO_ID_CHARS, k=20))
+
+
+def _split_field_path(field_path: str) -> list:
+    return field_path.split(".")
+
+
+def _get_field(data: dict, field_path: str):
+    """Returns the value at a dotted field path, or raises KeyError."""
+    value = data
+    for part in _split_field_path(field_path):
+        if not isinstance(value, dict) or part not in value:
+            raise KeyError(field_path)
+        value = value[part]
+    return value
+
+
+def _stored_value(value):
+    """Copies a value as Firestore stores it: datetimes come back timezone-aware in UTC."""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+    if isinstance(value, dict):
+        return {key: _stored_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_stored_value(item) for item in value]
+    return copy.deepcopy(value)
+
+
+def _apply_transform(current, value):
+    """Resolves Firestore sentinels and transforms against the current value."""
+    if value is transforms.SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if isinstance(value, transforms.Increment):
+        return (current if isinstance(current, (int, float)) else 0) + value._value
+    if isinstance(value, transforms.Maximum):
+        return value._value if not isinstance(current, (int, float)) else max(current, value._value)
+    if isinstance(value, transforms.Minimum):
+        return value._value if not isinstance(current, (int, float)) else min(current, value._value)
+    if isinstance(value, transforms.ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        result.extend(v for v in value._values if v not in result)
+        return result
+    if isinstance(value, transforms.ArrayRemove):
+        return [v for v in (current if isinstance(current, list) else []) if v not in value._values]
+    if isinstance(value, dict):
+        base = current if isinstance(current, dict) else {}
+        return {k: _apply_transform(base.get(k), v) for k, v in value.items()}
+    return _stored_value(value)
+
+
+def _set_field(data: dict, field_path: str, value):
+    parts = _split_field_path(field_path)
+    target = data
+    for part in parts[:-1]:
+        if not isinstance(target.get(part), dict):
+            target[part] = {}
+        target = target[part]
+    if value is transforms.DELETE_FIELD:
+        target.pop(parts[-1], None)
+    else:
+        target[parts[-1]] = _apply_transform(target.get(parts[-1]), value)
+
+
+def _merge(target: dict, updates: dict):
+    for key, value in updates.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        elif value is transforms.DELETE_FIELD:
+            target.pop(key, None)
+        else:
+            target[key] = _apply_transform(target.get(key), value)
+
+
+def _order_value(value):
+    """Sort key following Firestore's cross-type ordering (null, bool, number, timestamp, string, ...)."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value if value.tzinfo else value.replace(tzinfo=timezone.utc))
+    if isinstance(value, str):
+        return (4, value)
+    return (5, repr(value))
+
+
+def _compare(op: str, left, right) -> bool:
+    try:
+        if op == "==":
+            return left == right
+        if op == "!=":
+            return left != right
+        if op == "<":
+            return left < right
+        if op == "<=":
+            return left <= right
+        if op == ">":
+            return left > right
+        if op == ">=":
+            return left >= right
+        if op == "in":
+            return left in right
+        if op == "not-in":
+            return left not in right
+        if op == "array_contains":
+            return isinstance(left, list) and right in left
+        if op == "array_contains_any":
+            return isinstance(left, list) and any(v in left for v in right)
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported operator: {op}")
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, update_time=None):
+        self.reference = reference
+        self._data = data
+        self.update_time = update_time
+        self.create_time = update_time
+        self.read_time = datetime.now(timezone.utc)
+
+    @property
+    def id(self) -> str:
+        return self.reference.id
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str):
+        if self._data is None:
+            return None
+        return copy.deepcopy(_get_field(self._data, field_path))
+
+
+class DocumentReference:
+    def __init__(self, client, path: str):
+        self._client = client
+        self.path = path
+
+    @property
+    def id(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def collection(self, collection_id: str):
+        return CollectionReference(self._client, f"{self.path}/{collection_id}")
+
+    def get(self, field_paths=None, transaction=None, **kwargs) -> DocumentSnapshot:
+        return self._client._read(self)
+
+    def set(self, document_data: dict, merge: bool = False, **kwargs):
+        self._client._write([("set", self, document_data, merge)])
+
+    def update(self, field_updates: dict, **kwargs):
+        self._client._write([("update", self, field_updates, None)])
+
+    def delete(self, **kwargs):
+        self._client._write([("delete", self, None, None)])
+
+    def on_snapshot(self, callback):
+        return self._client._listen(self.path, None, callback)
+
+
+class Query:
+    def __init__(self, client, collection_path: str, all_descendants: bool = False,
+                 filters=(), orders=(), limit_count=None, offset_count=0, cursor=None):
+        self._client = client
+        self._collection_path = collection_path
+        self._all_descendants = all_descendants
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit_count
+        self._offset = offset_count
+        self._cursor = cursor
+
+    def _copy(self, **overrides):
+        params = {
+            "filters": self._filters, "orders": self._orders, "limit_count": self._limit,
+            "offset_count": self._offset, "cursor": self._cursor,
+        }
+        params.update(overrides)
+        return Query(self._client, self._collection_path, self._all_descendants, **params)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, _stored_value(value)),))
+
+    def order_by(self, field_path: str, direction: str = "ASCENDING"):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int):
+        return self._copy(limit_count=count)
+
+    def offset(self, num_to_skip: int):
+        return self._copy(offset_count=num_to_skip)
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def _matches(self, path: str) -> bool:
+        parent = path.rsplit("/", 1)[0]
+        if self._all_descendants:
+            return parent.rsplit("/", 1)[-1] == self._collection_path
+        return parent == self._collection_path
+
+    def _sort_key(self, path: str, data: dict):
+        return [_order_value(_get_field(data, field)) for field, _ in self._orders] + [path]
+
+    def stream(self, transaction=None, **kwargs):
+        return iter(self.get(transaction=transaction))
+
+    def get(self, transaction=None, **kwargs) -> list:
+        rows = []
+        for path, data in self._client._scan(self._matches):
+            try:
+                if not all(_compare(op, _get_field(data, field), value) for field, op, value in self._filters):
+                    continue
+                rows.append((self._sort_key(path, data), path, data))
+            except KeyError:
+                continue  # Firestore omits documents missing a filtered or ordered field
+
+        for position in reversed(range(len(self._orders))):
+            descending = self._orders[position][1] == "DESCENDING"
+            rows.sort(key=lambda row: row[0][position], reverse=descending)
+
+        if self._cursor is not None:
+            cursor_path = getattr(getattr(self._cursor, "reference", None), "path", None)
+            paths = [path for _, path, _ in rows]
+            if cursor_path in paths:
+                rows = rows[paths.index(cursor_path) + 1:]
+
+        rows = rows[self._offset:]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        self._client._count_reads(max(len(rows), 1))
+        return [DocumentSnapshot(DocumentReference(self._client, path), copy.deepcopy(data))
+                for _, path, data in rows]
+
+    def on_snapshot(self, callback):
+        return self._client._listen(None, self._matches, callback)
+
+
+class CollectionReference(Query):
+    def __init__(self, client, path: str):
+        super().__init__(client, path)
+        self.path = path
+
+    @property
+    def id(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        """The document a subcollection belongs to, or None for a top-level collection."""
+        if "/" not in self.path:
+            return None
+        return DocumentReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def document(self, document_id: str = None) -> DocumentReference:
+        return DocumentReference(self._client, f"{self.path}/{document_id or _auto_id()}")
+
+    def add(self, document_data: dict, document_id: str = None):
+        ref = self.document(document_id)
+        ref.set(document_data)
+        return datetime.now(timezone.utc), ref
+
+    def list_documents(self, page_size=None):
+        return [DocumentReference(self._client, path) for path, _ in self._client._scan(self._matches)]
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, document_data: dict, merge: bool = False):
+        self._writes.append(("set", reference, document_data, merge))
+
+    def update(self, reference, field_updates: dict, **kwargs):
+        self._writes.append(("update", reference, field_updates, None))
+
+    def delete(self, reference, **kwargs):
+        self._writes.append(("delete", reference, None, None))
+
+    def commit(self, **kwargs) -> list:
+        writes, self._writes = self._writes, []
+        self._client._write(writes)
+        return writes
+
+
+class Transaction(WriteBatch):
+    """Mirrors the private hooks google.cloud.firestore's @transactional relies on."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, client, max_attempts: int = 5, read_only: bool = False):
+        super().__init__(client)
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+
+    @property
+    def in_progress(self) -> bool:
+        return self._id is not None
+
+    def _clean_up(self):
+        self._writes = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._id = str(next(self._ids)).encode()
+
+    def _rollback(self):
+        self._clean_up()
+
+    def _commit(self) -> list:
+        writes = self.commit()
+        self._clean_up()
+        return writes
+
+    def get(self, ref_or_query, **kwargs):
+        if isinstance(ref_or_query, DocumentReference):
+            return iter([ref_or_query.get()])
+        return ref_or_query.stream()
+
+    def get_all(self, references, **kwargs):
+        return self._client.get_all(references)
+
+
+class LocalFirestoreClient:
+    """A thread-safe, process-local document store with the Firestore client surface."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self._docs = {}
+        self._update_times = {}
+        self._lock = threading.RLock()
+        self._listeners = {}
+        self._listener_ids = itertools.count()
+        self.latency_ms = latency_ms
+        self.stats = {"reads": 0, "writes": 0}
+
+    # --- Public client API ---
+    def collection(self, collection_path: str) -> CollectionReference:
+        return CollectionReference(self, collection_path)
+
+    def document(self, document_path: str) -> DocumentReference:
+        return DocumentReference(self, document_path)
+
+    def collection_group(self, collection_id: str) -> Query:
+        return Query(self, collection_id, all_descendants=True)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def transaction(self, **kwargs) -> Transaction:
+        return Transaction(self, **kwargs)
+
+    def get_all(self, references, field_paths=None, transaction=None, **kwargs):
+        """Fetches many documents in a single simulated round trip."""
+        references = list(references)
+        self._simulate_latency()
+        with self._lock:
+            self.stats["reads"] += len(references)
+            return iter([self._snapshot(ref) for ref in references])
+
+    def reset(self):
+        with self._lock:
+            self._docs.clear()
+            self._update_times.clear()
+            self.stats = {"reads": 0, "writes": 0}
+
+    # --- Internal storage operations ---
+    def _simulate_latency(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def _count_reads(self, count: int):
+        with self._lock:
+            self.stats["reads"] += count
+
+    def _snapshot(self, ref) -> DocumentSnapshot:
+        data = self._docs.get(ref.path)
+        return DocumentSnapshot(ref, copy.deepcopy(data), self._update_times.get(ref.path))
+
+    def _read(self, ref) -> DocumentSnapshot:
+        self._simulate_latency()
+        with self._lock:
+            self.stats["reads"] += 1
+            return self._snapshot(ref)
+
+    def _scan(self, predicate):
+        self._simulate_latency()
+        with self._lock:
+            return [(path, data) for path, data in self._docs.items() if predicate(path)]
+
+    def _write(self, writes):
+        self._simulate_latency()
+        changed = []
+        with self._lock:
+            for kind, ref, data, merge in writes:
+                if kind == "delete":
+                    self._docs.pop(ref.path, None)
+                elif kind == "update":
+                    if ref.path not in self._docs:
+                        raise KeyError(f"No document to update: {ref.path}")
+                    for field_path, value in data.items():
+                        _set_field(self._docs[ref.path], field_path, value)
+                elif merge:
+                    _merge(self._docs.setdefault(ref.path, {}), data)
+                else:
+                    self._docs[ref.path] = _apply_transform(None, data)
+                self._update_times[ref.path] = datetime.now(timezone.utc)
+                self.stats["writes"] += 1
+                changed.append(ref)
+            listeners = list(self._listeners.values())
+        for doc_path, predicate, callback in listeners:
+            matching = [ref for ref in changed if ref.path == doc_path or (predicate and predicate(ref.path))]
+            if matching:
+                callback([self._snapshot(ref) for ref in matching], [], datetime.now(timezone.utc))
+
+    def _listen(self, doc_path, predicate, callback):
+        listener_id = next(self._listener_ids)
+        with self._lock:
+            self._listeners[listener_id] = (doc_path, predicate, callback)
+        return _Watch(self, listener_id)
+
+
+class _Watch:
+    def __init__(self, client, listener_id):
+        self._client = client
+        self._listener_id = listener_id
+
+    def unsubscribe(self):
+        with self._client._lock:
+            self._client._listeners.pop(self._listener_id, None)
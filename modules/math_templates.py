@@ -0,0 +1,319 @@
+"""
+Parametric Math questions.
+
+A Math question with a "template" object is generated instead of served as written:
+
+    {"id": "q1", "type": "text", "topic": "Subtraction",
+     "prompt": "{name} has {a} marbles and gives away {b}. How many are left?",
+     "template": {
+         "variables": {"a": {"min": 10, "max": 50}, "b": {"min": 1, "max": 9},
+                       "name": {"choices": ["Ravi", "Asha"]}},
+         "constraints": ["a - b >= 5"],
+         "derived": {},
+         "answer": "a - b"}}
+
+Variables are drawn uniformly from a range (with an optional "step", e.g. 0.25) or from
+"choices". "derived" values are formulas over the variables, usable like variables.
+Samples breaking any constraint are drawn again. single_choice templates also give
+"distractors", wrong-answer formulas turned into shuffled options. Numbers are shown
+with trailing zeros stripped, or rounded to "decimals" places. A text template's
+"answer_spec" (see answer_matching) is copied to every instance and checked against it.
+
+Formulas are a small arithmetic language: numbers, variables, + - * / // % **, comparisons,
+and/or/not, "x if c else y" and the functions in FUNCTIONS. They are parsed once with ast,
+checked against that whitelist and compiled into closures, so nothing else can run.
+Instances come from a seeded random.Random, so a (quiz, seed) pair always produces the
+same worksheet and only the seed needs to be stored.
+
+    python -m modules.math_templates story.json --worksheets 3 --seed 7
+"""
+import argparse
+import ast
+import json
+import math
+import operator
+import random
+import string
+import sys
+from dataclasses import dataclass
+from decimal import Decimal
+from modules import answer_matching
+from modules.exceptions import AnswerSpecError, TemplateError
+
+FUNCTIONS = {
+    "min": min, "max": max, "abs": abs, "round": round,
+    "floor": math.floor, "ceil": math.ceil, "sqrt": math.sqrt, "gcd": math.gcd, "lcm": math.lcm,
+}
+# Longest formula accepted, and the largest exponent ** may use, to keep evaluation cheap.
+MAX_FORMULA_LENGTH = 300
+MAX_EXPONENT = 64
+# Draws per instance before giving up on a template's constraints.
+MAX_SAMPLES = 500
+# Instances generated at upload time to prove a template can produce questions.
+CHECK_SAMPLES = 20
+
+def _power(base, exponent):
+    if abs(exponent) > MAX_EXPONENT:
+        raise ValueError(f"exponent {exponent} is too large")
+    return base ** exponent
+
+_BINARY = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, ast.Pow: _power,
+}
+_UNARY = {ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Not: operator.not_}
+_COMPARE = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+
+# --- Formula compiler ---
+def _compile_node(node, names: frozenset):
+    """Compiles one whitelisted AST node into a function of the variables dict."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = node.value
+        return lambda env: value
+    if isinstance(node, ast.Name):
+        if node.id not in names:
+            raise TemplateError(f"unknown name {node.id!r}")
+        name = node.id
+        return lambda env: env[name]
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        op, left, right = _BINARY[type(node.op)], _compile_node(node.left, names), _compile_node(node.right, names)
+        return lambda env: op(left(env), right(env))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+        op, operand = _UNARY[type(node.op)], _compile_node(node.operand, names)
+        return lambda env: op(operand(env))
+    if isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+        operands = [_compile_node(node.left, names)] + [_compile_node(c, names) for c in node.comparators]
+        ops = [_COMPARE[type(op)] for op in node.ops]
+        def compare(env):
+            values = [operand(env) for operand in operands]
+            return all(op(a, b) for op, a, b in zip(ops, values, values[1:]))
+        return compare
+    if isinstance(node, ast.BoolOp):
+        values = [_compile_node(value, names) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return lambda env: all(value(env) for value in values)
+        return lambda env: any(value(env) for value in values)
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = (_compile_node(n, names) for n in (node.test, node.body, node.orelse))
+        return lambda env: body(env) if test(env) else orelse(env)
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS
+            and not node.keywords):
+        func, args = FUNCTIONS[node.func.id], [_compile_node(arg, names) for arg in node.args]
+        return lambda env: func(*(arg(env) for arg in args))
+    if isinstance(node, ast.Call):
+        raise TemplateError(f"only these functions are allowed: {', '.join(FUNCTIONS)}")
+    raise TemplateError(f"{type(node).__name__} is not allowed in a formula")
+
+def compile_formula(source, names) -> callable:
+    """Compiles a formula over the given variable names; raises TemplateError if it is not allowed."""
+    if not isinstance(source, str) or not source.strip():
+        raise TemplateError("must be a non-empty formula string")
+    if len(source) > MAX_FORMULA_LENGTH:
+        raise TemplateError(f"is longer than {MAX_FORMULA_LENGTH} characters")
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise TemplateError(f"is not a valid formula: {e.msg}") from None
+    return _compile_node(tree.body, frozenset(names))
+
+# --- Variables and formatting ---
+def _decimals(number) -> int:
+    exponent = Decimal(str(number)).as_tuple().exponent
+    return max(-exponent, 0) if isinstance(exponent, int) else 0
+
+def _compile_variable(name: str, spec) -> callable:
+    """Compiles a variable spec into a sampler taking a random.Random."""
+    if not isinstance(spec, dict):
+        raise TemplateError(f"variable {name!r} must be an object with min/max or choices")
+    if "choices" in spec:
+        choices = spec["choices"]
+        if not isinstance(choices, list) or not choices or not all(
+                isinstance(c, (int, float, str)) and not isinstance(c, bool) for c in choices):
+            raise TemplateError(f"variable {name!r}: choices must be a non-empty list of numbers or strings")
+        choices = tuple(choices)
+        return lambda rng: rng.choice(choices)
+    low, high, step = spec.get("min"), spec.get("max"), spec.get("step", 1)
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (low, high, step)):
+        raise TemplateError(f"variable {name!r}: min, max and step must be numbers")
+    if low > high or step <= 0:
+        raise TemplateError(f"variable {name!r}: needs min <= max and a positive step")
+    count = int((high - low) / step + 1e-9)
+    if all(isinstance(v, int) for v in (low, high, step)):
+        return lambda rng: low + step * rng.randint(0, count)
+    places = max(_decimals(low), _decimals(step))
+    return lambda rng: round(low + step * rng.randint(0, count), places)
+
+def format_number(value, decimals: int = None) -> str:
+    """Shows a number as a student would write it: rounded to decimals if given, no trailing zeros."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return str(value)
+    if decimals is not None:
+        value = round(value, decimals)
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        return f"{value:.10f}".rstrip("0").rstrip(".")
+    return str(value)
+
+def _parse_prompt(prompt: str, names) -> tuple:
+    """Splits the prompt into (text, name, format spec) pieces, allowing only {name} or {name:spec}."""
+    try:
+        parsed = list(string.Formatter().parse(prompt))
+    except ValueError as e:
+        raise TemplateError(f"prompt is not a valid template: {e}") from None
+    for _, field, spec, conversion in parsed:
+        if field is not None and (field not in names or conversion or "{" in spec):
+            raise TemplateError(f"prompt placeholder {{{field}}} must name a variable or derived value")
+    return tuple((text, field, spec) for text, field, spec, _ in parsed)
+
+def _render_prompt(pieces: tuple, env: dict) -> str:
+    parts = []
+    for text, field, spec in pieces:
+        parts.append(text)
+        if field is not None:
+            parts.append(format(env[field], spec) if spec else format_number(env[field]))
+    return "".join(parts)
+
+# --- Templates ---
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """A template question compiled once; generate() turns a random.Random into a question dict."""
+    question: dict
+    q_type: str
+    variables: tuple
+    derived: tuple
+    constraints: tuple
+    answer: callable
+    distractors: tuple
+    decimals: int
+    prompt: tuple
+
+    def _sample(self, rng: random.Random) -> dict:
+        for _ in range(MAX_SAMPLES):
+            env = {name: sample(rng) for name, sample in self.variables}
+            try:
+                for name, formula in self.derived:
+                    env[name] = formula(env)
+                if all(constraint(env) for constraint in self.constraints):
+                    return env
+            except (ArithmeticError, ValueError, TypeError):
+                continue  # e.g. a division by zero for this draw; draw again
+        raise TemplateError(f"no values satisfied the constraints in {MAX_SAMPLES} draws")
+
+    def generate(self, rng: random.Random) -> dict:
+        """Returns a new question instance: the template's fields with a concrete prompt and answer."""
+        for _ in range(MAX_SAMPLES):
+            env = self._sample(rng)
+            try:
+                answer = format_number(self.answer(env), self.decimals)
+                wrong = [format_number(formula(env), self.decimals) for formula in self.distractors]
+                prompt = _render_prompt(self.prompt, env)
+            except (ArithmeticError, ValueError, TypeError):
+                continue
+            question = {key: value for key, value in self.question.items() if key != "template"}
+            question["prompt"] = prompt
+            if self.q_type == "text":
+                question["answer"] = answer
+                return question
+            texts = list(dict.fromkeys([answer] + [text for text in wrong if text != answer]))
+            if len(texts) < 2:
+                continue  # Every distractor equals the answer for this draw
+            rng.shuffle(texts)
+            keys = string.ascii_uppercase[:len(texts)]
+            question["options"] = [{"key": key, "text": text} for key, text in zip(keys, texts)]
+            question["answer"] = keys[texts.index(answer)]
+            return question
+        raise TemplateError(f"no draw in {MAX_SAMPLES} gave a distinct answer and distractors")
+
+def compile_template(question: dict) -> CompiledTemplate:
+    """Compiles a template question; raises TemplateError describing the first problem found."""
+    template = question.get("template")
+    if not isinstance(template, dict):
+        raise TemplateError("template must be an object")
+    q_type = question.get("type", "text")
+    if q_type not in ("text", "single_choice"):
+        raise TemplateError("template questions must be text or single_choice")
+    variables = template.get("variables")
+    if not isinstance(variables, dict) or not variables:
+        raise TemplateError("template.variables must define at least one variable")
+    compiled_variables = tuple((name, _compile_variable(name, spec)) for name, spec in variables.items()
+                               if _check_name(name))
+    names = set(variables)
+    derived = []
+    for name, source in (template.get("derived") or {}).items():
+        _check_name(name)
+        if name in names:
+            raise TemplateError(f"derived value {name!r} is already a variable")
+        derived.append((name, _compile_labelled(f"derived {name!r}", source, names)))
+        names.add(name)
+    constraints = tuple(_compile_labelled(f"constraint {i + 1}", source, names)
+                        for i, source in enumerate(template.get("constraints") or []))
+    distractors = tuple(_compile_labelled(f"distractor {i + 1}", source, names)
+                        for i, source in enumerate(template.get("distractors") or []))
+    if q_type == "single_choice" and not distractors:
+        raise TemplateError("single_choice templates need at least one distractor formula")
+    decimals = template.get("decimals")
+    if decimals is not None and (not isinstance(decimals, int) or isinstance(decimals, bool) or not 0 <= decimals <= 6):
+        raise TemplateError("template.decimals must be a whole number from 0 to 6")
+    if not isinstance(question.get("prompt"), str):
+        raise TemplateError("template questions need a prompt")
+    return CompiledTemplate(
+        question=question, q_type=q_type, variables=compiled_variables, derived=tuple(derived),
+        constraints=constraints, answer=_compile_labelled("answer", template.get("answer"), names),
+        distractors=distractors, decimals=decimals, prompt=_parse_prompt(question["prompt"], names),
+    )
+
+def _check_name(name) -> bool:
+    if not isinstance(name, str) or not name.isidentifier() or name in FUNCTIONS:
+        raise TemplateError(f"{name!r} is not a valid variable name")
+    return True
+
+def _compile_labelled(label: str, source, names) -> callable:
+    try:
+        return compile_formula(source, names)
+    except TemplateError as e:
+        raise TemplateError(f"{label} {e}") from None
+
+def check_template(question: dict) -> CompiledTemplate:
+    """Compiles a template and generates a few instances, so unsatisfiable templates fail at upload."""
+    compiled = compile_template(question)
+    for seed in range(CHECK_SAMPLES):
+        instance = compiled.generate(random.Random(seed))
+        if compiled.q_type == "text":
+            try:
+                accepted = answer_matching.compile_spec(instance.get("answer_spec"), instance["answer"])(instance["answer"])
+            except AnswerSpecError as e:
+                raise TemplateError(str(e)) from None
+            if not accepted:
+                raise TemplateError(f"answer_spec does not accept the generated answer {instance['answer']!r}")
+    return compiled
+
+# --- Command line ---
+def main(argv=None) -> int:
+    from modules import quiz_content
+    parser = argparse.ArgumentParser(description="Preview worksheets generated from a Math story with templates.")
+    parser.add_argument("path", help="Math story JSON file")
+    parser.add_argument("--worksheets", type=int, default=1, help="How many worksheets to generate")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first worksheet")
+    args = parser.parse_args(argv)
+
+    with open(args.path, encoding="utf-8") as f:
+        quiz_data = json.load(f)
+    try:
+        quiz = quiz_content.compile_quiz(args.path, quiz_data)
+        sheets = quiz_content.build_worksheets(quiz, range(args.seed, args.seed + args.worksheets))
+    except TemplateError as e:
+        print(f"{args.path}: {e}")
+        return 1
+    for sheet_seed, sheet in sheets.items():
+        print(f"# Worksheet {sheet_seed}")
+        for i, question in enumerate(sheet.questions, start=1):
+            options = "  ".join(f"{opt['key']}. {opt['text']}" for opt in question.get("options", ()))
+            print(f"{i}. {question['prompt']}" + (f"\n   {options}" if options else "") + f"\n   -> {question['answer']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,26 @@
 import streamlit as st
-from datetime import datetime
+from modules import authentication, data_manager, quiz_session, review_queue
+from modules.exceptions import BackendUnavailableError
+
+# The session flag that marks each activity view as in progress (its clock is running).
+ACTIVITY_FLAGS = {
+    "gk_quiz": "quiz_in_progress",
+    "math_exercise": "exercise_in_progress",
+    "adaptive_practice": "practice_in_progress",
+    "review": "review_in_progress",
+}
 
 def reset_activity_state():
     """Resets all session state variables related to an active quiz or exercise."""
     st.session_state.start_time = None
+    st.session_state.question_times = None
     st.session_state.quiz_finished = False
-    st.session_state.questions = []
-    st.session_state.user_answers = {}
+    st.session_state.active_quiz_id = None
+    st.session_state.active_quiz_version = None
+    st.session_state.active_quiz_seed = None
+    st.session_state.checkpoint_view = None
+    st.session_state.checkpointed = False
+    st.session_state.user_answers = []
     st.session_state.score = 0
     st.session_state.selected_level = None
     st.session_state.selected_chapter = None
@@ -14,6 +28,10 @@ def reset_activity_state():
     st.session_state.show_score_summary = False
     st.session_state.show_reward = False
     st.session_state.is_perfect_score = False
+    st.session_state.practice_in_progress = False
+    st.session_state.practice_finished = False
+    st.session_state.review_in_progress = False
+    st.session_state.review_finished = False
 
 def set_view(view_name: str):
     """Sets the current view of the application and reruns the script."""
@@ -21,6 +39,14 @@ def set_view(view_name: str):
     st.session_state.selected_attempt_file = None
     st.rerun()
 
+@st.fragment(run_every=1)
+def _render_timer():
+    """Ticks the elapsed time once a second by rerunning only this fragment, not the page."""
+    timer_flag = ACTIVITY_FLAGS.get(st.session_state.get("current_view"))
+    if timer_flag and st.session_state.get(timer_flag) and st.session_state.get("start_time"):
+        st.header("Time Elapsed")
+        st.markdown(f"## {data_manager.format_duration(quiz_session.elapsed_seconds())}")
+
 def render_sidebar():
     """Renders the main navigation sidebar and handles its logic."""
     with st.sidebar:
@@ -41,8 +67,26 @@ def render_sidebar():
                 reset_activity_state()
                 set_view("home_dashboard")
 
-            # --- Admin Button ---
-            if st.session_state.student_name == "admin":
+            try:
+                due_count = sum(review_queue.get_review_queue(st.session_state.student_name)
+                                .due_counts(review_queue.today_ordinal()).values())
+            except BackendUnavailableError:
+                due_count = 0  # The count is a hint; the review page reports the outage itself
+            if st.button(f"🔁 Review ({due_count} due)" if due_count else "🔁 Review", use_container_width=True):
+                reset_activity_state()
+                set_view("review")
+
+            if st.button("🏆 Leaderboards", use_container_width=True):
+                reset_activity_state()
+                set_view("leaderboard")
+
+            # --- Teacher and Admin Buttons ---
+            if authentication.is_teacher():
+                if st.button("🏫 My Classes", use_container_width=True):
+                    reset_activity_state()
+                    set_view("class_dashboard")
+
+            if authentication.is_admin():
                 if st.button("⚙️ Admin Dashboard", use_container_width=True):
                     reset_activity_state()
                     set_view("admin_dashboard")
@@ -62,18 +106,16 @@ def render_sidebar():
         if st.session_state.get("logged_in", False):
             st.caption(f"Logged in as:\n**{st.session_state.student_name}**")
         
+        timer_flag = ACTIVITY_FLAGS.get(st.session_state.get("current_view"))
+        if timer_flag and st.session_state.get(timer_flag) and st.session_state.get("start_time"):
+            _render_timer()
+
         is_in_activity = st.session_state.get("current_view") in ["gk_quiz", "math_exercise"]
         if is_in_activity and not st.session_state.get("quiz_finished", True) and not st.session_state.get("show_score_summary", False):
-            if st.session_state.get("start_time"):
-                st.header("Time Elapsed")
-                timer_placeholder = st.empty()
-                elapsed_time = datetime.now() - st.session_state.start_time
-                minutes, seconds = divmod(int(elapsed_time.total_seconds()), 60)
-                timer_placeholder.markdown(f"## {minutes:02d}:{seconds:02d}")
-            
-            if st.session_state.get("questions") and st.session_state.get("user_answers"):
-                total_questions = len(st.session_state.questions)
-                answered_questions = sum(1 for answer in st.session_state.user_answers.values() if answer is not None and answer != [])
+            quiz = quiz_session.active_quiz()
+            if quiz and st.session_state.get("user_answers"):
+                total_questions = len(quiz.questions)
+                answered_questions = quiz_session.answered_count(quiz)
                 st.subheader("Quiz Progress")
                 st.progress(answered_questions / total_questions if total_questions > 0 else 0)
                 st.write(f"{answered_questions} / {total_questions} Answered")
\ No newline at end of file
@@ -0,0 +1,114 @@
+import random
+from array import array
+from bisect import bisect
+from itertools import accumulate
+from modules import content_cache, data_manager
+
+# Questions drawn per adaptive practice round.
+PRACTICE_ROUND_SIZE = 10
+# Error-rate smoothing: a series with no history is treated as 1 wrong out of 2.
+PRIOR_WRONG, PRIOR_TOTAL = 1, 2
+# Mastered series keep a small share of questions so they are still revisited.
+MIN_WEIGHT = 0.05
+# How many redraws to try before accepting a question the session saw recently.
+MAX_REDRAWS = 8
+
+class PracticeIndex:
+    """
+    An inverted index from progress series keys ("GK", "GK › Topic", "GK › Topic › Level")
+    to the questions of every compiled quiz under them. Questions are int refs into two
+    parallel arrays (quiz number, question position), so large catalogs stay compact and
+    drawing a question is a few bisects and array lookups. The index keeps the compiled
+    quizzes it was built from, so a round's questions never go through the bounded content
+    cache, which a large catalog would thrash.
+    """
+
+    def __init__(self):
+        self.quiz_ids = []
+        self._quizzes = {}
+        self._ref_quiz = array("I")
+        self._ref_question = array("H")
+        self._refs_by_key = {}
+        self._children = {}
+
+    def add_quiz(self, series_keys: list, quiz):
+        """Indexes every question of a compiled quiz under each of its series keys (outermost first)."""
+        quiz_number = len(self.quiz_ids)
+        self.quiz_ids.append(quiz.quiz_id)
+        self._quizzes[quiz.quiz_id] = quiz
+        first_ref = len(self._ref_quiz)
+        self._ref_quiz.extend([quiz_number] * len(quiz.questions))
+        self._ref_question.extend(range(len(quiz.questions)))
+        for parent, key in zip([None] + series_keys, series_keys):
+            self._refs_by_key.setdefault(key, array("I")).extend(range(first_ref, len(self._ref_quiz)))
+            if key not in self._children.setdefault(parent, []):
+                self._children[parent].append(key)
+
+    def __len__(self) -> int:
+        return len(self._ref_quiz)
+
+    def question_count(self, series_key: str) -> int:
+        return len(self._refs_by_key.get(series_key, ()))
+
+    def children(self, series_key: str = None) -> list:
+        """Returns the series directly under series_key; with no key, the subjects."""
+        return self._children.get(series_key, [])
+
+    def quiz(self, quiz_id: str):
+        """Returns the indexed CompiledQuiz, or None if the quiz is not in the index."""
+        return self._quizzes.get(quiz_id)
+
+    def resolve(self, ref: int) -> tuple:
+        """Returns (quiz_id, question_index) for a question ref."""
+        return self.quiz_ids[self._ref_quiz[ref]], self._ref_question[ref]
+
+    def choose(self, series_key: str, error_rates: dict, rng: random.Random, exclude=()) -> int:
+        """
+        Draws a question ref under series_key. At each level (topic, then level or story) a
+        child is picked with probability proportional to the student's error rate in it;
+        the question is then drawn uniformly, avoiding (quiz_id, question_index) pairs in
+        exclude where possible. Returns None if the series has no questions.
+        """
+        refs = None
+        for _ in range(MAX_REDRAWS):
+            key = series_key
+            while self._children.get(key):
+                children = self._children[key]
+                cumulative = list(accumulate(
+                    max(error_rates.get(child, PRIOR_WRONG / PRIOR_TOTAL), MIN_WEIGHT) for child in children))
+                key = children[min(bisect(cumulative, rng.random() * cumulative[-1]), len(children) - 1)]
+            refs = self._refs_by_key.get(key)
+            if not refs:
+                return None
+            ref = refs[rng.randrange(len(refs))]
+            if self.resolve(ref) not in exclude:
+                return ref
+        return ref
+
+def build_practice_index() -> PracticeIndex:
+    """
+    Compiles the whole catalog (one multi-get for uncached quizzes) and indexes its questions.
+    Quizzes compiled here stay out of the content cache, so a rebuild never evicts the hot ones.
+    """
+    entries = data_manager.get_catalog_entries()
+    cache = content_cache.get_content_cache()
+    quizzes = {entry["quiz_id"]: cache.get(content_cache.quiz_key(entry["quiz_id"])) for entry in entries}
+    quizzes.update(data_manager.fetch_compiled_quizzes([quiz_id for quiz_id, quiz in quizzes.items() if quiz is None]))
+    index = PracticeIndex()
+    for entry in entries:
+        if quizzes.get(entry["quiz_id"]):
+            index.add_quiz(data_manager.progress_series_keys(entry), quizzes[entry["quiz_id"]])
+    return index
+
+def get_practice_index() -> PracticeIndex:
+    """Returns the shared index, rebuilt after any quiz upload or delete (see data_manager.invalidate_quiz)."""
+    return content_cache.get_practice_cache().get_or_load(content_cache.practice_index_key(), build_practice_index)
+
+def student_error_rates(student_name: str) -> dict:
+    """Returns {series_key: smoothed error rate} from the student's progress aggregates."""
+    rates = {}
+    for key, points in data_manager.get_progress_series(student_name).items():
+        score = sum(point[1] for point in points)
+        total = sum(point[2] for point in points)
+        rates[key] = (total - score + PRIOR_WRONG) / (total + PRIOR_TOTAL)
+    return rates
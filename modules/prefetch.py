@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from modules import content_cache, content_snapshot, data_manager, database_manager
+
+# How many of the most-attempted quizzes to compile into the content cache at startup.
+WARM_UP_QUIZ_COUNT = 20
+
+class Prefetcher:
+    """
+    Loads quizzes into the shared content cache on a small background pool so a
+    student's "Start" click usually finds the quiz already compiled. Workers get
+    the Firestore client and cache passed in and never call Streamlit APIs.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="quiz-prefetch")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def prefetch(self, quiz_ids: list):
+        """
+        Schedules every quiz id that isn't cached or already being fetched. The first id is
+        fetched on its own so it lands soonest; the rest share one multi-get.
+        """
+        cache = content_cache.get_content_cache()
+        db = database_manager.initialize_firestore()
+        snapshot = content_snapshot.get_snapshot_store()
+        with self._lock:
+            pending = [quiz_id for quiz_id in dict.fromkeys(quiz_ids)
+                       if content_cache.quiz_key(quiz_id) not in cache and quiz_id not in self._in_flight]
+            self._in_flight.update(pending)
+        for batch in (pending[:1], pending[1:]):
+            if batch:
+                self._executor.submit(self._load, cache, db, snapshot, batch)
+
+    def _load(self, cache, db, snapshot, quiz_ids: list):
+        try:
+            for quiz_id, quiz in data_manager.fetch_compiled_quizzes(quiz_ids, db=db, snapshot=snapshot).items():
+                cache.put(content_cache.quiz_key(quiz_id), quiz)
+        except Exception:
+            pass  # Prefetching is best effort; the foreground load will fetch and report errors
+        finally:
+            with self._lock:
+                self._in_flight.difference_update(quiz_ids)
+
+@st.cache_resource
+def get_prefetcher() -> Prefetcher:
+    """Returns the process-wide prefetcher."""
+    return Prefetcher()
+
+def prefetch_on_change(selection_key: str, quiz_ids: list):
+    """Prefetches quiz_ids once each time this session's selection changes."""
+    if st.session_state.get("last_prefetch_selection") == selection_key:
+        return
+    st.session_state.last_prefetch_selection = selection_key
+    get_prefetcher().prefetch(quiz_ids)
+
+def next_first(ordered_ids: list, selected_id: str) -> list:
+    """Orders ids as: selected, the one after it (the next level), then the rest."""
+    if selected_id not in ordered_ids:
+        return list(ordered_ids)
+    position = ordered_ids.index(selected_id)
+    return ordered_ids[position:position + 2] + ordered_ids[:position] + ordered_ids[position + 2:]
+
+def _default_warm_up_ids() -> list:
+    """The first level of every GK topic and the first story of every Math chapter."""
+    quiz_ids = []
+    for topic_info in data_manager.load_gk_index().get("topics_data", {}).values():
+        quizzes = topic_info.get("quizzes", {})
+        if quizzes:
+            quiz_ids.append(min(quizzes, key=lambda qid: data_manager.level_rank(quizzes[qid].get("name"))))
+    for chapter in data_manager.load_math_index().get("chapters", []):
+        if chapter.get("stories"):
+            quiz_ids.append(data_manager.math_quiz_id(chapter["id"], chapter["stories"][0]["file"]))
+    return quiz_ids
+
+@st.cache_resource
+def warm_up(limit: int = WARM_UP_QUIZ_COUNT) -> bool:
+    """Runs once per process: preloads the most-attempted quizzes, or each subject's entry level."""
+    popularity = database_manager.get_quiz_popularity()
+    quiz_ids = sorted(popularity, key=popularity.get, reverse=True)[:limit] or _default_warm_up_ids()[:limit]
+    get_prefetcher().prefetch(quiz_ids)
+    return True
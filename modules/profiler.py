@@ -0,0 +1,325 @@
+"""
+On-demand profiling of individual reruns.
+
+app.py runs main() through profile_rerun(). While an admin has switched profiling on
+(Admin Dashboard › Profiling, stored in Firestore at app_config/profiler), reruns of the
+selected users and views are profiled with probability sample_rate, at most
+MAX_PROFILES_PER_MINUTE per process:
+
+- "sampling" (default): a helper thread records the script thread's stack every
+  SAMPLE_INTERVAL_SECONDS. Overhead is small and independent of how much code runs, so
+  it can stay on in production. Stacks are kept folded ("a;b;c" -> samples) for flame graphs.
+- "deterministic": cProfile traces every call on the script thread; exact call counts
+  and times, but a slower rerun. Only a top-functions table is kept.
+
+Each profile is a JSON file in PROFILE_DIR with its metadata: user, view, what triggered
+the rerun, duration, outcome and the number of Firestore calls (counted by resilience).
+The newest MAX_STORED_PROFILES younger than PROFILE_RETENTION_DAYS are kept.
+Unselected reruns only pay for a cached config lookup.
+"""
+import cProfile
+import glob
+import json
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from modules import database_manager, resilience
+from modules.exceptions import BackendUnavailableError, FirebaseCredentialsError
+
+PROFILE_DIR = os.environ.get("LEARNING_APP_PROFILES", "profiles")
+MODES = ("sampling", "deterministic")
+# Views an admin can select; profiles of any view are stored when none is selected.
+VIEWS = ("home", "login", "register", "subject_selection", "home_dashboard", "gk_quiz", "math_exercise",
+         "adaptive_practice", "review", "leaderboard", "class_dashboard", "admin_dashboard")
+# Seconds the profiling config is cached per process; a change reaches every process within this.
+CONFIG_TTL_SECONDS = 30.0
+# Seconds between stack samples in sampling mode.
+SAMPLE_INTERVAL_SECONDS = 0.005
+# Hard limits that keep profiling safe to leave on.
+MAX_PROFILES_PER_MINUTE = 10
+MAX_STORED_PROFILES = 500
+PROFILE_RETENTION_DAYS = 7
+# Distinct stacks (sampling) or functions (deterministic) kept per profile.
+MAX_PROFILE_ENTRIES = 2000
+# Session state keys whose changes are never reported as a rerun trigger.
+_OWN_KEYS = ("_profiler_state_digest",)
+
+_lock = threading.Lock()
+_config = (0.0, {})  # (monotonic time loaded, config)
+_recent = deque()  # Monotonic start times of profiles taken in the last minute
+_call_counts = {}  # session_id -> Firestore calls made during its profiled rerun
+
+# --- Configuration ---
+def default_config() -> dict:
+    return {"enabled": False, "mode": "sampling", "users": [], "views": [], "sample_rate": 1.0}
+
+def get_config() -> dict:
+    """The profiling config, refreshed from Firestore at most every CONFIG_TTL_SECONDS."""
+    global _config
+    loaded_at, config = _config
+    if time.monotonic() - loaded_at < CONFIG_TTL_SECONDS:
+        return config
+    try:
+        config = default_config() | database_manager.get_profiler_config()
+    except (BackendUnavailableError, FirebaseCredentialsError):
+        pass  # Keep the last known config; the app reports the outage itself
+    _config = (time.monotonic(), config)
+    return config
+
+def save_config(config: dict):
+    """Stores the profiling config; this process applies it at once, others within CONFIG_TTL_SECONDS."""
+    global _config
+    database_manager.set_profiler_config(config)
+    _config = (time.monotonic(), default_config() | config)
+
+def _selected(config: dict, username: str, view: str) -> bool:
+    if not config.get("enabled"):
+        return False
+    if config.get("users") and username not in config["users"]:
+        return False
+    if config.get("views") and view not in config["views"]:
+        return False
+    return random.random() < config.get("sample_rate", 1.0)
+
+def _take_slot() -> bool:
+    """Rate limit: True if another profile may start within this minute."""
+    now = time.monotonic()
+    with _lock:
+        while _recent and now - _recent[0] >= 60:
+            _recent.popleft()
+        if len(_recent) >= MAX_PROFILES_PER_MINUTE:
+            return False
+        _recent.append(now)
+        return True
+
+def _count_call(ctx, name: str):
+    if ctx is not None and ctx.session_id in _call_counts:
+        with _lock:
+            _call_counts[ctx.session_id] += 1
+
+resilience.add_call_observer(_count_call)
+
+# --- Rerun triggers ---
+def _digest(value):
+    if isinstance(value, (str, int, float, bool, type(None))):
+        return value
+    if isinstance(value, (list, tuple)) and len(value) <= 100:
+        return hash(repr(value))
+    return None
+
+def _state_digest() -> dict:
+    return {key: _digest(value) for key, value in st.session_state.items() if key not in _OWN_KEYS}
+
+def rerun_trigger(previous: dict, current: dict) -> str:
+    """
+    Describes what started a rerun from the session state before and at its start: a
+    clicked button or changed widget (when it has a key), or a plain rerun.
+    """
+    if previous is None:
+        return "first profiled run"
+    clicked = [key for key, value in current.items() if value is True and previous.get(key) is not True]
+    if clicked:
+        return "button " + ", ".join(map(str, clicked[:3]))
+    changed = [key for key, value in current.items() if key in previous and previous[key] != value]
+    if changed:
+        return "changed " + ", ".join(map(str, changed[:3]))
+    return "rerun"
+
+# --- Profilers ---
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class _StackSampler:
+    """Samples one thread's stack from a helper thread, below the frame running `root`."""
+
+    def __init__(self, thread_id: int, root, interval: float = SAMPLE_INTERVAL_SECONDS):
+        self._thread_id = thread_id
+        self._root = root
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rerun-profiler", daemon=True)
+        self.stacks = {}
+        self.samples = 0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                if frame.f_code is self._root:
+                    break
+                frame = frame.f_back
+            else:
+                continue  # Outside the profiled call, e.g. before it starts
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+def _top_functions(profile: cProfile.Profile) -> list:
+    stats = pstats.Stats(profile)
+    rows = [{"function": f"{name} ({os.path.basename(filename)}:{line})", "calls": calls,
+             "self_ms": round(self_time * 1000, 3), "total_ms": round(total_time * 1000, 3)}
+            for (filename, line, name), (_, calls, self_time, total_time, _) in stats.stats.items()]
+    return sorted(rows, key=lambda row: row["total_ms"], reverse=True)[:MAX_PROFILE_ENTRIES]
+
+def profile_rerun(main):
+    """Runs main(), profiling this rerun if the current user and view are selected."""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    config = get_config()
+    username = st.session_state.get("student_name")
+    view = st.session_state.get("current_view", "home")
+    if ctx is None or not _selected(config, username, view):
+        return main()
+    current = _state_digest()
+    trigger = rerun_trigger(st.session_state.get("_profiler_state_digest"), current)
+    if not _take_slot():
+        st.session_state._profiler_state_digest = current
+        return main()
+
+    mode = config.get("mode") if config.get("mode") in MODES else "sampling"
+    with _lock:
+        _call_counts[ctx.session_id] = 0
+    profile = sampler = None
+    if mode == "deterministic":
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # Another deterministic profile holds the interpreter's hook; sample instead
+            profile, mode = None, "sampling"
+    if mode == "sampling":
+        sampler = _StackSampler(threading.get_ident(), main.__code__)
+        sampler.start()
+    started, started_at = time.perf_counter(), datetime.now(timezone.utc)
+    outcome = "ok"
+    try:
+        return main()
+    except BaseException as e:  # st.rerun() and st.stop() end a run with an exception too
+        outcome = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        if profile:
+            profile.disable()
+        if sampler:
+            sampler.stop()
+        with _lock:
+            calls = _call_counts.pop(ctx.session_id, 0)
+        st.session_state._profiler_state_digest = _state_digest()
+        record = {
+            "id": uuid.uuid4().hex[:12],
+            "started": started_at.isoformat(),
+            "user": username,
+            "view": view,
+            "view_after": st.session_state.get("current_view", "home"),
+            "trigger": trigger,
+            "outcome": outcome,
+            "duration_ms": round(duration * 1000, 1),
+            "firestore_calls": calls,
+            "mode": mode,
+        }
+        if sampler:
+            top = sorted(sampler.stacks.items(), key=lambda item: item[1], reverse=True)[:MAX_PROFILE_ENTRIES]
+            record.update(samples=sampler.samples, sample_interval_ms=SAMPLE_INTERVAL_SECONDS * 1000,
+                          stacks=dict(top))
+        else:
+            record["functions"] = _top_functions(profile)
+        save_profile(record)
+
+# --- Storage ---
+def save_profile(record: dict, directory: str = PROFILE_DIR):
+    """Writes one profile and prunes the directory down to the retention limits."""
+    os.makedirs(directory, exist_ok=True)
+    name = f"{record['started'][:19].replace(':', '')}_{record['id']}.json"
+    path = os.path.join(directory, name)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(record, f)
+    os.replace(path + ".tmp", path)
+    prune_profiles(directory)
+
+def _profile_paths(directory: str) -> list:
+    return sorted(glob.glob(os.path.join(glob.escape(directory), "*.json")), reverse=True)  # Newest first
+
+def prune_profiles(directory: str = PROFILE_DIR):
+    cutoff = time.time() - timedelta(days=PROFILE_RETENTION_DAYS).total_seconds()
+    for position, path in enumerate(_profile_paths(directory)):
+        try:
+            if position >= MAX_STORED_PROFILES or os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass  # Pruned by another process
+
+def list_profiles(directory: str = PROFILE_DIR) -> list:
+    """Metadata of the stored profiles, newest first."""
+    profiles = []
+    for path in _profile_paths(directory):
+        record = load_profile(os.path.basename(path), directory)
+        if record:
+            record.pop("stacks", None)
+            record.pop("functions", None)
+            profiles.append(dict(record, file=os.path.basename(path)))
+    return profiles
+
+def load_profile(name: str, directory: str = PROFILE_DIR) -> dict:
+    try:
+        with open(os.path.join(directory, os.path.basename(name)), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def clear_profiles(directory: str = PROFILE_DIR) -> int:
+    paths = _profile_paths(directory)
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    return len(paths)
+
+# --- Reports ---
+def top_functions(record: dict, limit: int = 30) -> list:
+    """Rows for the top-functions table: cProfile's, or self/total samples from the folded stacks."""
+    if "functions" in record:
+        return record["functions"][:limit]
+    interval_ms = record.get("sample_interval_ms", SAMPLE_INTERVAL_SECONDS * 1000)
+    self_samples, total_samples = {}, {}
+    for stack, count in record.get("stacks", {}).items():
+        frames = stack.split(";")
+        self_samples[frames[-1]] = self_samples.get(frames[-1], 0) + count
+        for frame in set(frames):  # Recursion counts once per sample
+            total_samples[frame] = total_samples.get(frame, 0) + count
+    rows = [{"function": frame, "self_ms": round(self_samples.get(frame, 0) * interval_ms, 1),
+             "total_ms": round(total * interval_ms, 1), "samples": total}
+            for frame, total in total_samples.items()]
+    return sorted(rows, key=lambda row: (row["total_ms"], row["self_ms"]), reverse=True)[:limit]
+
+def flame_graph_nodes(record: dict) -> dict:
+    """Folded stacks as {ids, labels, parents, values} for a plotly icicle chart (a flame graph)."""
+    values = {}
+    for stack, count in record.get("stacks", {}).items():
+        frames = stack.split(";")
+        for depth in range(1, len(frames) + 1):
+            node = ";".join(frames[:depth])
+            values[node] = values.get(node, 0) + count
+    ids = sorted(values)
+    return {
+        "ids": ids,
+        "labels": [node.rsplit(";", 1)[-1] for node in ids],
+        "parents": [node.rsplit(";", 1)[0] if ";" in node else "" for node in ids],
+        "values": [values[node] for node in ids],
+    }
@@ -0,0 +1,166 @@
+import dataclasses
+import hashlib
+import json
+import random
+from dataclasses import dataclass
+from types import MappingProxyType
+from modules import answer_matching, math_templates, scoring
+
+# Compact answer kinds, one per question.
+SINGLE_CHOICE, MULTI_CHOICE, TEXT = 0, 1, 2
+_KINDS = {"single_choice": SINGLE_CHOICE, "multi_choice": MULTI_CHOICE, "text": TEXT}
+
+def freeze(value):
+    """Recursively converts dicts to read-only mappings and lists to tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def thaw(value):
+    """Converts frozen content back to plain dicts and lists, e.g. before writing to Firestore."""
+    if isinstance(value, MappingProxyType):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+def content_version(quiz_data: dict) -> str:
+    """A short, stable hash of a quiz document used to tell uploads apart."""
+    payload = json.dumps(quiz_data, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()[:12]
+
+@dataclass(frozen=True)
+class CompiledQuiz:
+    """
+    An immutable quiz bundle (questions plus display metadata) shared by every
+    session in the process. Sessions keep only the quiz id and a compact answers
+    list (see new_answers), and views read metadata straight from the bundle.
+    """
+    quiz_id: str
+    version: str
+    subject: str
+    title: str
+    story_name: str
+    background: str
+    icon_legend: MappingProxyType
+    reward: str
+    questions: tuple
+    kinds: tuple
+    option_keys: tuple
+    raw: MappingProxyType
+    # Per question, its CompiledTemplate for generated Math questions, else None (see math_templates)
+    templates: tuple = ()
+    # The seed a worksheet was generated from; None for quizzes served as written
+    seed: int = None
+    # Per question, the compiled answer matcher for text questions, else None (see answer_matching)
+    matchers: tuple = ()
+
+    @property
+    def is_parametric(self) -> bool:
+        return any(self.templates)
+
+    def new_answers(self) -> list:
+        """Returns an empty answers list: None for unanswered choice/text questions, 0 for multi-choice bitmasks."""
+        return [0 if kind == MULTI_CHOICE else None for kind in self.kinds]
+
+    def encode_answer(self, index: int, answer):
+        """Encodes an option key, list of keys or text into its compact per-question form."""
+        kind = self.kinds[index]
+        if answer is None:
+            return 0 if kind == MULTI_CHOICE else None
+        if kind == TEXT:
+            return str(answer)
+        keys = self.option_keys[index]
+        if kind == MULTI_CHOICE:
+            return sum(1 << keys.index(key) for key in answer if key in keys)
+        return keys.index(answer) if answer in keys else None
+
+    def decode_answer(self, index: int, code):
+        """Returns the option key, list of option keys, or text for a compact answer."""
+        kind = self.kinds[index]
+        if kind == TEXT:
+            return code
+        keys = self.option_keys[index]
+        if kind == MULTI_CHOICE:
+            return [key for bit, key in enumerate(keys) if code and code & (1 << bit)]
+        return keys[code] if code is not None else None
+
+    def is_answered(self, index: int, code) -> bool:
+        return bool(code) if self.kinds[index] == MULTI_CHOICE else code not in (None, "")
+
+    def is_correct(self, index: int, code) -> bool:
+        answer = self.decode_answer(index, code)
+        matcher = self.matchers[index] if self.matchers else None
+        return matcher(answer) if matcher else scoring.is_answer_correct(self.questions[index], answer)
+
+    def score(self, answers: list) -> int:
+        return sum(1 for i, code in enumerate(answers) if self.is_correct(i, code))
+
+def compile_quiz(quiz_id: str, quiz_data: dict) -> CompiledQuiz:
+    """Builds the shared read-only representation of a quiz document."""
+    raw = freeze(quiz_data)
+    questions = raw.get("questions", ())
+    return CompiledQuiz(
+        quiz_id=quiz_id,
+        version=content_version(quiz_data),
+        subject=quiz_data.get("subject", ""),
+        title=quiz_data.get("title", ""),
+        story_name=quiz_data.get("story_name", ""),
+        background=quiz_data.get("background", ""),
+        icon_legend=raw.get("icon_legend", MappingProxyType({})),
+        reward=quiz_data.get("reward", ""),
+        questions=questions,
+        kinds=tuple(_KINDS.get(scoring.question_type(q), TEXT) for q in questions),
+        option_keys=tuple(tuple(opt["key"] for opt in q.get("options", ())) for q in questions),
+        raw=raw,
+        templates=tuple(math_templates.compile_template(thaw(q)) if "template" in q else None for q in questions),
+        matchers=_compile_matchers(questions),
+    )
+
+def _compile_matchers(questions) -> tuple:
+    return tuple(answer_matching.compile_spec(thaw(q.get("answer_spec")), q.get("answer"))
+                 if scoring.question_type(q) == "text" and "answer" in q else None for q in questions)
+
+def _instance(quiz: CompiledQuiz, index: int, seed, copy: int = 0) -> dict:
+    """One generated question, seeded by the quiz, question, seed and copy so it never depends on call order."""
+    rng = random.Random(f"{quiz.quiz_id}:{index}:{seed}:{copy}")
+    question = quiz.templates[index].generate(rng)
+    question["question_index"] = index  # Review queue refs point at the template
+    if copy:
+        question["id"] = f"{question.get('id')}-{copy + 1}"
+    return question
+
+def question_instance(quiz: CompiledQuiz, index: int, seed=0):
+    """The question at index: as written, or generated from its template with the given seed."""
+    if not quiz.templates or quiz.templates[index] is None:
+        return quiz.questions[index]
+    return freeze(_instance(quiz, index, seed))
+
+def build_worksheet(quiz: CompiledQuiz, seed: int) -> CompiledQuiz:
+    """
+    Generates the worksheet for a seed: every question in order, template questions with
+    fresh values, then more generated questions, cycling through the templates, until the
+    story's optional "worksheet_size" is reached. Quizzes without templates are returned as is.
+    """
+    if not quiz.is_parametric:
+        return quiz
+    template_indices = [i for i, template in enumerate(quiz.templates) if template is not None]
+    questions = [_instance(quiz, i, seed) if quiz.templates[i] else quiz.questions[i]
+                 for i in range(len(quiz.questions))]
+    extra = max(int(quiz.raw.get("worksheet_size") or 0) - len(questions), 0)
+    for n in range(extra):
+        questions.append(_instance(quiz, template_indices[n % len(template_indices)], seed,
+                                   copy=n // len(template_indices) + 1))
+    questions = tuple(freeze(q) for q in questions)
+    return dataclasses.replace(
+        quiz, questions=questions, seed=seed, templates=(None,) * len(questions),
+        kinds=tuple(_KINDS.get(scoring.question_type(q), TEXT) for q in questions),
+        option_keys=tuple(tuple(opt["key"] for opt in q.get("options", ())) for q in questions),
+        matchers=_compile_matchers(questions),
+    )
+
+def build_worksheets(quiz: CompiledQuiz, seeds) -> dict:
+    """Generates a batch of worksheets, {seed: CompiledQuiz}, e.g. for a printed class set."""
+    return {seed: build_worksheet(quiz, seed) for seed in seeds}
@@ -0,0 +1,284 @@
+"""
+Upload-time validation for quiz JSON files.
+
+Each subject's schema is compiled once, at import, into a flat list of check
+functions. Validation runs every check and returns every problem with a JSON path
+(e.g. "$.questions[3].answer"), so authors can fix a file in one pass.
+
+Bulk imports can be checked from the command line, in parallel:
+
+    python -m modules.quiz_schema path/to/quizzes/ more.json --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from modules import answer_matching, math_templates
+from modules.exceptions import AnswerSpecError, TemplateError
+
+QUESTION_TYPES = ("single_choice", "multi_choice", "text")
+
+# Files validated below this count skip the process pool; starting workers costs more than it saves.
+PARALLEL_THRESHOLD = 32
+
+@dataclass(frozen=True)
+class SchemaError:
+    path: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}: {self.message}"
+
+# --- Schema definitions ---
+# Top-level fields per subject: name -> (accepted types, required). The quiz ids built
+# by the admin uploader come from these fields.
+_COMMON_FIELDS = {
+    "subject": (str, True),
+    "title": (str, True),
+    "background": (str, False),
+    "icon_legend": (dict, False),
+    "reward": (str, False),
+    "questions": (list, True),
+}
+QUIZ_FIELDS = {
+    "GK": {**_COMMON_FIELDS, "topic_id": (str, True), "level": (str, True)},
+    "MATH": {
+        **_COMMON_FIELDS,
+        "chapter_id": ((int, str), True),
+        "story_id": ((int, str), True),
+        "story_name": (str, True),
+        "story_file": (str, True),
+        "worksheet_size": (int, False),
+    },
+}
+QUESTION_FIELDS = {
+    "prompt": (str, True),
+    "type": (str, False),
+    "topic": (str, False),
+    "options": (list, False),
+}
+
+# --- Compiled checks ---
+def _is_type(value, types) -> bool:
+    # bool is an int subclass, but True is never a valid id or count here
+    return isinstance(value, types) and not isinstance(value, bool)
+
+def _type_name(types) -> str:
+    types = types if isinstance(types, tuple) else (types,)
+    names = {str: "a string", int: "a number", dict: "an object", list: "a list"}
+    return " or ".join(names.get(t, t.__name__) for t in types)
+
+def _field_checks(fields: dict) -> list:
+    """Compiles {name: (types, required)} into one check per field."""
+    checks = []
+    for name, (types, required) in fields.items():
+        def check(obj, path, name=name, types=types, required=required):
+            if name not in obj:
+                return [SchemaError(f"{path}.{name}", "is required")] if required else []
+            value = obj[name]
+            if not _is_type(value, types):
+                return [SchemaError(f"{path}.{name}", f"must be {_type_name(types)}")]
+            if required and value in ("", [], {}):
+                return [SchemaError(f"{path}.{name}", "must not be empty")]
+            return []
+        checks.append(check)
+    return checks
+
+def _check_options(question: dict, path: str) -> list:
+    errors, seen = [], set()
+    for i, option in enumerate(question.get("options", [])):
+        option_path = f"{path}.options[{i}]"
+        if not isinstance(option, dict):
+            errors.append(SchemaError(option_path, "must be an object with 'key' and 'text'"))
+            continue
+        for name in ("key", "text"):
+            if not _is_type(option.get(name), (str, int)):
+                errors.append(SchemaError(f"{option_path}.{name}", "is required and must be a string or number"))
+        key = option.get("key")
+        if not _is_type(key, (str, int)):
+            continue
+        if key in seen:
+            errors.append(SchemaError(f"{option_path}.key", f"duplicate option key {key!r}"))
+        seen.add(key)
+    return errors
+
+def _check_answer(question: dict, path: str) -> list:
+    """Checks the answer against the question type, e.g. that a choice answer names an existing option."""
+    q_type = question.get("type") or ("single_choice" if question.get("options") else "text")
+    keys = [opt.get("key") for opt in question.get("options", []) if isinstance(opt, dict)]
+    answer_path = f"{path}.answer"
+    if q_type not in QUESTION_TYPES:
+        return [SchemaError(f"{path}.type", f"unknown type {q_type!r}; expected one of {', '.join(QUESTION_TYPES)}")]
+    if "answer_spec" in question and q_type != "text":
+        return [SchemaError(f"{path}.answer_spec", "is only supported for text questions")]
+    if "template" in question:
+        return []  # Generated questions get their answer (and options) from the template
+    if "answer" not in question:
+        return [SchemaError(answer_path, "is required")]
+    answer = question["answer"]
+
+    if q_type == "text":
+        if not _is_type(answer, (str, int, float)) or str(answer).strip() == "":
+            return [SchemaError(answer_path, "must be a non-empty string or number for text questions")]
+        return _check_answer_spec(question, path)
+    if len(keys) < 2:
+        return [SchemaError(f"{path}.options", f"{q_type} questions need at least two options")]
+    if q_type == "single_choice":
+        if answer not in keys:
+            return [SchemaError(answer_path, f"{answer!r} is not one of the option keys {keys}")]
+        return []
+    if not isinstance(answer, list) or not answer:
+        return [SchemaError(answer_path, "must be a non-empty list of option keys for multi_choice questions")]
+    errors = [SchemaError(f"{answer_path}[{i}]", f"{key!r} is not one of the option keys {keys}")
+              for i, key in enumerate(answer) if key not in keys]
+    if len(set(map(str, answer))) != len(answer):
+        errors.append(SchemaError(answer_path, "lists the same option more than once"))
+    return errors
+
+def _check_answer_spec(question: dict, path: str) -> list:
+    """Checks that a text question's answer_spec compiles and accepts the answer it is shown with."""
+    if "answer_spec" not in question:
+        return []
+    try:
+        matcher = answer_matching.compile_spec(question["answer_spec"], question["answer"])
+    except AnswerSpecError as e:
+        return [SchemaError(f"{path}.answer_spec", str(e).removeprefix("answer_spec: "))]
+    if not matcher(question["answer"]):
+        return [SchemaError(f"{path}.answer_spec", f"does not accept the answer {question['answer']!r}")]
+    return []
+
+def _check_gk_question(question: dict, path: str) -> list:
+    # The GK view renders every question as a single-choice radio list
+    if question.get("type", "single_choice") != "single_choice" or not question.get("options"):
+        return [SchemaError(path, "GK quizzes only support single_choice questions with options")]
+    return []
+
+def _check_math_question(question: dict, path: str) -> list:
+    errors = []
+    if not _is_type(question.get("id"), (str, int)):
+        errors.append(SchemaError(f"{path}.id", "is required for Math questions"))
+    # The Math view treats untyped questions as text, unlike scoring, so the type must be explicit
+    if question.get("options") and "type" not in question:
+        errors.append(SchemaError(f"{path}.type", "is required when a Math question has options"))
+    if "template" in question:
+        try:
+            math_templates.check_template(question)
+        except TemplateError as e:
+            errors.append(SchemaError(f"{path}.template", str(e)))
+    return errors
+
+def _compile_schema(subject: str):
+    """Builds the validator for one subject from its field tables and question rules."""
+    quiz_checks = _field_checks(QUIZ_FIELDS[subject])
+    field_checks = _field_checks(QUESTION_FIELDS)
+    subject_check = _check_gk_question if subject == "GK" else _check_math_question
+    question_checks = field_checks + [_check_options, _check_answer, subject_check]
+    # Option and answer checks need a list of options; the field check reports anything else
+    malformed_checks = field_checks + [subject_check]
+
+    def validate(quiz: dict) -> list:
+        errors = [error for check in quiz_checks for error in check(quiz, "$")]
+        questions = quiz.get("questions")
+        if not isinstance(questions, list):
+            return errors
+        seen_ids = {}
+        for i, question in enumerate(questions):
+            path = f"$.questions[{i}]"
+            if not isinstance(question, dict):
+                errors.append(SchemaError(path, "must be an object"))
+                continue
+            checks = question_checks if isinstance(question.get("options", []), list) else malformed_checks
+            errors.extend(error for check in checks for error in check(question, path))
+            q_id = question.get("id")
+            if not _is_type(q_id, (str, int)):
+                continue
+            if q_id in seen_ids:
+                errors.append(SchemaError(f"{path}.id", f"duplicate question id {q_id!r} (also {seen_ids[q_id]})"))
+            seen_ids.setdefault(q_id, path)
+        return errors
+    return validate
+
+_VALIDATORS = {subject: _compile_schema(subject) for subject in QUIZ_FIELDS}
+
+# --- Public API ---
+def validate_quiz(quiz) -> list:
+    """Returns every SchemaError in a parsed quiz document; an empty list means it is valid."""
+    if not isinstance(quiz, dict):
+        return [SchemaError("$", "a quiz file must contain a JSON object")]
+    subject = quiz.get("subject")
+    validator = _VALIDATORS.get(subject.upper() if isinstance(subject, str) else None)
+    if validator is None:
+        return [SchemaError("$.subject", f"unknown subject {subject!r}; expected 'GK' or 'Math'")]
+    return validator(quiz)
+
+def validate_json(raw) -> list:
+    """Parses quiz JSON (str or bytes) and validates it, reporting parse errors as a single SchemaError."""
+    try:
+        quiz = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return [SchemaError("$", f"invalid JSON: {e}")]
+    return validate_quiz(quiz)
+
+def _validate_file(path: str) -> tuple:
+    try:
+        with open(path, "rb") as f:
+            return path, validate_json(f.read())
+    except OSError as e:
+        return path, [SchemaError("$", f"cannot read file: {e}")]
+
+def _validate_named(item: tuple) -> tuple:
+    name, raw = item
+    return name, validate_json(raw)
+
+def _run(func, items: list, max_workers: int = None) -> list:
+    if len(items) < PARALLEL_THRESHOLD or max_workers == 1:
+        return list(map(func, items))
+    workers = max_workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items, chunksize=max(1, len(items) // (workers * 4))))
+
+def validate_files(paths: list, max_workers: int = None) -> dict:
+    """Validates quiz files across worker processes; returns {path: [SchemaError, ...]} in input order."""
+    return dict(_run(_validate_file, list(paths), max_workers))
+
+def validate_uploads(named_contents: list, max_workers: int = None) -> list:
+    """
+    Validates already-read (name, bytes) pairs, e.g. from the admin bulk uploader; returns each
+    pair's [SchemaError, ...] in input order, since uploaded files may share a name.
+    """
+    return [errors for _, errors in _run(_validate_named, list(named_contents), max_workers)]
+
+def _expand_paths(paths: list) -> list:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith(".json"))
+        else:
+            files.append(path)
+    return files
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Validate quiz JSON files before uploading them.")
+    parser.add_argument("paths", nargs="+", help="Quiz JSON files or directories to scan for *.json")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--quiet", action="store_true", help="Only print files with errors")
+    args = parser.parse_args(argv)
+
+    results = validate_files(_expand_paths(args.paths), max_workers=args.workers)
+    invalid = 0
+    for path, errors in results.items():
+        if errors:
+            invalid += 1
+            print(f"{path}: {len(errors)} error(s)")
+            for error in errors:
+                print(f"  {error}")
+        elif not args.quiet:
+            print(f"{path}: OK")
+    print(f"{len(results) - invalid}/{len(results)} files valid")
+    return 1 if invalid else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+import time
+import streamlit as st
+from datetime import datetime, timedelta, timezone
+from modules import checkpoints, data_manager
+from modules.quiz_content import CompiledQuiz
+
+# Session state holds only these per-quiz keys; the questions themselves live in the
+# process-wide content cache (see data_manager.get_compiled_quiz). A generated Math
+# worksheet is kept as its seed and rebuilt from the worksheet cache (see math_templates).
+#
+# Timing is taken at interaction events on the server: the time since the previous
+# interaction is credited to the question whose answer changed. Attempts store it as
+# "time_taken" (whole seconds) and "question_times" (seconds per question, 0.1 s steps).
+#
+# Quizzes started with a view are checkpointed as they are answered (see checkpoints.py):
+# the compact answers, timers and the session keys in `context` that the view needs to
+# show the quiz again, so a student whose session is lost can resume where they were.
+
+def start_quiz(quiz: CompiledQuiz, view: str = None, context: dict = None):
+    """
+    Points the session at a compiled quiz and resets the compact answers list. With a view,
+    answers are checkpointed and the quiz can be resumed from that view's selection page.
+    """
+    st.session_state.active_quiz_id = quiz.quiz_id
+    st.session_state.active_quiz_version = quiz.version
+    st.session_state.active_quiz_seed = quiz.seed
+    st.session_state.user_answers = quiz.new_answers()
+    st.session_state.checkpoint_view = view
+    st.session_state.checkpoint_context = context or {}
+    st.session_state.checkpointed = False
+    start_timer(len(quiz.questions))
+
+def resume_quiz(quiz: CompiledQuiz, checkpoint: dict):
+    """Restores a quiz's answers, timers and view context from its checkpoint."""
+    start_quiz(quiz, checkpoint["view"], checkpoint.get("context"))
+    st.session_state.user_answers = list(checkpoint["answers"])
+    st.session_state.question_times = list(checkpoint.get("question_times") or [0.0] * len(quiz.questions))
+    st.session_state.start_time = datetime.now(timezone.utc) - timedelta(seconds=checkpoint.get("elapsed", 0))
+    st.session_state.checkpointed = True
+    for key, value in st.session_state.checkpoint_context.items():
+        st.session_state[key] = value
+
+def _checkpoint():
+    view = st.session_state.get("checkpoint_view")
+    if not view:
+        return
+    checkpoints.get_checkpoint_writer().schedule(st.session_state.student_name, st.session_state.active_quiz_id, {
+        "view": view,
+        "version": st.session_state.active_quiz_version,
+        "seed": st.session_state.get("active_quiz_seed"),
+        "answers": list(st.session_state.user_answers),
+        "question_times": [round(seconds, 1) for seconds in st.session_state.get("question_times") or []],
+        "elapsed": round(elapsed_seconds()),
+        "context": st.session_state.get("checkpoint_context") or {},
+        "updated": datetime.now(timezone.utc),
+    })
+    st.session_state.checkpointed = True
+
+def finish_checkpoint() -> str:
+    """
+    Stops checkpointing the submitted quiz. Returns its checkpoint id for save_attempt to
+    delete with the attempt, or None if no checkpoint can exist.
+    """
+    quiz_id = st.session_state.get("active_quiz_id")
+    if not st.session_state.get("checkpointed") or not quiz_id:
+        return None
+    checkpoints.get_checkpoint_writer().discard(st.session_state.student_name, quiz_id)
+    st.session_state.checkpointed = False
+    return quiz_id
+
+def resumable_quizzes(view: str) -> list:
+    """Returns [(quiz, checkpoint)] for the student's unfinished quizzes of a view, most recent first."""
+    saved = {quiz_id: checkpoint for quiz_id, checkpoint
+             in checkpoints.load_checkpoints(st.session_state.student_name).items() if checkpoint["view"] == view}
+    quizzes = data_manager.get_compiled_quizzes(list(saved))
+    resumable = []
+    for quiz_id, checkpoint in saved.items():
+        quiz = quizzes.get(quiz_id)
+        if not quiz or quiz.version != checkpoint["version"]:
+            continue
+        if checkpoint.get("seed") is not None:
+            quiz = data_manager.get_worksheet(quiz, checkpoint["seed"])
+        if len(checkpoint["answers"]) == len(quiz.questions):
+            resumable.append((quiz, checkpoint))
+    return sorted(resumable, key=lambda item: item[1]["updated"], reverse=True)
+
+def start_timer(question_count: int = 0):
+    """Starts the activity clock with question_count per-question timers (more are added as needed)."""
+    st.session_state.start_time = datetime.now(timezone.utc)
+    st.session_state.last_interaction = time.monotonic()
+    st.session_state.question_times = [0.0] * question_count
+
+def mark_time():
+    """Restarts the lap without crediting it to any question (e.g. while reading feedback)."""
+    st.session_state.last_interaction = time.monotonic()
+
+def record_interaction(index: int):
+    """Credits the time since the previous interaction to question index."""
+    times = st.session_state.get("question_times")
+    if times is None:
+        return
+    now = time.monotonic()
+    times.extend([0.0] * (index + 1 - len(times)))
+    times[index] += now - st.session_state.get("last_interaction", now)
+    st.session_state.last_interaction = now
+
+def elapsed_seconds() -> float:
+    start_time = st.session_state.get("start_time")
+    return (datetime.now(timezone.utc) - start_time).total_seconds() if start_time else 0.0
+
+def timing_fields() -> dict:
+    """The attempt fields for the current activity's timing; also freezes time_taken in the session."""
+    st.session_state.time_taken = round(elapsed_seconds())
+    return {
+        "time_taken": st.session_state.time_taken,
+        "question_times": [round(seconds, 1) for seconds in st.session_state.get("question_times") or []],
+    }
+
+def render_resume_options(view: str) -> bool:
+    """
+    Offers the student's unfinished quizzes of a view on its selection page. Returns True
+    once one has been resumed; the caller then marks its activity in progress and reruns.
+    """
+    resumable = resumable_quizzes(view)
+    if not resumable:
+        return False
+    st.subheader("Continue where you left off")
+    for quiz, checkpoint in resumable:
+        answered = sum(1 for i, code in enumerate(checkpoint["answers"]) if quiz.is_answered(i, code))
+        label = " – ".join(filter(None, [quiz.title, quiz.story_name or quiz.raw.get("level")]))
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            if st.button(f"▶️ {label} ({answered}/{len(quiz.questions)} answered)",
+                         key=f"resume_{quiz.quiz_id}", use_container_width=True):
+                resume_quiz(quiz, checkpoint)
+                return True
+        with col2:
+            if st.button("Discard", key=f"discard_{quiz.quiz_id}", use_container_width=True):
+                checkpoints.delete_checkpoint(st.session_state.student_name, quiz.quiz_id)
+                st.rerun()
+    st.markdown("---")
+    return False
+
+def active_quiz():
+    """Returns the compiled quiz the session is working on, or None."""
+    quiz_id = st.session_state.get("active_quiz_id")
+    quiz = data_manager.get_compiled_quiz(quiz_id) if quiz_id else None
+    seed = st.session_state.get("active_quiz_seed")
+    if quiz is None or seed is None:
+        return quiz
+    # A worksheet's answers only fit the quiz version it was generated from
+    return data_manager.get_worksheet(quiz, seed) if quiz.version == st.session_state.active_quiz_version else None
+
+def get_answer(quiz: CompiledQuiz, index: int):
+    """Returns the decoded answer (option key, list of keys or text) for a question."""
+    return quiz.decode_answer(index, st.session_state.user_answers[index])
+
+def set_answer(quiz: CompiledQuiz, index: int, answer):
+    code, current = quiz.encode_answer(index, answer), st.session_state.user_answers[index]
+    if code != current:
+        st.session_state.user_answers[index] = code
+        if not (current is None and code == ""):  # An empty text box rendering is not an answer
+            record_interaction(index)
+            _checkpoint()
+
+def toggle_option(quiz: CompiledQuiz, index: int, option_key: str):
+    """Adds or removes an option from a multi-choice answer's bitmask."""
+    st.session_state.user_answers[index] ^= 1 << quiz.option_keys[index].index(option_key)
+    record_interaction(index)
+    _checkpoint()
+
+def answered_count(quiz: CompiledQuiz) -> int:
+    return sum(1 for i, code in enumerate(st.session_state.user_answers) if quiz.is_answered(i, code))
+
+def decoded_answers(quiz: CompiledQuiz) -> list:
+    return [quiz.decode_answer(i, code) for i, code in enumerate(st.session_state.user_answers)]
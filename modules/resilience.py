@@ -0,0 +1,170 @@
+"""
+Deadlines, retries and circuit breaking for Firestore calls.
+
+database_manager wraps its calls with @guarded: each call runs on a worker thread and
+the script thread waits at most the call's deadline, so a slow backend can no longer
+hold a rerun indefinitely. Idempotent reads retry transient errors with full-jitter
+backoff inside the same deadline. Every outcome feeds one process-wide circuit breaker;
+after FAILURE_THRESHOLD consecutive failures it opens and calls fail immediately with
+CircuitOpenError until a probe succeeds RESET_TIMEOUT_SECONDS later. Callers fall back
+to cached content (reads) or the local attempt spool (writes) on BackendUnavailableError.
+"""
+import functools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from google.api_core import exceptions as google_exceptions
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from modules.exceptions import BackendUnavailableError, CircuitOpenError, DeadlineExceededError
+
+# Default seconds a single read or write may take, including retries.
+READ_DEADLINE_SECONDS = 5.0
+WRITE_DEADLINE_SECONDS = 10.0
+# Tries per idempotent read, and the backoff before each retry (capped, full jitter).
+READ_ATTEMPTS = 3
+BACKOFF_BASE_SECONDS = 0.1
+BACKOFF_CAP_SECONDS = 1.0
+# Consecutive failures that open the circuit, and how long it stays open before a probe.
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT_SECONDS = 30.0
+# Threads available to guarded calls; a call stuck past its deadline keeps its thread until it returns.
+MAX_CALL_WORKERS = 32
+
+# Errors that say the backend is unhealthy, as opposed to a bad request or a missing document.
+TRANSIENT_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.Aborted,
+    ConnectionError,
+    TimeoutError,
+)
+
+class CircuitBreaker:
+    """
+    Closed: calls flow. Open: calls are refused until the reset timeout passes. Half-open:
+    one probe call is let through; success closes the circuit, failure re-opens it.
+    Listeners added with add_recovery_listener run when the circuit closes again.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._recovery_listeners = []
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        """True if a call may go ahead now; in half-open state only one probe at a time is allowed."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            recovered = self._opened_at is not None
+            self._failures, self._opened_at, self._probing = 0, None, False
+            listeners = list(self._recovery_listeners) if recovered else []
+        for listener in listeners:
+            listener()
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def add_recovery_listener(self, listener):
+        with self._lock:
+            self._recovery_listeners.append(listener)
+
+# Module-level rather than st.cache_resource so prefetch workers and listener threads,
+# which never call Streamlit, share the same breaker as script threads.
+_breaker = CircuitBreaker()
+_executor = ThreadPoolExecutor(max_workers=MAX_CALL_WORKERS, thread_name_prefix="firestore-call")
+
+def get_circuit_breaker() -> CircuitBreaker:
+    """Returns the process-wide breaker shared by every Firestore call."""
+    return _breaker
+
+_local = threading.local()
+_call_observers = []
+
+def add_call_observer(observer):
+    """Registers observer(ctx, name), run for every guarded call before it starts, e.g. to count calls per rerun."""
+    _call_observers.append(observer)
+
+def _run_in_context(ctx, fn, args, kwargs):
+    # Nested guarded calls on this thread run inline under the outer call's deadline
+    thread = threading.current_thread()
+    add_script_run_ctx(thread, ctx)
+    _local.active = True
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _local.active = False
+        add_script_run_ctx(thread, None)
+
+def call(fn, *args, deadline: float = READ_DEADLINE_SECONDS, idempotent: bool = True, **kwargs):
+    """
+    Runs fn(*args, **kwargs) with a deadline, retrying transient errors if idempotent.
+    Raises CircuitOpenError, DeadlineExceededError or BackendUnavailableError when the backend
+    cannot answer; other errors (e.g. bad arguments) propagate unchanged and do not trip the breaker.
+    """
+    if getattr(_local, "active", False):
+        return fn(*args, **kwargs)
+    breaker = get_circuit_breaker()
+    ctx = get_script_run_ctx(suppress_warning=True)
+    for observer in _call_observers:
+        observer(ctx, fn.__name__)
+    give_up_at = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"{fn.__name__}: Firestore circuit is open")
+        future = _executor.submit(_run_in_context, ctx, fn, args, kwargs)
+        try:
+            result = future.result(timeout=max(give_up_at - time.monotonic(), 0))
+        except FutureTimeoutError:
+            breaker.record_failure()
+            raise DeadlineExceededError(f"{fn.__name__}: no response within {deadline:g}s") from None
+        except TRANSIENT_ERRORS as e:
+            breaker.record_failure()
+            attempt += 1
+            backoff = random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+            if not idempotent or attempt >= READ_ATTEMPTS or time.monotonic() + backoff >= give_up_at:
+                raise BackendUnavailableError(f"{fn.__name__}: {e}") from e
+            time.sleep(backoff)
+            continue
+        except Exception:
+            breaker.record_success()  # The backend answered; the request itself was at fault
+            raise
+        breaker.record_success()
+        return result
+
+def guarded(deadline: float = None, idempotent: bool = True):
+    """Decorates a Firestore call with call(); writes default to the longer write deadline and no retries."""
+    def decorator(fn):
+        limit = deadline or (READ_DEADLINE_SECONDS if idempotent else WRITE_DEADLINE_SECONDS)
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return call(fn, *args, deadline=limit, idempotent=idempotent, **kwargs)
+        return wrapper
+    return decorator
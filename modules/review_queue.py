@@ -0,0 +1,142 @@
+import heapq
+import struct
+import threading
+from datetime import date
+from modules import content_cache, database_manager, scoring
+
+# One packed record per queued question: quiz number (into the doc's quiz_ids list),
+# question index, due day (date ordinal), interval in days and Leitner box.
+RECORD = struct.Struct("<HHIHB")
+# Days until the next review for each Leitner box; a correct answer in the last box retires the question.
+LEITNER_INTERVALS = (1, 2, 4, 8, 16, 32)
+# Due questions served per review round.
+REVIEW_ROUND_SIZE = 10
+# Keeps the queue document far below Firestore's 1 MiB limit; the furthest-due items are dropped first.
+MAX_REVIEW_ITEMS = 20000
+# Ids of the latest attempts applied to a queue, kept so a retried update is not applied twice.
+MAX_APPLIED_ATTEMPTS = 50
+
+def subject_of(quiz_id: str) -> str:
+    """Maps a quiz id to its subject using the admin uploader's id prefixes."""
+    return "GK" if quiz_id.startswith("gk_") else "Math"
+
+class ReviewQueue:
+    """
+    A student's spaced-repetition queue of (quiz_id, question_index) refs. Items are kept
+    in a dict for updates plus one min-heap of (due day, ref) per subject, so finding due
+    questions pops a few heap entries instead of scanning the queue or attempt history.
+    Heap entries made stale by a reschedule are skipped and dropped lazily.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._heaps = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_doc(cls, doc: dict):
+        queue = cls()
+        if doc:
+            quiz_ids = doc.get("quiz_ids", [])
+            for quiz_number, question_index, due, interval, box in RECORD.iter_unpack(bytes(doc.get("items", b""))):
+                queue._schedule((quiz_ids[quiz_number], question_index), due, interval, box)
+        return queue
+
+    def to_doc(self) -> dict:
+        items = sorted(self._items.items(), key=lambda item: item[1][0])[:MAX_REVIEW_ITEMS]
+        quiz_ids = sorted({quiz_id for (quiz_id, _), _ in items})
+        numbers = {quiz_id: number for number, quiz_id in enumerate(quiz_ids)}
+        packed = b"".join(RECORD.pack(numbers[quiz_id], question_index, due, interval, box)
+                          for (quiz_id, question_index), (due, interval, box) in items)
+        return {"quiz_ids": quiz_ids, "items": packed}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _schedule(self, ref: tuple, due: int, interval: int, box: int):
+        self._items[ref] = (due, interval, box)
+        heapq.heappush(self._heaps.setdefault(subject_of(ref[0]), []), (due, ref))
+
+    def record(self, ref: tuple, correct: bool, today: int):
+        """
+        Applies one answer: a miss (re)queues the question for tomorrow in the first box;
+        a correct answer to a due question moves it up a box, or retires it from the last one.
+        """
+        with self._lock:
+            current = self._items.get(ref)
+            if not correct:
+                self._schedule(ref, today + LEITNER_INTERVALS[0], LEITNER_INTERVALS[0], 0)
+            elif current and current[0] <= today:
+                box = current[2] + 1
+                if box >= len(LEITNER_INTERVALS):
+                    del self._items[ref]
+                else:
+                    self._schedule(ref, today + LEITNER_INTERVALS[box], LEITNER_INTERVALS[box], box)
+
+    def due(self, subject: str, today: int, limit: int = None) -> list:
+        """Returns up to limit refs in subject that are due by today, most overdue first."""
+        with self._lock:
+            heap = self._heaps.get(subject, [])
+            due, seen = [], set()
+            while heap and heap[0][0] <= today and (limit is None or len(due) < limit):
+                entry = heapq.heappop(heap)
+                due_day, ref = entry
+                if ref in seen or self._items.get(ref, (None,))[0] != due_day:
+                    continue  # Stale or duplicate entry from an earlier schedule
+                seen.add(ref)
+                due.append(entry)
+            for entry in due:
+                heapq.heappush(heap, entry)
+            return [ref for _, ref in due]
+
+    def due_counts(self, today: int) -> dict:
+        """Returns {subject: number of due questions} for subjects with anything due."""
+        counts = {subject: len(self.due(subject, today)) for subject in list(self._heaps)}
+        return {subject: count for subject, count in counts.items() if count}
+
+def attempt_results(attempt_data: dict) -> list:
+    """Returns [(ref, correct)] for the questions of an attempt that can be traced back to a quiz."""
+    results = []
+    for i, question in enumerate(attempt_data.get("questions", [])):
+        quiz_id = question.get("quiz_id") or attempt_data.get("quiz_id")
+        if quiz_id:
+            ref = (quiz_id, question.get("question_index", i))
+            results.append((ref, scoring.is_answer_correct(question, question.get("user_answer"))))
+    return results
+
+def today_ordinal() -> int:
+    return date.today().toordinal()
+
+def record_attempt(username: str, attempt_data: dict, attempt_id: str = None):
+    """
+    Updates the student's stored queue with an attempt's answers in one read-modify-write
+    transaction. With an attempt_id the update is applied once, however often it is retried.
+    """
+    results = attempt_results(attempt_data)
+    if not results:
+        return
+    today = today_ordinal()
+
+    def _apply(doc):
+        applied = list((doc or {}).get("applied", []))
+        if attempt_id and attempt_id in applied:
+            return doc
+        queue = ReviewQueue.from_doc(doc)
+        for ref, correct in results:
+            queue.record(ref, correct, today)
+        if attempt_id:
+            applied = (applied + [attempt_id])[-MAX_APPLIED_ATTEMPTS:]
+        return dict(queue.to_doc(), applied=applied)
+
+    doc = database_manager.update_review_queue(username, _apply)
+    content_cache.get_user_cache().put(content_cache.review_key(username), ReviewQueue.from_doc(doc),
+                                       content_cache.USER_DATA_TTL_SECONDS)
+
+def get_review_queue(username: str) -> ReviewQueue:
+    """
+    Returns the student's queue, kept current by record_attempt and reloaded after
+    USER_DATA_TTL_SECONDS so updates made by other server processes show up.
+    """
+    return content_cache.get_user_cache().get_or_load(
+        content_cache.review_key(username),
+        lambda: ReviewQueue.from_doc(database_manager.get_review_queue(username)), content_cache.USER_DATA_TTL_SECONDS)
@@ -0,0 +1,39 @@
+"""Scoring and per-topic aggregation shared by the quiz views and the dashboard."""
+from modules import answer_matching
+
+def question_type(question: dict) -> str:
+    """Returns the question type, treating untyped questions with options as single choice (GK)."""
+    return question.get("type") or ("single_choice" if question.get("options") else "text")
+
+def is_answer_correct(question: dict, user_answer) -> bool:
+    """Checks a stored or submitted answer against the question's answer key."""
+    q_type = question_type(question)
+    correct_answer = question.get("answer")
+
+    if q_type == "single_choice":
+        # First, check if the stored answer is the KEY (new, correct format)
+        if user_answer == correct_answer:
+            return True
+        # Fallback: check if the stored answer is the TEXT (old, incorrect format)
+        return any(opt.get("key") == correct_answer and opt.get("text") == user_answer
+                   for opt in question.get("options", []))
+    if q_type == "multi_choice":
+        return isinstance(user_answer, list) and sorted(user_answer) == sorted(correct_answer or [])
+    if q_type == "text":
+        # Compiled once per distinct answer and answer_spec, however many attempts are scored
+        return answer_matching.matcher_for(question)(user_answer)
+    return False
+
+def score_questions(questions, answers) -> int:
+    """Counts correct answers; `answers` is a sequence aligned with `questions`."""
+    return sum(1 for q, a in zip(questions, answers) if is_answer_correct(q, a))
+
+def topic_scores(questions: list) -> dict:
+    """Aggregates attempt questions (with 'user_answer') into {topic: {correct, total}}."""
+    scores = {}
+    for q in questions:
+        topic_entry = scores.setdefault(q.get("topic", "General"), {"correct": 0, "total": 0})
+        topic_entry["total"] += 1
+        if is_answer_correct(q, q.get("user_answer")):
+            topic_entry["correct"] += 1
+    return scores
@@ -0,0 +1,149 @@
+import random
+import streamlit as st
+from datetime import datetime, timezone
+from modules import data_manager, practice, quiz_session, scoring
+from modules.navigation import set_view, reset_activity_state
+from modules.subjects import question_round
+
+ALL_TOPICS = "All topics"
+
+def render():
+    """Entry point for the Adaptive Practice module."""
+    if st.session_state.get("practice_in_progress"):
+        _render_activity()
+    elif st.session_state.get("practice_finished"):
+        _render_summary()
+    else:
+        _render_selection()
+
+def _render_selection():
+    st.header("Adaptive Practice 🎯")
+    st.info("Pick a subject (and optionally a topic). Questions come from every level, "
+            "with more from the topics you have found hardest so far.")
+
+    index = practice.get_practice_index()
+    subjects = index.children()
+    if not subjects:
+        st.warning("No quizzes have been uploaded yet. Please use the Admin dashboard to upload content.")
+        if st.button("⬅️ Back to Subjects"):
+            reset_activity_state(); set_view("subject_selection")
+        return
+
+    subject = st.selectbox("Select Subject", subjects, key="practice_subject_select")
+    topics = index.children(subject)
+    topic_key = st.selectbox("Select Topic", [ALL_TOPICS] + topics, key="practice_topic_select",
+                             format_func=lambda key: key.split(" › ")[-1])
+    series_key = subject if topic_key == ALL_TOPICS else topic_key
+
+    error_rates = practice.student_error_rates(st.session_state.student_name)
+    focus = sorted((key for key in index.children(series_key) if key in error_rates),
+                   key=error_rates.get, reverse=True)[:3]
+    if focus:
+        st.caption("Extra focus on: " + ", ".join(key.split(" › ")[-1] for key in focus))
+    st.caption(f"{index.question_count(series_key)} questions available.")
+
+    if st.button("Start Practice", use_container_width=True):
+        st.session_state.practice_series = series_key
+        st.session_state.practice_questions = []
+        st.session_state.practice_answers = []
+        st.session_state.practice_finished = False
+        question_round.new_round_seed()
+        quiz_session.start_timer()
+        st.session_state.practice_in_progress = _draw_next_question(index, error_rates)
+        if not st.session_state.practice_in_progress:
+            st.warning("No questions found for this selection.")
+        else:
+            st.rerun()
+
+    st.markdown("---")
+    if st.button("⬅️ Back to Subjects", key="practice_back_to_subjects"):
+        reset_activity_state(); set_view("subject_selection")
+
+def _draw_next_question(index=None, error_rates=None) -> bool:
+    """Appends the next (quiz_id, question_index) to the round; returns False if nothing could be drawn."""
+    index = index or practice.get_practice_index()
+    if error_rates is None:
+        error_rates = practice.student_error_rates(st.session_state.student_name)
+    asked = {tuple(ref) for ref in st.session_state.practice_questions}
+    ref = index.choose(st.session_state.practice_series, error_rates, random.Random(), exclude=asked)
+    if ref is None:
+        return False
+    st.session_state.practice_questions.append(index.resolve(ref))
+    return True
+
+def _render_activity():
+    position = len(st.session_state.practice_questions) - 1
+    question = question_round.resolve_question(st.session_state.practice_questions[position],
+                                               practice.get_practice_index())
+    st.header("Adaptive Practice 🎯", divider="rainbow")
+    st.subheader(f"Question {position + 1} of {practice.PRACTICE_ROUND_SIZE}")
+    if question is None:
+        st.warning("This question is no longer available; drawing another one.")
+        st.session_state.practice_questions.pop()
+        if not _draw_next_question():
+            _finish()
+        st.rerun()
+        return
+
+    st.caption(" › ".join(st.session_state.practice_series.split(" › ")[1:]) or st.session_state.practice_series)
+    st.markdown(f"**{question['prompt']}**")
+    checked = len(st.session_state.practice_answers) > position
+
+    if not checked:
+        answer = question_round.render_answer_input(question, f"practice_q_{position}")
+        if st.button("Check Answer ✅", use_container_width=True):
+            st.session_state.practice_answers.append(answer)
+            quiz_session.record_interaction(position)
+            st.rerun()
+        return
+
+    question_round.render_feedback(question, st.session_state.practice_answers[position])
+
+    is_last = position + 1 >= practice.PRACTICE_ROUND_SIZE
+    if st.button("Finish Practice 🏁" if is_last else "Next Question ➡️", use_container_width=True):
+        if is_last or not _draw_next_question():
+            _finish()
+        quiz_session.mark_time()
+        st.rerun()
+
+def _finish():
+    """Saves the round as one attempt so it shows on the dashboard and feeds the progress aggregates."""
+    questions_with_answers = question_round.questions_with_answers(
+        st.session_state.practice_questions, st.session_state.practice_answers, practice.get_practice_index())
+    score = scoring.score_questions(questions_with_answers, [q["user_answer"] for q in questions_with_answers])
+    subject, *topic = st.session_state.practice_series.split(" › ")
+    topic_name = topic[0] if topic else ALL_TOPICS
+    attempt_data = {
+        "student_name": st.session_state.student_name,
+        "subject": subject,
+        "level": f"{topic_name} - Adaptive Practice" if subject == "GK" else topic_name,
+        "mode": "practice",
+        "score": score,
+        "total_questions": len(questions_with_answers),
+        "timestamp": datetime.now(timezone.utc),
+        "questions": questions_with_answers,
+        **quiz_session.timing_fields(),
+    }
+    if subject == "Math":
+        attempt_data["story"] = "Adaptive Practice"
+    if topic:
+        attempt_data["topic"] = topic_name
+    if questions_with_answers:
+        data_manager.save_attempt(attempt_data)
+    st.session_state.score = score
+    st.session_state.practice_total = len(questions_with_answers)
+    st.session_state.practice_in_progress = False
+    st.session_state.practice_finished = True
+
+def _render_summary():
+    st.header("Practice Complete! 🏆", divider="rainbow")
+    st.subheader(f"Your Score: {st.session_state.score}/{st.session_state.get('practice_total', 0)}")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Practice Again", use_container_width=True):
+            st.session_state.practice_finished = False
+            st.rerun()
+    with col2:
+        if st.button("⬅️ Back to Subjects", use_container_width=True, key="practice_summary_back"):
+            st.session_state.practice_finished = False
+            reset_activity_state(); set_view("subject_selection")
@@ -1,6 +1,6 @@
 import streamlit as st
-from datetime import datetime
-from modules import data_manager
+from datetime import datetime, timezone
+from modules import data_manager, prefetch, quiz_content, quiz_session
 from modules.navigation import set_view, reset_activity_state
 
 def render():
@@ -16,9 +16,20 @@ def render():
     else:
         _render_selection()
 
+def _begin_quiz():
+    st.session_state.score = 0
+    st.session_state.quiz_finished = False
+    st.session_state.show_score_summary = False
+    st.session_state.show_reward = False
+    st.session_state.is_perfect_score = False
+    st.session_state.quiz_in_progress = True # Set flag to indicate quiz is active
+    st.rerun()
+
 def _render_selection():
     """Displays a dynamic UI for selecting a quiz topic and level from Firestore."""
     st.header("General Knowledge Quiz")
+    if quiz_session.render_resume_options("gk_quiz"):
+        _begin_quiz()
     st.info("Select a topic and a level to start the quiz.")
     
     gk_index = data_manager.load_gk_index()
@@ -58,12 +69,10 @@ def _render_selection():
             st.warning("No quizzes found for this topic.")
         else:
             # --- Logical Sorting of Levels ---
-            level_sort_order = {"Foundation": 0, "Intermediate": 1, "Advanced": 2, "Expert": 3, "Grandmaster": 4}
-            
             # Sort the quiz IDs based on the display name's order
             sorted_quiz_ids = sorted(
                 quizzes_in_topic.keys(),
-                key=lambda qid: level_sort_order.get(quizzes_in_topic[qid]['name'], 99) # Default to 99 for unknown levels
+                key=lambda qid: data_manager.level_rank(quizzes_in_topic[qid]['name'])
             )
             
             quiz_options_display = {quiz_id: quiz_info['name'] for quiz_id, quiz_info in quizzes_in_topic.items()}
@@ -78,21 +87,16 @@ def _render_selection():
                 index=sorted_quiz_ids.index(current_selected_quiz_id) if current_selected_quiz_id in sorted_quiz_ids else 0
             )
             st.session_state.selected_gk_quiz_id = selected_quiz_id
+            # Warm the cache for this topic, selected level and the next one first
+            prefetch.prefetch_on_change(f"gk:{selected_topic_id}:{selected_quiz_id}",
+                                        prefetch.next_first(sorted_quiz_ids, selected_quiz_id))
 
             if st.button("Start GK Quiz", use_container_width=True):
-                st.session_state.questions = data_manager.load_gk_questions(selected_quiz_id)
-                if st.session_state.questions:
-                    st.session_state.user_answers = {i: None for i in range(len(st.session_state.questions))}
-                    st.session_state.score = 0
-                    st.session_state.quiz_finished = False
-                    st.session_state.show_score_summary = False
-                    st.session_state.show_reward = False
-                    st.session_state.is_perfect_score = False
-                    st.session_state.quiz_in_progress = True # Set flag to indicate quiz is active
-                    st.session_state.show_score_summary = False
-                    st.session_state.show_reward = False
-                    st.session_state.is_perfect_score = False
-                    st.rerun()
+                quiz = data_manager.load_gk_quiz(selected_quiz_id)
+                if quiz and quiz.questions:
+                    quiz_session.start_quiz(quiz, "gk_quiz", {"selected_gk_topic_id": selected_topic_id,
+                                                              "selected_gk_quiz_id": selected_quiz_id})
+                    _begin_quiz()
                 else:
                     st.warning("No questions loaded for this quiz.")
     
@@ -101,35 +105,40 @@ def _render_selection():
         reset_activity_state(); set_view("subject_selection")
 
 def _render_activity():
+    quiz = quiz_session.active_quiz()
+    if not quiz:
+        st.error("This quiz is no longer available.")
+        st.session_state.quiz_in_progress = False
+        if st.button("⬅️ Back to Subjects", key="missing_quiz_back_to_subjects"):
+            reset_activity_state(); set_view("subject_selection")
+        return
+
     if st.session_state.get("show_reward"):
-        _render_reward_view()
+        _render_reward_view(quiz)
     elif st.session_state.get("show_score_summary"):
-        _render_score_summary_view()
+        _render_score_summary_view(quiz)
     elif not st.session_state.get("quiz_finished"):
-        _render_quiz_view()
+        _render_quiz_view(quiz)
     else:
-        _render_results_view()
+        _render_results_view(quiz)
 
-def _render_quiz_view():
-    st.header(st.session_state.get("gk_title", "GK Quiz"), divider="rainbow")
+def _render_quiz_view(quiz):
+    st.header(quiz.title or "GK Quiz", divider="rainbow")
 
-    if st.session_state.get("gk_background"):
-        st.info(st.session_state.gk_background)
-    if st.session_state.get("gk_icon_legend"):
-        legend_text = "  |  ".join([f"{icon}: {value}" for icon, value in st.session_state.gk_icon_legend.items()])
+    if quiz.background:
+        st.info(quiz.background)
+    if quiz.icon_legend:
+        legend_text = "  |  ".join([f"{icon}: {value}" for icon, value in quiz.icon_legend.items()])
         st.markdown(f"**Legend:** {legend_text}")
     
-    st.subheader(f"Answer all {len(st.session_state.questions)} questions and submit:")
+    st.subheader(f"Answer all {len(quiz.questions)} questions and submit:")
     
-    for i, q_data in enumerate(st.session_state.questions):
+    for i, q_data in enumerate(quiz.questions):
         st.markdown(f"**Q{i+1}: {q_data['prompt']}**")
-        
-        if i not in st.session_state.user_answers:
-            st.session_state.user_answers[i] = None 
 
         display_options = [f"{opt['key']}. {opt['text']}" for opt in q_data["options"]]
         
-        selected_key_from_state = st.session_state.user_answers.get(i)
+        selected_key_from_state = quiz_session.get_answer(quiz, i)
         selected_display_text = None
         if selected_key_from_state:
             for opt in q_data["options"]:
@@ -145,11 +154,11 @@ def _render_quiz_view():
         
         if selected_radio_text:
             selected_key = selected_radio_text.split('.')[0]
-            st.session_state.user_answers[i] = selected_key 
+            quiz_session.set_answer(quiz, i, selected_key)
         st.markdown("---")
     
     if st.button("Submit Quiz ✅", use_container_width=True):
-        _calculate_score_and_save()
+        _calculate_score_and_save(quiz)
         if st.session_state.get("is_perfect_score"):
             st.session_state.show_reward = True
         else:
@@ -157,18 +166,20 @@ def _render_quiz_view():
         st.session_state.quiz_in_progress = False # Reset flag
         st.rerun()
 
-def _render_reward_view():
+def _render_reward_view(quiz):
     st.balloons()
     st.header("Congratulations! 🎉", divider="rainbow")
-    st.markdown(f"> {st.session_state.get('gk_reward_text', 'You got a perfect score!')}")
+    st.markdown(f"> {quiz.reward or 'You got a perfect score!'}")
     if st.button("See my Score!"):
         st.session_state.show_reward = False
         st.session_state.show_score_summary = True
         st.rerun()
 
-def _render_score_summary_view():
+def _render_score_summary_view(quiz):
     st.header("Quiz Completed! 🏆", divider="rainbow")
-    st.subheader(f"Your Score: {st.session_state.score}/{len(st.session_state.questions)}")
+    st.subheader(f"Your Score: {st.session_state.score}/{len(quiz.questions)}")
+    if st.session_state.score < len(quiz.questions):
+        st.caption("Questions you missed have been added to your Review queue 🔁.")
     col1, col2 = st.columns(2)
     with col1:
         if st.button("Review Answers", use_container_width=True):
@@ -179,14 +190,14 @@ def _render_score_summary_view():
         if st.button("⬅️ Back to Subjects", use_container_width=True, key="summary_back_to_subjects"):
             reset_activity_state(); set_view("subject_selection")
 
-def _render_results_view():
+def _render_results_view(quiz):
     st.header("Quiz Results 🏆", divider="rainbow")
-    st.write(f"**Score:** {st.session_state.score}/{len(st.session_state.questions)}")
+    st.write(f"**Score:** {st.session_state.score}/{len(quiz.questions)}")
 
     st.subheader("Question Review:", divider="grey")
-    for i, q_data in enumerate(st.session_state.questions):
+    for i, q_data in enumerate(quiz.questions):
         st.markdown(f"**Q{i+1}: {q_data['prompt']}**")
-        user_choice_key = st.session_state.user_answers.get(i)
+        user_choice_key = quiz_session.get_answer(quiz, i)
         correct_answer_key = q_data["answer"]
         
         for opt in q_data["options"]:
@@ -203,23 +214,15 @@ def _render_results_view():
     if st.button("⬅️ Back to Subjects", key="back_to_subjects_results"):
         reset_activity_state(); set_view("subject_selection")
 
-def _calculate_score_and_save():
-    correct_answers = 0
+def _calculate_score_and_save(quiz):
     questions_with_answers = []
-    
-    for i, q_data in enumerate(st.session_state.questions):
-        user_answer_key = st.session_state.user_answers.get(i)
-        correct_answer_key = q_data["answer"]
-        
-        q_copy = q_data.copy()
+    for q_data, user_answer_key in zip(quiz.questions, quiz_session.decoded_answers(quiz)):
+        q_copy = quiz_content.thaw(q_data)
         q_copy["user_answer"] = user_answer_key
         questions_with_answers.append(q_copy)
 
-        if user_answer_key == correct_answer_key:
-            correct_answers += 1
-
-    st.session_state.score = correct_answers
-    st.session_state.is_perfect_score = (correct_answers == len(st.session_state.questions))
+    st.session_state.score = quiz.score(st.session_state.user_answers)
+    st.session_state.is_perfect_score = (st.session_state.score == len(quiz.questions))
     
     gk_index = data_manager.load_gk_index()
     topic_info = gk_index.get("topics_data", {}).get(st.session_state.selected_gk_topic_id, {})
@@ -231,9 +234,14 @@ def _calculate_score_and_save():
         "student_name": st.session_state.student_name,
         "subject": "GK",
         "level": f"{topic_name} - {level_name}",
+        "topic": topic_name,
+        "level_name": level_name,
+        "quiz_id": quiz.quiz_id,
+        "quiz_version": quiz.version,
         "score": st.session_state.score,
-        "total_questions": len(st.session_state.questions),
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "questions": questions_with_answers
+        "total_questions": len(quiz.questions),
+        "timestamp": datetime.now(timezone.utc),
+        "questions": questions_with_answers,
+        **quiz_session.timing_fields(),
     }
-    data_manager.save_attempt(attempt_data)
\ No newline at end of file
+    data_manager.save_attempt(attempt_data, checkpoint_id=quiz_session.finish_checkpoint())
\ No newline at end of file
@@ -1,18 +1,15 @@
+import random
 import streamlit as st
-from datetime import datetime
-from modules import data_manager
+from datetime import datetime, timezone
+from modules import data_manager, prefetch, quiz_content, quiz_session
 from modules.navigation import set_view, reset_activity_state
 
 # --- Helper function for multi-choice callback ---
-def _handle_multichoice_selection(q_id, option_key):
-    """Adds or removes an option from the user's answer list for a multi-choice question."""
-    if q_id not in st.session_state.user_answers or st.session_state.user_answers[q_id] is None:
-        st.session_state.user_answers[q_id] = []
-    
-    if option_key in st.session_state.user_answers[q_id]:
-        st.session_state.user_answers[q_id].remove(option_key)
-    else:
-        st.session_state.user_answers[q_id].append(option_key)
+def _handle_multichoice_selection(q_index, option_key):
+    """Adds or removes an option from the user's answer for a multi-choice question."""
+    quiz = quiz_session.active_quiz()
+    if quiz:
+        quiz_session.toggle_option(quiz, q_index, option_key)
 
 def render():
     """Entry point for the Math Exercise module."""
@@ -21,9 +18,20 @@ def render():
     else:
         _render_selection()
 
+def _begin_exercise():
+    st.session_state.score = 0
+    st.session_state.quiz_finished = False
+    st.session_state.show_score_summary = False
+    st.session_state.show_reward = False
+    st.session_state.is_perfect_score = False
+    st.session_state.exercise_in_progress = True # Set flag to indicate exercise is active
+    st.rerun()
+
 def _render_selection():
     """Displays UI for selecting a math chapter and story from Firestore."""
     st.header("Math Exercises 🧮")
+    if quiz_session.render_resume_options("math_exercise"):
+        _begin_exercise()
     st.info("Select a chapter and a story to begin.")
 
     math_index = data_manager.load_math_index()
@@ -42,34 +50,26 @@ def _render_selection():
         if chapter_data and chapter_data.get("stories"):
             story_map = {story["file"]: story["name"] for story in chapter_data["stories"]}
             selected_story_file = st.selectbox("Select Story", options=list(story_map.keys()), format_func=lambda x: story_map.get(x, x))
+            # Warm the cache for this chapter, selected story and the next one first
+            story_quiz_ids = [data_manager.math_quiz_id(selected_chapter_id, story_file) for story_file in story_map]
+            prefetch.prefetch_on_change(f"math:{selected_chapter_id}:{selected_story_file}",
+                                        prefetch.next_first(story_quiz_ids, data_manager.math_quiz_id(selected_chapter_id, selected_story_file)))
 
             if st.button("Start Exercise", use_container_width=True):
-                quiz_id = f"math_{selected_chapter_id}_{selected_story_file.replace('.json', '')}"
-                # load_math_story now returns the questions list and sets metadata in session state
-                questions = data_manager.load_math_story(quiz_id)
-
-                if questions:
-                    st.session_state.questions = questions
-                    # Store names for display in other views
-                    st.session_state.selected_chapter_name = chapter_map[selected_chapter_id]
-                    st.session_state.selected_story_name = story_map[selected_story_file]
-
-                    # Initialize quiz state
-                    user_answers_init = {}
-                    for q in st.session_state.questions:
-                        user_answers_init[q["id"]] = [] if q.get("type") == "multi_choice" else None
-                    st.session_state.user_answers = user_answers_init
-                    
-                    st.session_state.score = 0
-                    st.session_state.quiz_finished = False
-                    st.session_state.show_score_summary = False
-                    st.session_state.show_reward = False
-                    st.session_state.is_perfect_score = False
-                    st.session_state.exercise_in_progress = True # Set flag to indicate exercise is active
-                    st.session_state.show_score_summary = False
-                    st.session_state.show_reward = False
-                    st.session_state.is_perfect_score = False
-                    st.rerun()
+                quiz_id = data_manager.math_quiz_id(selected_chapter_id, selected_story_file)
+                # load_math_story returns the shared, immutable quiz bundle
+                quiz = data_manager.load_math_story(quiz_id)
+
+                if quiz and quiz.is_parametric:
+                    # Stories with templates get fresh numbers on every start
+                    quiz = data_manager.get_worksheet(quiz, random.getrandbits(32))
+                if quiz and quiz.questions:
+                    # Store names for display in other views (and when the exercise is resumed)
+                    names = {"selected_chapter_name": chapter_map[selected_chapter_id],
+                             "selected_story_name": story_map[selected_story_file]}
+                    quiz_session.start_quiz(quiz, "math_exercise", names)
+                    st.session_state.update(names)
+                    _begin_exercise()
                 else:
                     st.error("Could not load story from database. The document might be empty or missing.")
     
@@ -78,36 +78,41 @@ def _render_selection():
         reset_activity_state(); set_view("subject_selection")
 
 def _render_activity():
+    quiz = quiz_session.active_quiz()
+    if not quiz:
+        st.error("This exercise is no longer available.")
+        st.session_state.exercise_in_progress = False
+        if st.button("⬅️ Back to Subjects", key="missing_story_back_to_subjects"):
+            reset_activity_state(); set_view("subject_selection")
+        return
+
     if st.session_state.get("show_reward"):
-        _render_reward_view()
+        _render_reward_view(quiz)
     elif st.session_state.get("show_score_summary"):
-        _render_score_summary_view()
+        _render_score_summary_view(quiz)
     elif not st.session_state.get("quiz_finished"):
-        _render_exercise_view()
+        _render_exercise_view(quiz)
     else:
-        _render_results_view()
+        _render_results_view(quiz)
 
-def _render_exercise_view():
+def _render_exercise_view(quiz):
     st.header(f"Math: {st.session_state.get('selected_chapter_name', 'Chapter')}", divider="rainbow")
     st.subheader(f"Story: {st.session_state.get('selected_story_name', 'Story')}")
 
-    if st.session_state.get("math_background"):
-        st.info(st.session_state.math_background)
-    if st.session_state.get("math_icon_legend"):
-        legend_text = "  |  ".join([f"{icon}: {value}" for icon, value in st.session_state.math_icon_legend.items()])
+    if quiz.background:
+        st.info(quiz.background)
+    if quiz.icon_legend:
+        legend_text = "  |  ".join([f"{icon}: {value}" for icon, value in quiz.icon_legend.items()])
         st.markdown(f"**Legend:** {legend_text}")
     
-    st.subheader(f"Answer all {len(st.session_state.questions)} questions and submit:")
-    for i, q in enumerate(st.session_state.questions):
+    st.subheader(f"Answer all {len(quiz.questions)} questions and submit:")
+    for i, q in enumerate(quiz.questions):
         st.markdown(f"**Q{i+1})** {q['prompt']}")
         q_id = q['id']; q_type = q.get('type', 'text')
-        
-        if q_id not in st.session_state.user_answers:
-            st.session_state.user_answers[q_id] = [] if q_type == "multi_choice" else None
 
         if q_type == "single_choice":
             display_options = [f"{opt['key']}. {opt['text']}" for opt in q['options']]
-            selected_key_from_state = st.session_state.user_answers.get(q_id)
+            selected_key_from_state = quiz_session.get_answer(quiz, i)
             selected_display_text = None
             if selected_key_from_state:
                 for opt in q["options"]:
@@ -117,34 +122,36 @@ def _render_exercise_view():
             selected_index = display_options.index(selected_display_text) if selected_display_text in display_options else None
             selected_radio_text = st.radio(f"Options for Q{i+1}", display_options, index=selected_index, key=f"math_q_{q_id}")
             if selected_radio_text:
-                st.session_state.user_answers[q_id] = selected_radio_text.split('.')[0]
+                quiz_session.set_answer(quiz, i, selected_radio_text.split('.')[0])
         
         elif q_type == "text":
-            st.session_state.user_answers[q_id] = st.text_input("Your Answer:", value=st.session_state.user_answers.get(q_id, ""), key=f"math_q_{q_id}")
+            quiz_session.set_answer(quiz, i, st.text_input("Your Answer:", value=quiz_session.get_answer(quiz, i) or "", key=f"math_q_{q_id}"))
         
         elif q_type == "multi_choice":
-            current_selections = st.session_state.user_answers.get(q_id) or []
+            current_selections = quiz_session.get_answer(quiz, i)
             for opt in q['options']:
-                st.checkbox(f"{opt['key']}. {opt['text']}", value=(opt['key'] in current_selections), key=f"math_q_{q_id}_{opt['key']}", on_change=_handle_multichoice_selection, args=(q_id, opt['key']))
+                st.checkbox(f"{opt['key']}. {opt['text']}", value=(opt['key'] in current_selections), key=f"math_q_{q_id}_{opt['key']}", on_change=_handle_multichoice_selection, args=(i, opt['key']))
         st.markdown("---")
     
     if st.button("Submit Exercise ✅", use_container_width=True):
-        _calculate_score_and_save()
+        _calculate_score_and_save(quiz)
         if st.session_state.get("is_perfect_score"): st.session_state.show_reward = True
         else: st.session_state.show_score_summary = True
         st.session_state.exercise_in_progress = False # Reset flag
         st.rerun()
 
-def _render_reward_view():
+def _render_reward_view(quiz):
     st.balloons()
     st.header("Congratulations! 🎉", divider="rainbow")
-    st.markdown(f"> {st.session_state.get('math_reward_text', 'You got a perfect score!')}")
+    st.markdown(f"> {quiz.reward or 'You got a perfect score!'}")
     if st.button("See my Score!"):
         st.session_state.show_reward = False; st.session_state.show_score_summary = True; st.rerun()
 
-def _render_score_summary_view():
+def _render_score_summary_view(quiz):
     st.header("Exercise Completed! 🏆", divider="rainbow")
-    st.subheader(f"Your Score: {st.session_state.score}/{len(st.session_state.questions)}")
+    st.subheader(f"Your Score: {st.session_state.score}/{len(quiz.questions)}")
+    if st.session_state.score < len(quiz.questions):
+        st.caption("Questions you missed have been added to your Review queue 🔁.")
     col1, col2 = st.columns(2)
     with col1:
         if st.button("Review Answers", use_container_width=True):
@@ -153,20 +160,17 @@ def _render_score_summary_view():
         if st.button("⬅️ Back to Subjects", use_container_width=True, key="summary_back_to_subjects_math"):
             reset_activity_state(); set_view("subject_selection")
 
-def _render_results_view():
+def _render_results_view(quiz):
     st.header("Exercise Results", divider="blue")
-    st.write(f"**Score:** {st.session_state.score}/{len(st.session_state.questions)}")
+    st.write(f"**Score:** {st.session_state.score}/{len(quiz.questions)}")
     st.subheader("Question Review:", divider="grey")
-    for i, q in enumerate(st.session_state.questions):
+    for i, q in enumerate(quiz.questions):
         st.markdown(f"**Q{i+1})** {q['prompt']}")
-        user_answer_key = st.session_state.user_answers.get(q['id'])
+        user_answer_key = quiz_session.get_answer(quiz, i)
         correct_answer_key = q['answer']
         
         q_type = q.get('type', 'text')
-        is_correct = False
-        if q_type == "text": is_correct = str(user_answer_key).strip().lower() == str(correct_answer_key).strip().lower()
-        elif q_type == "single_choice": is_correct = user_answer_key == correct_answer_key
-        elif q_type == "multi_choice": is_correct = sorted(user_answer_key) == sorted(correct_answer_key) if isinstance(user_answer_key, list) else False
+        is_correct = quiz.is_correct(i, st.session_state.user_answers[i])
         
         if q_type in ["single_choice", "multi_choice"]:
             user_choices_text = []
@@ -198,30 +202,30 @@ def _render_results_view():
     if st.button("⬅️ Back to Subjects", key="back_to_subjects_results_math"):
         reset_activity_state(); set_view("subject_selection")
 
-def _calculate_score_and_save():
-    correct_answers = 0; questions_with_answers = []
-    for q_data in st.session_state.questions:
-        q_id = q_data["id"]; q_type = q_data.get("type", "text"); user_answer_key = st.session_state.user_answers.get(q_id); correct_answer_key = q_data["answer"]; is_correct = False
-        if q_type == "text": is_correct = str(user_answer_key).strip().lower() == str(correct_answer_key).strip().lower()
-        elif q_type == "single_choice": is_correct = user_answer_key == correct_answer_key
-        elif q_type == "multi_choice": is_correct = sorted(user_answer_key) == sorted(correct_answer_key) if isinstance(user_answer_key, list) else False
-        if is_correct: correct_answers += 1
-        
-        q_copy = q_data.copy()
+def _calculate_score_and_save(quiz):
+    questions_with_answers = []
+    for q_data, user_answer_key in zip(quiz.questions, quiz_session.decoded_answers(quiz)):
+        q_copy = quiz_content.thaw(q_data)
         q_copy["user_answer"] = user_answer_key
         questions_with_answers.append(q_copy)
 
-    st.session_state.score = correct_answers
-    st.session_state.is_perfect_score = (correct_answers == len(st.session_state.questions))
+    st.session_state.score = quiz.score(st.session_state.user_answers)
+    st.session_state.is_perfect_score = (st.session_state.score == len(quiz.questions))
     
     attempt_data = {
         "student_name": st.session_state.student_name,
         "subject": "Math",
         "level": st.session_state.get("selected_chapter_name", "N/A"),
         "story": st.session_state.get("selected_story_name", "N/A"),
+        "topic": st.session_state.get("selected_chapter_name", "N/A"),
+        "level_name": st.session_state.get("selected_story_name", "N/A"),
+        "quiz_id": quiz.quiz_id,
+        "quiz_version": quiz.version,
+        "worksheet_seed": quiz.seed,
         "score": st.session_state.score,
-        "total_questions": len(st.session_state.questions),
-        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "questions": questions_with_answers
+        "total_questions": len(quiz.questions),
+        "timestamp": datetime.now(timezone.utc),
+        "questions": questions_with_answers,
+        **quiz_session.timing_fields(),
     }
-    data_manager.save_attempt(attempt_data)
\ No newline at end of file
+    data_manager.save_attempt(attempt_data, checkpoint_id=quiz_session.finish_checkpoint())
\ No newline at end of file
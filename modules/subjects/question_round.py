@@ -0,0 +1,56 @@
+import random
+import streamlit as st
+from modules import data_manager, quiz_content, scoring
+
+# Shared pieces for activities that serve questions one at a time from across quizzes
+# (adaptive practice and review). Questions are addressed by (quiz_id, question_index) refs;
+# a ref to a Math template question is generated with the round's seed (round_seed), so it
+# shows the same numbers for the whole round and new ones in the next.
+
+def new_round_seed():
+    st.session_state.round_seed = random.getrandbits(32)
+
+def resolve_question(ref, index=None):
+    """
+    Returns the shared question for a (quiz_id, question_index) ref, or None if it no longer
+    exists. With a practice index, the quiz comes from the index instead of the content cache.
+    """
+    quiz_id, question_index = ref
+    quiz = (index and index.quiz(quiz_id)) or data_manager.get_compiled_quiz(quiz_id)
+    if not quiz or question_index >= len(quiz.questions):
+        return None
+    return quiz_content.question_instance(quiz, question_index, st.session_state.get("round_seed", 0))
+
+def render_answer_input(question, widget_key: str):
+    """Renders the input for one question and returns the option key, list of keys or text."""
+    q_type = scoring.question_type(question)
+    if q_type == "text":
+        return st.text_input("Your Answer:", key=widget_key)
+    display_options = {f"{opt['key']}. {opt['text']}": opt["key"] for opt in question["options"]}
+    if q_type == "multi_choice":
+        selected = st.multiselect("Choose all that apply", list(display_options), key=widget_key)
+        return [display_options[text] for text in selected]
+    selected = st.radio("Options", list(display_options), index=None, key=widget_key)
+    return display_options[selected] if selected else None
+
+def render_feedback(question, user_answer):
+    if scoring.is_answer_correct(question, user_answer):
+        st.success("Correct! 🎉")
+    else:
+        correct_answer = question["answer"]
+        shown = ", ".join(correct_answer) if isinstance(correct_answer, (list, tuple)) else correct_answer
+        st.error(f"Not quite. The correct answer is **{shown}**.")
+
+def questions_with_answers(refs: list, answers: list, index=None) -> list:
+    """Builds an attempt's question list, tagging each question with its ref for the review queue."""
+    questions = []
+    for (quiz_id, question_index), user_answer in zip(refs, answers):
+        question = resolve_question((quiz_id, question_index), index)
+        if question is None:
+            continue
+        q_copy = quiz_content.thaw(question)
+        q_copy["user_answer"] = user_answer
+        q_copy["quiz_id"] = quiz_id
+        q_copy["question_index"] = question_index
+        questions.append(q_copy)
+    return questions
@@ -0,0 +1,117 @@
+import streamlit as st
+from datetime import datetime, timezone
+from modules import data_manager, quiz_session, review_queue, scoring
+from modules.navigation import set_view, reset_activity_state
+from modules.subjects import question_round
+
+def render():
+    """Entry point for the spaced-repetition Review module."""
+    if st.session_state.get("review_in_progress"):
+        _render_activity()
+    elif st.session_state.get("review_finished"):
+        _render_summary()
+    else:
+        _render_selection()
+
+def _render_selection():
+    st.header("Review 🔁")
+    st.info("Questions you missed come back here after 1, 2, 4, 8, 16 and 32 days. "
+            "Answer one correctly when it is due and it waits longer; miss it and it starts again tomorrow.")
+
+    queue = review_queue.get_review_queue(st.session_state.student_name)
+    due_counts = queue.due_counts(review_queue.today_ordinal())
+    if not due_counts:
+        st.success(f"Nothing to review today! 🎉 ({len(queue)} question(s) scheduled for later.)")
+    else:
+        for subject, count in sorted(due_counts.items()):
+            col1, col2 = st.columns([3, 1])
+            col1.markdown(f"**{subject}**: {count} question(s) due")
+            if col2.button("Review", key=f"start_review_{subject}", use_container_width=True):
+                refs = queue.due(subject, review_queue.today_ordinal(), review_queue.REVIEW_ROUND_SIZE)
+                st.session_state.review_subject = subject
+                st.session_state.review_questions = refs
+                st.session_state.review_answers = []
+                st.session_state.review_position = 0
+                st.session_state.review_finished = False
+                question_round.new_round_seed()
+                quiz_session.start_timer(len(refs))
+                st.session_state.review_in_progress = True
+                st.rerun()
+
+    st.markdown("---")
+    if st.button("⬅️ Back to Subjects", key="review_back_to_subjects"):
+        reset_activity_state(); set_view("subject_selection")
+
+def _render_activity():
+    position = st.session_state.review_position
+    refs = st.session_state.review_questions
+    question = question_round.resolve_question(refs[position])
+
+    st.header(f"Review: {st.session_state.review_subject} 🔁", divider="rainbow")
+    st.subheader(f"Question {position + 1} of {len(refs)}")
+    if question is None:
+        # The quiz was changed or removed since the question was queued; skip it
+        del refs[position]
+        del st.session_state.question_times[position:position + 1]
+        if position >= len(refs):
+            _finish()
+        st.rerun()
+        return
+
+    st.markdown(f"**{question['prompt']}**")
+    if len(st.session_state.review_answers) <= position:
+        answer = question_round.render_answer_input(question, f"review_q_{position}")
+        if st.button("Check Answer ✅", use_container_width=True):
+            st.session_state.review_answers.append(answer)
+            quiz_session.record_interaction(position)
+            st.rerun()
+        return
+
+    question_round.render_feedback(question, st.session_state.review_answers[position])
+    is_last = position + 1 >= len(refs)
+    if st.button("Finish Review 🏁" if is_last else "Next Question ➡️", use_container_width=True):
+        if is_last:
+            _finish()
+        else:
+            st.session_state.review_position += 1
+        quiz_session.mark_time()
+        st.rerun()
+
+def _finish():
+    """Saves the round as an attempt; save_attempt reschedules each question in the review queue."""
+    questions_with_answers = question_round.questions_with_answers(
+        st.session_state.review_questions, st.session_state.review_answers)
+    score = scoring.score_questions(questions_with_answers, [q["user_answer"] for q in questions_with_answers])
+    subject = st.session_state.review_subject
+    attempt_data = {
+        "student_name": st.session_state.student_name,
+        "subject": subject,
+        "level": "Review",
+        "mode": "review",
+        "score": score,
+        "total_questions": len(questions_with_answers),
+        "timestamp": datetime.now(timezone.utc),
+        "questions": questions_with_answers,
+        **quiz_session.timing_fields(),
+    }
+    if subject == "Math":
+        attempt_data["story"] = "Review"
+    if questions_with_answers:
+        data_manager.save_attempt(attempt_data)
+    st.session_state.score = score
+    st.session_state.review_total = len(questions_with_answers)
+    st.session_state.review_in_progress = False
+    st.session_state.review_finished = True
+
+def _render_summary():
+    st.header("Review Complete! 🏆", divider="rainbow")
+    st.subheader(f"Your Score: {st.session_state.score}/{st.session_state.get('review_total', 0)}")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Review More", use_container_width=True):
+            st.session_state.review_finished = False
+            st.rerun()
+    with col2:
+        if st.button("⬅️ Back to Subjects", use_container_width=True, key="review_summary_back"):
+            st.session_state.review_finished = False
+            reset_activity_state(); set_view("subject_selection")
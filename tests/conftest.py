@@ -0,0 +1,14 @@
+import pytest
+
+from modules import content_cache, database_manager
+
+
+@pytest.fixture
+def local_backend(monkeypatch):
+    """A fresh in-memory Firestore (see modules.local_firestore) with empty caches."""
+    monkeypatch.setenv("LEARNING_APP_BACKEND", "local")
+    database_manager.initialize_firestore.clear()
+    content_cache.get_user_cache().clear()
+    yield database_manager.initialize_firestore()
+    database_manager.initialize_firestore.clear()
+    content_cache.get_user_cache().clear()
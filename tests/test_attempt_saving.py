@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+from modules import attempt_spool, data_manager, database_manager, review_queue
+from modules.exceptions import BackendUnavailableError
+
+
+def _attempt() -> dict:
+    return {"student_name": "alice", "subject": "GK", "level": "Beginner", "quiz_id": "gk__animals__beginner",
+            "score": 0, "total_questions": 1, "timestamp": datetime(2026, 3, 1, tzinfo=timezone.utc),
+            "questions": [{"prompt": "Largest mammal?", "answer": "Whale", "user_answer": "Shark"}]}
+
+
+def test_failed_follow_up_is_retried_without_saving_the_attempt_again(local_backend, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # The spool file is relative to the working directory
+    toasts = []
+    monkeypatch.setattr(data_manager.st, "toast", lambda *args, **kwargs: toasts.append(args))
+    monkeypatch.setattr(data_manager, "flush_attempt_spool_in_background", lambda: None)
+    update_review_queue = database_manager.update_review_queue
+
+    def _unavailable(*args, **kwargs):
+        raise BackendUnavailableError("review queue unreachable")
+    monkeypatch.setattr(database_manager, "update_review_queue", _unavailable)
+
+    data_manager.save_attempt(_attempt())
+
+    assert not any("unreachable" in toast[0] for toast in toasts)
+    assert len(database_manager.get_student_attempts("alice")) == 1
+    assert attempt_spool.pending_count() == 1
+
+    monkeypatch.setattr(database_manager, "update_review_queue", update_review_queue)
+    assert data_manager.flush_attempt_spool() == 1
+    assert data_manager.flush_attempt_spool() == 0
+    assert len(database_manager.get_student_attempts("alice")) == 1
+    assert len(review_queue.ReviewQueue.from_doc(database_manager.get_review_queue("alice"))) == 1
+
+
+def test_review_queue_update_is_applied_once_per_attempt(local_backend):
+    review_queue.record_attempt("alice", _attempt(), "attempt-1")
+    review_queue.record_attempt("alice", dict(_attempt(), timestamp=None), "attempt-1")
+
+    doc = database_manager.get_review_queue("alice")
+    assert doc["applied"] == ["attempt-1"]
+    assert len(review_queue.ReviewQueue.from_doc(doc)) == 1
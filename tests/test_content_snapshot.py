@@ -0,0 +1,11 @@
+from modules import content_snapshot
+
+
+def test_merge_versions_keeps_changes_made_while_packing():
+    read = {"kept": "v1", "uploaded": "v1", "deleted": "v1", "gone": "v1"}
+    stored = {"kept": "v1", "uploaded": "v2", "gone": "v1", "added": "v1"}
+    packed = {"kept": "v1-packed", "uploaded": "v1", "deleted": "v1"}
+
+    assert content_snapshot.merge_versions(stored, packed, read) == {
+        "kept": "v1-packed", "uploaded": "v2", "added": "v1",
+    }
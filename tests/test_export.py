@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+
+from modules import attempt_rollups, database_manager, export
+
+
+def _attempt(student_name: str, day: int, group_id: str = None) -> dict:
+    attempt = {
+        "student_name": student_name,
+        "subject": "GK",
+        "level": "Beginner",
+        "quiz_id": "gk__animals__beginner",
+        "score": 1,
+        "total_questions": 1,
+        "timestamp": datetime(2026, 3, day, 9, 30, tzinfo=timezone.utc),
+        "questions": [{"prompt": "Largest mammal?", "answer": "Whale", "user_answer": "whale"}],
+    }
+    if group_id:
+        attempt["group_id"] = group_id
+    return attempt
+
+
+def test_class_export_holds_only_attempts_made_in_the_class(local_backend):
+    users = local_backend.collection("users")
+    users.document("alice").set({"group_id": "7a"})
+    users.document("bob").set({"group_id": "7b"})
+    attempts = {
+        "before-joining": _attempt("alice", 1),
+        "in-class": _attempt("alice", 2, "7a"),
+        "other-class": _attempt("bob", 3, "7b"),
+        "moved-away": _attempt("bob", 4, "7a"),
+    }
+    for attempt_id, attempt in attempts.items():
+        users.document(attempt["student_name"]).collection("attempts").document(attempt_id).set(attempt)
+    archived = [dict(_attempt("alice", 5, "7a"), filename="archived-in-class"),
+                dict(_attempt("alice", 6), filename="archived-elsewhere")]
+    database_manager.write_attempt_rollups("alice", attempt_rollups.build_rollups("2026-03", archived))
+
+    rows = [row for chunk in export.iter_row_chunks(export.export_pages(group_id="7a", page_size=1))
+            for row in chunk]
+
+    assert sorted(row["attempt_id"] for row in rows) == ["archived-in-class", "in-class", "moved-away"]
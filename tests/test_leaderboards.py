@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from modules import data_manager, leaderboards
+
+
+def _attempt(**fields) -> dict:
+    attempt = {
+        "student_name": "alice",
+        "subject": "GK",
+        "level": "Beginner",
+        "score": 3,
+        "total_questions": 4,
+        "timestamp": datetime(2026, 3, 1, 9, 30, tzinfo=timezone.utc),
+        "questions": [],
+    }
+    attempt.update(fields)
+    return attempt
+
+
+def test_quiz_attempt_counts_towards_quiz_and_subject_boards():
+    attempt = _attempt(quiz_id="gk__animals__beginner", group_id="class-a")
+    assert leaderboards.attempt_board_ids(attempt) == [
+        "subject__GK", "quiz__gk__animals__beginner",
+        "subject__GK__group__class-a", "quiz__gk__animals__beginner__group__class-a",
+    ]
+
+
+def test_quiz_titled_like_a_round_still_counts():
+    attempt = _attempt(subject="Math", level="Fractions", story="Chapter Review", quiz_id="math__3__review")
+    assert leaderboards.attempt_board_ids(attempt) == ["subject__Math", "quiz__math__3__review"]
+
+
+@pytest.mark.parametrize("fields", [
+    {"level": "Review", "mode": "review"},
+    {"subject": "Math", "level": "Review", "story": "Review", "mode": "review"},
+    {"level": "Animals - Adaptive Practice", "topic": "Animals", "mode": "practice"},
+    {"subject": "Math", "level": "Fractions", "story": "Adaptive Practice", "mode": "practice"},
+    {"level": "Review", "mode": "review", "quiz_id": "gk__animals__beginner"},
+    {"level": "Review"},  # Saved before rounds had a mode: no quiz_id
+])
+def test_review_and_practice_rounds_have_no_boards(fields):
+    assert leaderboards.attempt_board_ids(_attempt(**fields)) == []
+
+
+def test_saved_review_attempt_does_not_land_on_a_board(local_backend):
+    data_manager.save_attempt(_attempt(level="Review", mode="review", group_id="class-a"))
+    data_manager.save_attempt(_attempt(student_name="bob", quiz_id="gk__animals__beginner"))
+
+    assert [entry["u"] for entry in leaderboards.get_leaderboard("subject", "GK")] == ["bob"]
+    assert leaderboards.get_leaderboard("subject", "GK", "class-a") == []
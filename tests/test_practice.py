@@ -0,0 +1,22 @@
+import random
+
+from benchmarks import synthetic
+from modules import content_cache, data_manager, practice
+
+
+def test_practice_index_is_kept_apart_from_the_quiz_cache(local_backend):
+    content_cache.get_content_cache().clear()
+    content_cache.get_practice_cache().clear()
+    catalog = synthetic.seed_catalog(random.Random(1), 2, 1, 1, 3)
+    hot_quiz = data_manager.get_compiled_quiz(next(iter(catalog)))
+
+    index = practice.get_practice_index()
+
+    assert len(index) == 3 * len(catalog)
+    assert practice.get_practice_index() is index
+    quiz_cache = content_cache.get_content_cache()
+    assert [quiz_id for quiz_id in catalog if quiz_cache.get(content_cache.quiz_key(quiz_id))] == [hot_quiz.quiz_id]
+    assert index.quiz(hot_quiz.quiz_id) is hot_quiz
+
+    data_manager.invalidate_quiz(hot_quiz.quiz_id)
+    assert practice.get_practice_index() is not index
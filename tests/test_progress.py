@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+
+from modules import content_cache, data_manager, database_manager
+
+
+def _attempt(when: datetime, score: int) -> dict:
+    return {"student_name": "alice", "subject": "GK", "level": "Beginner", "quiz_id": "gk__animals__beginner",
+            "score": score, "total_questions": 4, "timestamp": when, "questions": []}
+
+
+def test_history_before_progress_documents_is_backfilled_once(local_backend, monkeypatch):
+    now = datetime.now(timezone.utc)
+    attempts = local_backend.collection("users").document("alice").collection("attempts")
+    attempts.document("legacy").set(_attempt(now - timedelta(days=30), 2))
+    data_manager.save_attempt(_attempt(now, 3))  # Writes this year's progress document only
+
+    series = data_manager.get_progress_series("alice")
+    assert [(point[1], point[3]) for point in series["GK"]] == [(2, 1), (3, 1)]
+
+    rebuilds = []
+    monkeypatch.setattr(data_manager, "rebuild_progress", rebuilds.append)
+    content_cache.get_user_cache().clear()
+    assert data_manager.get_progress_series("alice") == series
+    assert rebuilds == []
+
+
+def test_new_users_start_backfilled(local_backend):
+    database_manager.create_user("bob", "salt", "hash")
+    assert database_manager.get_progress_years("bob", [datetime.now().year]) == ({}, True)
+
+
+def test_progress_is_reloaded_after_the_user_data_ttl(local_backend, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(content_cache.time, "monotonic", lambda: clock[0])
+    data_manager.save_attempt(_attempt(datetime.now(timezone.utc), 3))
+    assert len(data_manager.get_progress_series("alice")["GK"]) == 1
+
+    # Saved by another server process: this process's cache is not invalidated
+    other_day = datetime.now(timezone.utc) - timedelta(days=3)
+    database_manager.save_attempt("alice", _attempt(other_day, 1), data_manager.format_attempt_date(other_day),
+                                  ["GK"], attempt_id="elsewhere")
+    assert len(data_manager.get_progress_series("alice")["GK"]) == 1
+
+    clock[0] += content_cache.USER_DATA_TTL_SECONDS
+    assert len(data_manager.get_progress_series("alice")["GK"]) == 2
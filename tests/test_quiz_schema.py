@@ -0,0 +1,21 @@
+import json
+
+from modules import quiz_schema
+
+
+def test_validate_uploads_reports_files_with_the_same_name_separately():
+    invalid = json.dumps({"questions": "none"}).encode("utf-8")
+    results = quiz_schema.validate_uploads([("quiz.json", invalid), ("quiz.json", b"not json")])
+
+    assert len(results) == 2
+    assert all(results)
+    assert results[0] != results[1]
+
+
+def test_options_that_are_not_a_list_are_reported():
+    for options in (None, 5):
+        quiz = {"subject": "GK", "topic_name": "Animals", "level_name": "Beginner",
+                "questions": [{"prompt": "Largest mammal?", "options": options, "answer": "a"}]}
+        errors = quiz_schema.validate_uploads([("quiz.json", json.dumps(quiz).encode("utf-8"))])[0]
+
+        assert quiz_schema.SchemaError("$.questions[0].options", "must be a list") in errors
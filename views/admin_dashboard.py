@@ -1,6 +1,48 @@
 import streamlit as st
 import json
-from modules import database_manager
+import tempfile
+import pandas as pd
+import plotly.graph_objects as go
+from datetime import date
+from modules import (async_db, attempt_rollups, authentication, content_snapshot, data_manager, database_manager,
+                     export, profiler, quiz_schema)
+from modules.quiz_content import build_worksheet, compile_quiz
+
+def _upload_quiz(quiz_content: dict) -> str:
+    """Uploads a validated GK quiz or Math story, updates its subject index and returns its quiz id."""
+    if quiz_content["subject"].upper() == "GK":
+        level = quiz_content["level"]
+        level_file = f"{level.lower().replace(' ', '_')}.json"
+        quiz_id = f"gk_{quiz_content['topic_id']}_{level_file.replace('.json', '')}"
+        database_manager.upload_gk_quiz(
+            quiz_id=quiz_id, quiz_data=quiz_content, topic_id=quiz_content["topic_id"],
+            topic_name=quiz_content["title"], level_file=level_file, level_name=level
+        )
+    else:
+        chapter_id_str = f"chapter{quiz_content['chapter_id']}"
+        quiz_id = f"math_{chapter_id_str}_story{quiz_content['story_id']}"
+        database_manager.upload_math_quiz(
+            quiz_id=quiz_id, quiz_data=quiz_content, chapter_id=chapter_id_str,
+            chapter_name=quiz_content["title"], story_file=quiz_content["story_file"],
+            story_name=quiz_content["story_name"]
+        )
+    data_manager.invalidate_quiz(quiz_id)
+    return quiz_id
+
+def _render_schema_errors(errors: list):
+    st.code("\n".join(str(error) for error in errors), language=None)
+
+def _render_worksheet_preview(quiz_data: dict):
+    """Shows one generated worksheet for a Math story with question templates."""
+    quiz = compile_quiz("preview", quiz_data)
+    if not quiz.is_parametric:
+        return
+    with st.expander(f"Preview a generated worksheet ({sum(1 for t in quiz.templates if t)} template question(s))"):
+        seed = st.number_input("Seed", min_value=0, value=0, step=1, key="worksheet_preview_seed")
+        for i, question in enumerate(build_worksheet(quiz, int(seed)).questions, 1):
+            options = "; ".join(f"{opt['key']}. {opt['text']}" for opt in question.get("options", ()))
+            st.markdown(f"**{i}.** {question['prompt']}" + (f"  \n{options}" if options else ""))
+            st.caption(f"Answer: {question['answer']}")
 
 def _render_smart_quiz_uploader():
     """Renders a user-friendly UI to upload quiz content and update indices."""
@@ -13,7 +55,13 @@ def _render_smart_quiz_uploader():
         if uploaded_file is not None:
             try:
                 quiz_content = json.loads(uploaded_file.getvalue().decode("utf-8"))
-                st.success("File loaded successfully. Please verify the details below and upload.")
+                # Reject malformed content here rather than when a student opens or scores it
+                errors = quiz_schema.validate_quiz(quiz_content)
+                if errors:
+                    st.error(f"This file has {len(errors)} problem(s). Please fix them and upload it again.")
+                    _render_schema_errors(errors)
+                    return
+                st.success("File loaded and validated. Please verify the details below and upload.")
 
                 subject = quiz_content.get("subject", "N/A").upper()
 
@@ -33,14 +81,9 @@ def _render_smart_quiz_uploader():
                     
                     if st.button("Confirm and Upload GK Quiz"):
                         if all([topic_id, title, level_file, level, uploaded_file]): # Added uploaded_file to check
-                            quiz_id = f"gk_{topic_id}_{level_file.replace('.json', '')}"
-                            database_manager.upload_gk_quiz(
-                                quiz_id=quiz_id, quiz_data=quiz_content, topic_id=topic_id,
-                                topic_name=title, level_file=level_file, level_name=level
-                            )
+                            quiz_id = _upload_quiz(quiz_content)
                             st.success(f"Successfully uploaded and indexed quiz '{quiz_id}'!")
-                            st.cache_data.clear()
-                            st.toast("Upload successful! Cache cleared.")
+                            st.toast("Upload successful! Cached content refreshed.")
                         else:
                             st.error("The uploaded JSON is missing required fields: 'topic_id', 'title', 'level', or no file uploaded.")
 
@@ -65,17 +108,13 @@ def _render_smart_quiz_uploader():
                     st.text_input("Chapter Display Name (from JSON)", value=chapter_name, disabled=True)
                     st.text_input("Story Filename (from JSON)", value=story_file_from_json, disabled=True)
                     st.text_input("Story Display Name (from JSON)", value=story_name, disabled=True)
+                    _render_worksheet_preview(quiz_content)
 
                     if st.button("Confirm and Upload Math Story"):
                         if all([chapter_id_str, chapter_name, story_file_from_json, story_name, uploaded_file]): # All required fields
-                            quiz_id = f"math_{chapter_id_str}_{story_id_str}"
-                            database_manager.upload_math_quiz(
-                                quiz_id=quiz_id, quiz_data=quiz_content, chapter_id=chapter_id_str,
-                                chapter_name=chapter_name, story_file=story_file_from_json, story_name=story_name
-                            )
+                            quiz_id = _upload_quiz(quiz_content)
                             st.success(f"Successfully uploaded and indexed story '{quiz_id}'!")
-                            st.cache_data.clear()
-                            st.toast("Upload successful! Cache cleared.")
+                            st.toast("Upload successful! Cached content refreshed.")
                         else:
                             st.error("The uploaded JSON is missing required fields: 'chapter_id', 'story_id', 'title', 'story_name', 'story_file', or no file uploaded.")
                 else:
@@ -86,15 +125,56 @@ def _render_smart_quiz_uploader():
             except Exception as e:
                 st.error(f"An unexpected error occurred: {e}")
 
-def _render_quiz_management():
+def _render_bulk_importer():
+    """Validates many quiz files at once and uploads the ones that pass."""
+    with st.expander("Bulk Import Quizzes"):
+        uploaded_files = st.file_uploader("Upload Quiz JSON Files", type="json",
+                                          accept_multiple_files=True, key="bulk_upload")
+        if not uploaded_files:
+            return
+
+        results = quiz_schema.validate_uploads([(f.name, f.getvalue()) for f in uploaded_files])
+        valid_files = [f for f, errors in zip(uploaded_files, results) if not errors]
+        st.write(f"**{len(valid_files)} of {len(uploaded_files)} files are valid.**")
+        for f, errors in zip(uploaded_files, results):
+            if errors:
+                st.error(f"{f.name}: {len(errors)} problem(s)")
+                _render_schema_errors(errors)
+
+        if valid_files and st.button(f"Upload {len(valid_files)} Valid Quiz File(s)"):
+            quiz_ids = [_upload_quiz(json.loads(f.getvalue())) for f in valid_files]
+            st.success(f"Uploaded and indexed {len(quiz_ids)} quizzes: {', '.join(quiz_ids)}")
+            st.toast("Bulk upload successful! Cached content refreshed.")
+
+def _render_content_snapshot():
+    """Shows the packed content snapshot's freshness and rebuilds it on request."""
+    with st.expander("Content Snapshot"):
+        store = content_snapshot.get_snapshot_store()
+        st.write("Students read quizzes from a packed local snapshot while it is current. "
+                 "Uploads are served from Firestore until the snapshot is rebuilt.")
+        status = content_snapshot.snapshot_status(store)
+        if status is None:
+            st.info(f"No snapshot at `{store.path}`; all content is read from Firestore.")
+        else:
+            st.write(f"Built {status['built_at']}: {status['quizzes']} quizzes, {status['bytes'] / 1e6:.1f} MB. "
+                     f"{status['stale']} changed and {status['missing']} new since then.")
+        if st.button("Rebuild Snapshot"):
+            summary = content_snapshot.build_snapshot(store.path)
+            store.invalidate_versions()
+            st.success(f"Packed {summary['quizzes']} quizzes and {summary['indices']} indices.")
+
+def _render_quiz_management(all_quizzes):
     _render_smart_quiz_uploader()
+    _render_bulk_importer()
+    _render_content_snapshot()
     st.markdown("---")
 
     with st.expander("Delete a Quiz"):
         st.write("Select a quiz document to permanently delete it. Note: This does not automatically remove it from the index. Manual cleanup may be required.")
         
         try:
-            all_quizzes = database_manager.get_all_documents("quizzes")
+            if isinstance(all_quizzes, Exception):
+                raise all_quizzes
             quiz_ids = [quiz.id for quiz in all_quizzes]
             if not quiz_ids:
                 st.info("No quizzes found in the database.")
@@ -102,30 +182,39 @@ def _render_quiz_management():
                 selected_quiz_id_to_delete = st.selectbox("Select Quiz ID to Delete", options=quiz_ids)
                 if st.button("Delete Quiz", type="primary"):
                     if selected_quiz_id_to_delete:
-                        database_manager.delete_document("quizzes", selected_quiz_id_to_delete)
+                        database_manager.delete_quiz(selected_quiz_id_to_delete)
                         st.success(f"Successfully deleted quiz: {selected_quiz_id_to_delete}")
-                        st.cache_data.clear()
-                        st.toast("Quiz deleted! Cache cleared.", icon="🗑️")
+                        data_manager.invalidate_quiz(selected_quiz_id_to_delete)
+                        st.toast("Quiz deleted! Cached content refreshed.", icon="🗑️")
                         st.rerun()
                     else:
                         st.warning("Please select a quiz to delete.")
         except Exception as e:
             st.error(f"Failed to load quizzes: {e}")
 
-def _render_user_management():
+def _render_user_management(all_users):
     st.subheader("User Management")
-    st.write("Here you can view and delete user accounts. Deleting a user is permanent and will also remove all their quiz attempts.")
+    st.write("Here you can view, change the role of and delete user accounts. Deleting a user is permanent "
+             "and will also remove all their quiz attempts. Role changes apply from the user's next login.")
     try:
-        all_users = database_manager.get_all_documents("users")
-        usernames = [user.id for user in all_users]
-        if not usernames:
+        if isinstance(all_users, Exception):
+            raise all_users
+        users = {user.id: user.to_dict() or {} for user in all_users}
+        if not users:
             st.info("No users found in the database.")
         else:
-            for username in sorted(usernames):
-                if username == "admin": continue
-                col1, col2 = st.columns([4, 1])
+            for username in sorted(users):
+                if username == st.session_state.student_name: continue
+                role = users[username].get("role") or ("admin" if username == "admin" else "student")
+                col1, col2, col3 = st.columns([3, 2, 1])
                 with col1: st.write(username)
                 with col2:
+                    new_role = st.selectbox("Role", authentication.ROLES, index=authentication.ROLES.index(role),
+                                            key=f"role_{username}", label_visibility="collapsed")
+                    if new_role != role:
+                        database_manager.set_user_fields(username, {"role": new_role})
+                        st.toast(f"{username} is now a {new_role}.")
+                with col3:
                     if st.button("Delete", key=f"delete_user_{username}", type="primary"):
                         database_manager.delete_user_and_subcollections(username)
                         st.success(f"Successfully deleted user: {username}")
@@ -135,12 +224,171 @@ def _render_user_management():
     except Exception as e:
         st.error(f"Failed to load users: {e}")
 
+def _render_class_management(all_users):
+    st.subheader("Class Management")
+    st.write("Create classes, assign their teachers and move students into them. "
+             "Teachers see only their own classes on the class dashboard.")
+    if isinstance(all_users, Exception):
+        st.error(f"Failed to load users: {all_users}")
+        return
+    users = {user.id: user.to_dict() or {} for user in all_users}
+    teachers = sorted(username for username, data in users.items() if data.get("role") == "teacher")
+    students = sorted(username for username, data in users.items()
+                      if (data.get("role") or "student") == "student" and username != "admin")
+    groups = database_manager.get_groups()
+
+    with st.expander("Create a Class", expanded=not groups):
+        with st.form("create_class_form", clear_on_submit=True):
+            group_id = st.text_input("Class ID", help="A short, permanent id such as 7a-2025.")
+            name = st.text_input("Class Name")
+            class_teachers = st.multiselect("Teachers", teachers)
+            if st.form_submit_button("Create Class"):
+                if not (group_id and name):
+                    st.error("Please enter both a class id and a name.")
+                elif group_id in groups or "/" in group_id:
+                    st.error("That class id is already taken or not valid.")
+                else:
+                    database_manager.save_group(group_id, name, class_teachers)
+                    st.success(f"Created class {name}.")
+                    st.rerun()
+
+    if not groups:
+        return
+    group_id = st.selectbox("Class", sorted(groups), format_func=lambda g: groups[g].get("name") or g,
+                            key="admin_class")
+    group = groups[group_id]
+    members = sorted(username for username, data in users.items() if data.get("group_id") == group_id)
+    with st.form(f"edit_class_{group_id}"):
+        name = st.text_input("Class Name", value=group.get("name", ""))
+        class_teachers = st.multiselect("Teachers", sorted(set(teachers) | set(group.get("teachers", []))),
+                                        default=group.get("teachers", []))
+        class_members = st.multiselect("Students", students, default=[m for m in members if m in students],
+                                       help="Adding a student here moves them out of any other class.")
+        if st.form_submit_button("Save Class"):
+            database_manager.save_group(group_id, name, class_teachers)
+            database_manager.set_group_members(group_id, add=sorted(set(class_members) - set(members)),
+                                               remove=sorted(set(members) - set(class_members)))
+            st.success(f"Saved {name}. Changes apply from each user's next login.")
+            st.rerun()
+    if st.button("Delete Class", type="primary", key=f"delete_class_{group_id}"):
+        database_manager.delete_group(group_id)
+        st.toast(f"Class {group.get('name') or group_id} deleted.", icon="🗑️")
+        st.rerun()
+
+def _render_data_export(all_users):
+    st.subheader("Data Export")
+    st.write("Download attempts with one row per question, for spreadsheets or offline analysis. "
+             "Large exports are also available from the command line: `python -m modules.export out.parquet`.")
+    if isinstance(all_users, Exception):
+        st.error(f"Failed to load users: {all_users}")
+        return
+    users = {user.id: user.to_dict() or {} for user in all_users}
+    groups = sorted(database_manager.get_groups())
+
+    scope = st.radio("Export", ["Everyone", "One student", "A class"] if groups else ["Everyone", "One student"],
+                     horizontal=True, key="export_scope")
+    username = group_id = None
+    if scope == "One student":
+        username = st.selectbox("Student", sorted(users), key="export_user")
+    elif scope == "A class":
+        group_id = st.selectbox("Class", groups, key="export_group")
+    fmt = st.selectbox("Format", export.FORMATS, format_func=str.upper, key="export_format")
+
+    def _build_export():
+        # Runs when the button is clicked; rows stream to a temporary file, not memory
+        output = tempfile.TemporaryFile()
+        export.export_attempts(output, fmt, username=username, group_id=group_id)
+        output.seek(0)
+        return output
+
+    st.download_button(f"⬇️ Download {fmt.upper()}", data=_build_export,
+                       file_name=f"attempts_{username or group_id or 'all'}_{date.today():%Y%m%d}.{fmt}",
+                       mime=export.MIME_TYPES[fmt], on_click="ignore", use_container_width=True)
+
+def _render_history_compaction():
+    """Folds old attempts into monthly rollups on request."""
+    with st.expander("History Compaction"):
+        st.write("Attempts older than the chosen age are folded into one compressed document per student "
+                 "and month. Dashboards and exports still show them. Scheduled runs can use "
+                 "`python -m modules.attempt_rollups`.")
+        days = st.number_input("Compact whole months older than (days)", min_value=31,
+                               value=attempt_rollups.COMPACT_AFTER_DAYS, step=30, key="compact_after_days")
+        col1, col2 = st.columns(2)
+        dry_run = col1.button("Preview", use_container_width=True, key="compact_preview")
+        if dry_run or col2.button("Compact Now", type="primary", use_container_width=True, key="compact_run"):
+            with st.spinner("Compacting attempt history..."):
+                totals = attempt_rollups.compact_all(older_than_days=int(days), dry_run=dry_run)
+            verb = "Would compact" if dry_run else "Compacted"
+            st.success(f"{verb} {totals['attempts']} attempts of {totals['users']} students into "
+                       f"{totals['documents']} rollup documents ({totals['months']} months).")
+
+def _render_profiling(all_users):
+    st.subheader("Profiling")
+    st.write("Profile individual page runs of chosen students and pages to see where the time goes. "
+             f"At most {profiler.MAX_PROFILES_PER_MINUTE} runs per minute are profiled per server process, "
+             f"and profiles are kept for {profiler.PROFILE_RETENTION_DAYS} days.")
+    config = profiler.get_config()
+    usernames = sorted(user.id for user in all_users) if not isinstance(all_users, Exception) else []
+    with st.form("profiler_config"):
+        enabled = st.toggle("Profile page runs", value=config["enabled"])
+        mode = st.radio("Profiler", profiler.MODES, index=profiler.MODES.index(config["mode"]), horizontal=True,
+                        help="Sampling is cheap enough to leave on; deterministic counts every call but slows the run.")
+        users = st.multiselect("Students (none = everyone)", sorted(set(usernames) | set(config["users"])),
+                               default=config["users"])
+        views = st.multiselect("Pages (none = every page)", profiler.VIEWS, default=config["views"])
+        sample_rate = st.slider("Share of matching runs to profile", 0.01, 1.0, float(config["sample_rate"]))
+        if st.form_submit_button("Save Profiling Settings"):
+            profiler.save_config({"enabled": enabled, "mode": mode, "users": users, "views": views,
+                                  "sample_rate": sample_rate})
+            st.toast("Profiling settings saved. Other server processes apply them within "
+                     f"{profiler.CONFIG_TTL_SECONDS:.0f} seconds.")
+
+    profiles = profiler.list_profiles()
+    if not profiles:
+        st.info("No profiles stored yet.")
+        return
+    columns = ["started", "user", "view", "trigger", "outcome", "duration_ms", "firestore_calls", "mode"]
+    st.dataframe(pd.DataFrame(profiles)[columns], hide_index=True, use_container_width=True)
+    by_file = {p["file"]: p for p in profiles}
+    selected = st.selectbox("Profile", list(by_file), key="profile_file", format_func=lambda name: (
+        f"{by_file[name]['started'][:19]} · {by_file[name]['view']} · {by_file[name]['user'] or 'anonymous'} "
+        f"· {by_file[name]['duration_ms']:.0f} ms"))
+    record = profiler.load_profile(selected)
+    if record is None:
+        st.warning("This profile has been pruned.")
+        return
+    st.caption(f"Triggered by: {record['trigger']} · {record['firestore_calls']} Firestore call(s)"
+               + (f" · {record['samples']} samples" if "samples" in record else ""))
+    if record.get("stacks"):
+        nodes = profiler.flame_graph_nodes(record)
+        fig = go.Figure(go.Icicle(ids=nodes["ids"], labels=nodes["labels"], parents=nodes["parents"],
+                                  values=nodes["values"], branchvalues="total", tiling={"orientation": "v", "flip": "y"}))
+        fig.update_layout(margin={"t": 10, "l": 0, "r": 0, "b": 0}, height=500)
+        st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(pd.DataFrame(profiler.top_functions(record)), hide_index=True, use_container_width=True)
+    if st.button("Delete All Profiles", key="clear_profiles"):
+        st.toast(f"Deleted {profiler.clear_profiles()} profiles.", icon="🗑️")
+        st.rerun()
+
 def render():
     """Renders the Admin Dashboard page."""
     st.title("Admin Dashboard ⚙️")
     st.info("Welcome, Admin! Use the tools below to manage the application's content and users.")
-    tab1, tab2 = st.tabs(["Quiz Management", "User Management"])
+    # Both tabs render on every run, so load their listings together
+    all_quizzes, all_users = async_db.gather(
+        async_db.run(database_manager.get_all_documents, "quizzes"),
+        async_db.run(database_manager.get_all_documents, "users"),
+        return_exceptions=True,
+    )
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Quiz Management", "User Management", "Classes", "Data Export", "Profiling"])
     with tab1:
-        _render_quiz_management()
+        _render_quiz_management(all_quizzes)
     with tab2:
-        _render_user_management()
+        _render_user_management(all_users)
+    with tab3:
+        _render_class_management(all_users)
+    with tab4:
+        _render_data_export(all_users)
+        _render_history_compaction()
+    with tab5:
+        _render_profiling(all_users)
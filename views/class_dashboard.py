@@ -0,0 +1,79 @@
+import streamlit as st
+import pandas as pd
+import tempfile
+from datetime import date, timedelta
+from modules import async_db, authentication, data_manager, database_manager, export
+
+# Days of class activity the dashboard covers.
+PERIODS = {"Last 7 days": 7, "Last 30 days": 30, "Last 90 days": 90, "Last year": 365}
+
+def _render_export(group_id: str):
+    fmt = st.selectbox("Format", export.FORMATS, format_func=str.upper, key="class_export_format")
+
+    def _build_export():
+        # Runs when the button is clicked; rows stream to a temporary file, not memory
+        output = tempfile.TemporaryFile()
+        export.export_attempts(output, fmt, group_id=group_id)
+        output.seek(0)
+        return output
+
+    st.download_button(f"⬇️ Download class attempts ({fmt.upper()})", data=_build_export,
+                       file_name=f"attempts_{group_id}_{date.today():%Y%m%d}.{fmt}",
+                       mime=export.MIME_TYPES[fmt], on_click="ignore", use_container_width=True)
+
+def render():
+    """Renders the class dashboard: a teacher's classes, their students' activity and weak topics."""
+    st.header("My Classes 🏫")
+
+    groups = authentication.visible_groups()
+    if not groups:
+        st.info("You are not assigned to any classes yet. Ask an administrator to add you to one.")
+        return
+    group_id = st.selectbox("Class", sorted(groups), format_func=lambda g: groups[g].get("name") or g,
+                            key="class_dashboard_group")
+    period = st.selectbox("Period", list(PERIODS), index=1, key="class_dashboard_period")
+    since = date.today() - timedelta(days=PERIODS[period])
+
+    # Two indexed queries: the class's members and its attempts in the period
+    usernames, attempts = async_db.gather(
+        async_db.run(database_manager.get_usernames, group_id),
+        async_db.run(data_manager.get_class_attempts, group_id, since),
+    )
+    active = {attempt["student_name"] for attempt in attempts}
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Students", len(usernames))
+    col2.metric("Active", len(active & set(usernames)))
+    col3.metric("Attempts", len(attempts))
+
+    tab1, tab2, tab3, tab4 = st.tabs(["Students", "Topics", "Recent Attempts", "Export"])
+    with tab1:
+        if not usernames:
+            st.info("This class has no students yet.")
+        else:
+            st.dataframe(pd.DataFrame(data_manager.summarize_class_students(attempts, usernames)),
+                         hide_index=True, use_container_width=True)
+    with tab2:
+        topics = data_manager.summarize_class_topics(attempts)
+        if not topics:
+            st.info("No attempts in this period.")
+        else:
+            st.caption("Weakest topics first.")
+            st.dataframe(pd.DataFrame(topics), hide_index=True, use_container_width=True)
+    with tab3:
+        if not attempts:
+            st.info("No attempts in this period.")
+        else:
+            rows = [{
+                "Date": data_manager.format_attempt_date(attempt["timestamp"], with_time=True),
+                "Student": attempt["student_name"],
+                "Subject": attempt.get("subject", ""),
+                "Topic": attempt.get("topic", ""),
+                "Level": attempt.get("level_name") or attempt.get("level", ""),
+                "Score": f"{attempt.get('score', 0)}/{attempt.get('total_questions', 0)}",
+                "Time": data_manager.format_duration(attempt.get("time_taken")),
+            } for attempt in attempts[:200]]
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+            if len(attempts) > 200:
+                st.caption(f"Showing the latest 200 of {len(attempts)} attempts; use Export for all of them.")
+    with tab4:
+        _render_export(group_id)
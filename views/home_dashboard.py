@@ -1,53 +1,12 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from modules import data_manager
+import plotly.io as pio
+from datetime import date, timedelta
+from modules import content_cache, data_manager, scoring
 
-def _render_analysis_view(selected_data: dict):
-    """Displays a generic, unified analysis for any quiz attempt."""
-    st.subheader(f"Analysis for Quiz on {selected_data['timestamp']}", divider="blue")
-
-    topic_scores = {}
-    questions = selected_data.get("questions", [])
-
-    if not questions:
-        st.warning("This quiz attempt has no question data to analyze.")
-        return
-
-    for q in questions:
-        topic = q.get("topic", "General")
-        if topic not in topic_scores:
-            topic_scores[topic] = {"correct": 0, "total": 0}
-        topic_scores[topic]["total"] += 1
-
-        # --- Unified and Robust Correctness Check ---
-        is_correct = False
-        q_type = q.get("type")
-        user_answer = q.get("user_answer")
-        correct_answer_key = q.get("answer")
-
-        if q_type == "single_choice":
-            # First, check if the stored answer is the KEY (new, correct format)
-            if user_answer == correct_answer_key:
-                is_correct = True
-            # Fallback: check if the stored answer is the TEXT (old, incorrect format)
-            else:
-                for opt in q.get("options", []):
-                    if opt.get("key") == correct_answer_key and opt.get("text") == user_answer:
-                        is_correct = True
-                        break
-        
-        elif q_type == "multi_choice":
-            # This logic should be safe as multi-choice has always stored a list of keys
-            is_correct = sorted(user_answer or []) == sorted(correct_answer_key or [])
-
-        elif q_type == "text":
-            is_correct = str(user_answer).strip().lower() == str(correct_answer).strip().lower()
-
-        if is_correct:
-            topic_scores[topic]["correct"] += 1
-    
-    # --- Chart Generation ---
+def build_analysis_charts(topic_scores: dict):
+    """Builds the topic bar chart and correct-answer pie chart; either may be None when there is nothing to plot."""
     chart_data = []
     for topic, scores in topic_scores.items():
         chart_data.append({
@@ -57,25 +16,66 @@ def _render_analysis_view(selected_data: dict):
             "Percentage": (scores["correct"] / scores["total"]) * 100 if scores["total"] > 0 else 0
         })
     df_chart = pd.DataFrame(chart_data)
+    if df_chart.empty:
+        return None, None
+
+    df_chart['ScoreText'] = df_chart['Correct'].astype(str) + '/' + df_chart['Total'].astype(str)
+    fig_bar = px.bar(df_chart, x='Topic', y='Correct', text='ScoreText', color='Percentage',
+                        color_continuous_scale=px.colors.diverging.RdYlGn, range_color=[0, 100],
+                        title='Topic-wise Score')
+    fig_bar.update_traces(textposition='outside')
+    fig_bar.update_layout(yaxis_title="Correct Answers", xaxis_title="Topic")
+
+    fig_pie = None
+    df_pie = df_chart[df_chart['Correct'] > 0]
+    if not df_pie.empty:
+        fig_pie = px.pie(df_pie, names='Topic', values='Correct', title='Distribution of Correct Answers', hole=.3)
+        fig_pie.update_traces(textinfo='percent+label', textposition='inside')
+    return fig_bar, fig_pie
+
+def get_attempt_analysis(username: str, attempt: dict) -> dict:
+    """
+    Returns {topic_scores, bar_json, pie_json} for an attempt. Attempts never change once
+    written, so the result is memoized per attempt id in a bounded process-wide cache.
+    """
+    def _analyze():
+        topic_scores = scoring.topic_scores(attempt.get("questions", []))
+        fig_bar, fig_pie = build_analysis_charts(topic_scores)
+        return {
+            "topic_scores": topic_scores,
+            "bar_json": fig_bar.to_json() if fig_bar is not None else None,
+            "pie_json": fig_pie.to_json() if fig_pie is not None else None,
+        }
+    return content_cache.get_user_cache().get_or_load(
+        content_cache.analysis_key(username, attempt["filename"]), _analyze)
+
+def _render_analysis_view(selected_data: dict):
+    """Displays a generic, unified analysis for any quiz attempt."""
+    st.subheader(f"Analysis for Quiz on {data_manager.format_attempt_date(selected_data['timestamp'], with_time=True)}", divider="blue")
+
+    if not selected_data.get("questions"):
+        st.warning("This quiz attempt has no question data to analyze.")
+        return
+
+    if selected_data.get("time_taken") is not None:
+        timing = f"Time taken: {data_manager.format_duration(selected_data['time_taken'])}"
+        question_times = selected_data.get("question_times") or []
+        if any(question_times):
+            slowest = max(range(len(question_times)), key=question_times.__getitem__)
+            timing += f" · Longest on Q{slowest + 1} ({question_times[slowest]:.1f} s)"
+        st.caption(timing)
+
+    analysis = get_attempt_analysis(st.session_state.student_name, selected_data)
 
-    if not df_chart.empty:
+    if analysis["bar_json"] is not None:
         col1, col2 = st.columns(2)
         with col1:
             st.markdown("#### Performance per Topic")
-            df_chart['ScoreText'] = df_chart['Correct'].astype(str) + '/' + df_chart['Total'].astype(str)
-            fig_bar = px.bar(df_chart, x='Topic', y='Correct', text='ScoreText', color='Percentage',
-                                color_continuous_scale=px.colors.diverging.RdYlGn, range_color=[0, 100],
-                                title='Topic-wise Score')
-            fig_bar.update_traces(textposition='outside')
-            fig_bar.update_layout(yaxis_title="Correct Answers", xaxis_title="Topic")
-            st.plotly_chart(fig_bar, use_container_width=True)
+            st.plotly_chart(pio.from_json(analysis["bar_json"]), use_container_width=True)
         with col2:
             st.markdown("#### Correct Answers Distribution")
-            df_pie = df_chart[df_chart['Correct'] > 0]
-            if not df_pie.empty:
-                fig_pie = px.pie(df_pie, names='Topic', values='Correct', title='Distribution of Correct Answers', hole=.3)
-                fig_pie.update_traces(textinfo='percent+label', textposition='inside')
-                st.plotly_chart(fig_pie, use_container_width=True)
+            if analysis["pie_json"] is not None:
+                st.plotly_chart(pio.from_json(analysis["pie_json"]), use_container_width=True)
             else:
                 st.info("No questions were answered correctly to show distribution.")
     else:
@@ -85,6 +85,28 @@ def _render_analysis_view(selected_data: dict):
         st.session_state.selected_attempt_file = None
         st.rerun()
 
+# Progress chart ranges, in days back from today.
+PROGRESS_RANGES = {"Last month": 31, "Last 3 months": 92, "Last year": 366, "Last 3 years": 3 * 366}
+
+def _render_progress_view(student_name: str):
+    """Plots score percentage over time for a chosen subject, topic or level."""
+    st.subheader("Your Progress Over Time", divider="blue")
+    col1, col2 = st.columns([3, 2])
+    range_label = col2.radio("Range", list(PROGRESS_RANGES), index=2, horizontal=True, key="progress_range")
+    since = date.today() - timedelta(days=PROGRESS_RANGES[range_label])
+    series = data_manager.get_progress_series(student_name, since)
+    if not series:
+        st.info("No attempts in this period yet.")
+        return
+
+    series_key = col1.selectbox("Subject / Topic / Level", sorted(series), key="progress_series")
+    df = pd.DataFrame(series[series_key], columns=["Date", "Correct", "Total", "Attempts"])
+    df["Percentage"] = (df["Correct"] / df["Total"].where(df["Total"] > 0)) * 100
+    fig = px.line(df, x="Date", y="Percentage", markers=True, hover_data=["Correct", "Total", "Attempts"],
+                  title=f"Score Trend: {series_key}")
+    fig.update_layout(yaxis_title="Score (%)", yaxis_range=[0, 105], xaxis_title="Date")
+    st.plotly_chart(fig, use_container_width=True)
+
 def render():
     """Displays the historical quiz data and analysis for the logged-in student."""
     st.header("Student Dashboard 📊", divider="rainbow")
@@ -92,21 +114,18 @@ def render():
 
     if 'selected_attempt_file' not in st.session_state:
         st.session_state.selected_attempt_file = None
+    if 'attempt_page_limits' not in st.session_state:
+        st.session_state.attempt_page_limits = {}
 
-    student_attempts = data_manager.get_student_attempts(st.session_state.student_name)
+    # Each tab queries only its own subject's latest page, concurrently; pages are cached per user until they save a new attempt
+    page_limits = st.session_state.attempt_page_limits
+    pages = data_manager.get_recent_attempts_by_subject(st.session_state.student_name, page_limits)
+    attempts_by_subject = {subject_id: attempts for subject_id, attempts in pages.items() if attempts}
 
-    if not student_attempts:
+    if not attempts_by_subject:
         st.success("You have no previous attempts. Start a new quiz!")
         return
 
-    # Group attempts by subject
-    attempts_by_subject = {}
-    for attempt in student_attempts:
-        subject = attempt.get("subject", "N/A")
-        if subject not in attempts_by_subject:
-            attempts_by_subject[subject] = []
-        attempts_by_subject[subject].append(attempt)
-
     tab_keys = sorted(attempts_by_subject.keys())
     display_tab_names = [k.capitalize() for k in tab_keys]
     subject_tabs = st.tabs(display_tab_names)
@@ -127,7 +146,7 @@ def render():
             for attempt in attempts_by_subject[subject_id]:
                 if subject_id == "GK":
                     cols = st.columns([2, 3, 2, 2])
-                    cols[0].write(attempt["timestamp"].split(" ")[0])
+                    cols[0].write(data_manager.format_attempt_date(attempt["timestamp"]))
                     cols[1].write(attempt.get("level", "N/A"))
                     cols[2].write(f"{attempt['score']}/{attempt['total_questions']}")
                     if cols[3].button("Analyze", key=f"analyze_{attempt['filename']}"):
@@ -135,19 +154,27 @@ def render():
                         st.rerun()
                 elif subject_id == "Math":
                     cols = st.columns([2, 3, 3, 2, 2])
-                    cols[0].write(attempt["timestamp"].split(" ")[0])
+                    cols[0].write(data_manager.format_attempt_date(attempt["timestamp"]))
                     cols[1].write(attempt.get("level", "N/A")) # Chapter
                     cols[2].write(attempt.get("story", "N/A"))
                     cols[3].write(f"{attempt['score']}/{attempt['total_questions']}")
                     if cols[4].button("Analyze", key=f"analyze_{attempt['filename']}"):
                         st.session_state.selected_attempt_file = attempt['filename']
                         st.rerun()
+
+            limit = page_limits.get(subject_id, data_manager.ATTEMPTS_PAGE_SIZE)
+            if len(attempts_by_subject[subject_id]) >= limit:
+                if st.button("Show older attempts", key=f"more_attempts_{subject_id}"):
+                    page_limits[subject_id] = limit + data_manager.ATTEMPTS_PAGE_SIZE
+                    st.rerun()
     
     st.markdown("---")
+    _render_progress_view(st.session_state.student_name)
 
     # --- Analysis Section (using st.expander) ---
     if st.session_state.get("selected_attempt_file"):
-        selected_attempt = next((att for att in student_attempts if att["filename"] == st.session_state.selected_attempt_file), None)
+        selected_attempt = next((att for attempts in attempts_by_subject.values() for att in attempts
+                                 if att["filename"] == st.session_state.selected_attempt_file), None)
         if selected_attempt:
             with st.expander("Quiz Analysis", expanded=True):
                 _render_analysis_view(selected_attempt)
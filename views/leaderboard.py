@@ -0,0 +1,48 @@
+import streamlit as st
+import pandas as pd
+from modules import data_manager, leaderboards
+
+def _quiz_options(subject: str) -> dict:
+    """Returns {quiz_id: "Topic – Level"} for the subject's quizzes, in catalog order."""
+    return {entry["quiz_id"]: f"{entry['topic']} – {entry['level_name']}"
+            for entry in data_manager.get_catalog_entries() if entry["subject"] == subject}
+
+def render():
+    """Renders the per-subject and per-quiz leaderboards."""
+    st.header("Leaderboards 🏆")
+
+    board_kind = st.radio("Board", ["Subject", "Quiz"], horizontal=True, key="leaderboard_kind")
+    subject = st.selectbox("Select Subject", ["GK", "Math"], key="leaderboard_subject")
+    if board_kind == "Quiz":
+        quizzes = _quiz_options(subject)
+        if not quizzes:
+            st.info("No quizzes have been uploaded for this subject yet.")
+            return
+        key = st.selectbox("Select Quiz", list(quizzes), format_func=quizzes.get, key="leaderboard_quiz")
+        kind = "quiz"
+    else:
+        key, kind = subject, "subject"
+
+    group_id = st.session_state.get("group_id")
+    if group_id and st.toggle("My class only", key="leaderboard_my_class"):
+        entries = leaderboards.get_leaderboard(kind, key, group_id)
+    else:
+        entries = leaderboards.get_leaderboard(kind, key)
+
+    if not entries:
+        st.info("No scores on this board yet. Be the first! 🚀")
+        return
+
+    rows = [{
+        "Rank": rank,
+        "Student": entry["u"],
+        "Score": f"{entry['s']}/{entry['n']}",
+        "Time": data_manager.format_duration(entry.get("t")),
+        "Date": data_manager.format_attempt_date(entry["ts"]) if entry.get("ts") else "—",
+    } for rank, entry in enumerate(entries, start=1)]
+    st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+
+    me = st.session_state.student_name
+    if not any(entry["u"] == me for entry in entries):
+        st.caption(f"Only the top {leaderboards.LEADERBOARD_SIZE} are shown. Keep practicing to get on the board!")
+    st.caption(f"Boards refresh every {leaderboards.LEADERBOARD_TTL_SECONDS} seconds.")
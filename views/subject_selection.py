@@ -49,6 +49,15 @@ def render():
                     if st.button(f"Start {display_name} Exercise", key=button_key, width='stretch'):
                         set_view("math_exercise")
 
+    # --- Render Adaptive Practice ---
+    if live_subjects:
+        st.markdown("#### Keep Practicing")
+        with st.container(border=True):
+            st.markdown("### 🎯 Adaptive Practice")
+            st.markdown("Mixed questions from across a subject, with more from the topics you find hardest.")
+            if st.button("Start Adaptive Practice", key="start_adaptive_practice_button", width='stretch'):
+                set_view("adaptive_practice")
+
 # Helper dictionaries for icons and descriptions (can be moved to a config file later)
 subject_display_names = {
     "gk": "General Knowledge",